@@ -43,20 +43,78 @@ class Settings(BaseSettings):
     claude_model: str = "claude-haiku-4-5-20251001"  # Default to Haiku for cost savings
     claude_vision_model: str = "claude-haiku-4-5-20251001"  # Haiku for vision analysis
 
+    # Claude HTTP transport (shared async connection pool)
+    claude_max_connections: int = 20
+    claude_max_keepalive_connections: int = 10
+    claude_keepalive_expiry_seconds: float = 30.0
+    claude_timeout_seconds: float = 120.0
+    claude_max_retries: int = 2
+
+    # Shared Anthropic rate limiter (text + vision), budgets are per model
+    rate_limit_requests_per_minute: int = 50
+    rate_limit_tokens_per_minute: int = 50000
+    rate_limit_max_concurrency: int = 8
+
+    # Persistent caches
+    cache_dir: str = "./cache"
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600  # 7 days
+    llm_cache_max_mb: float = 200.0
+    vision_cache_enabled: bool = True
+    vision_cache_ttl_seconds: int = 90 * 24 * 3600  # 90 days
+    vision_cache_max_mb: float = 100.0
+
+    # Maximum concurrent Claude calls per /generate request
+    generation_max_concurrency: int = 3
+    generation_mode: str = "parallel"  # parallel | single_call (all variants in one Claude response)
+
     # Mock mode for testing without API key
     mock_generation: bool = False  # Set to True to use mock responses instead of Claude API
     
     # Vision provider settings
     vision_provider: str = "claude"  # mock | google | claude
     vision_max_image_mb: int = 8
+    vision_max_dimension: int = 1568  # Longest edge sent to the provider; larger images are downsized
+    vision_jpeg_quality: int = 85
+    vision_batch_size: int = 4  # Images per Claude vision call (1 = one call per image)
+    vision_batch_window_ms: int = 50  # Wait this long for more images before sending a partial batch
     vision_allowed_types: str = "jpg,jpeg,png,webp"
     google_application_credentials: Optional[str] = None
+
+    # Near-duplicate photo detection (perceptual hash)
+    photo_dedup_enabled: bool = True
+    photo_duplicate_threshold: int = 6  # Max differing bits (of 64) for two photos to count as duplicates
+
+    # Hold schools/NaPTAN/GP coordinates in a shared in-memory grid index (off = query SQLite per request)
+    geo_index_enabled: bool = True
+
+    # Pooled read-only connections for the EPC/schools/NaPTAN/GP databases (per thread, per file)
+    sqlite_mmap_mb: int = 256
+    sqlite_cache_mb: int = 16
+    sqlite_statement_cache: int = 128
+
+    # Location intelligence report: per-section time budget and threads for SQLite lookups
+    location_section_timeout_seconds: float = 5.0
+    location_max_workers: int = 4
+    location_cache_enabled: bool = True
+    location_cache_ttl_seconds: int = 7 * 24 * 3600  # 7 days (OpenStreetMap sections aren't versioned)
+    location_cache_max_mb: float = 50.0
+    location_cache_memory_entries: int = 2500  # Report sections (up to 5 per cell)
+    location_cache_cell_degrees: float = 0.002  # ~220m N-S, ~140m E-W in England
+    location_batch_concurrency: int = 8
+    location_batch_max_items: int = 1000
     
     # Enrichment settings
     enrichment_enabled: bool = True
     enrichment_cache_ttl_seconds: int = 3600  # 1 hour
     enrichment_cache_max_size: int = 1000
     enrichment_timeout_seconds: int = 10
+    overpass_requests_per_minute: int = 30
+    overpass_max_concurrency: int = 2  # Slots per IP on the public Overpass instance
+    osm_amenities_db_path: Optional[str] = None  # Defaults to data/osm/amenities.db
+    osm_overpass_fallback: bool = True
+    postcode_db_path: Optional[str] = None  # Defaults to data/postcodes/postcodes.db
+    postcode_remote_fallback: bool = False
     
     # Compliance settings
     compliance_required_keywords: str = "garden,parking,schools,epc,transport,bathroom,bedroom,kitchen"
@@ -12,9 +12,9 @@ print(f"Executable: {sys.executable}", flush=True)
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, Response
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 import logging
 import asyncio
 import os
@@ -39,6 +39,7 @@ from backend.schemas import (
     PostcodeAutocompleteRequest,
     PostcodeAutocompleteResponse,
     AddressSuggestion,
+    LocationBatchRequest,
     AddressLookupRequest,
     AddressLookupResponse,
     FullAddress,
@@ -86,14 +87,19 @@ from backend.schemas_export import (
 from services.generator import Generator
 from services.rewrite_compressor import RewriteCompressor
 from services.shrink_service import ShrinkService
-from services.vision_adapter import VisionAdapter, ValidationError
+from services.vision_adapter import VisionAdapter, ValidationError, PreparedImage
+from services.photo_dedup import dhash_data_url, group_near_duplicates
 from services.claude_client import ClaudeClient
 from services.enrichment_service import EnrichmentService
 from services.cache_manager import CacheManager
-from services.epc_service import EPCService
+from services.persistent_cache import PersistentCache
+from services.epc_service import EPCService, parse_rating
 from services.schools_service import SchoolsService, get_schools_service
 from services.transport_service import TransportService, get_transport_service
 from services.gp_service import GPService, get_gp_service
+from services.osm_amenity_store import get_osm_amenity_store
+from services.postcode_directory import get_postcode_directory
+from services.sqlite_pool import close_all_pools, pool_stats
 from services.compliance_checker import ComplianceChecker
 from services.keyword_coverage import KeywordCoverage
 from services.length_policy import LengthPolicy
@@ -224,6 +230,10 @@ async def startup_event():
     except Exception as e:
         logger.error(f"❌ Failed to start post scheduler: {e}")
 
+    # Load location datasets in the background so the first report isn't slow
+    if settings.geo_index_enabled:
+        asyncio.create_task(asyncio.to_thread(_warm_geo_indexes))
+
 
 @fastapi_app.on_event("shutdown")
 async def shutdown_event():
@@ -237,6 +247,17 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"❌ Failed to stop post scheduler: {e}")
 
+    # Close the pooled Claude HTTP transport
+    if claude_client is not None:
+        try:
+            await claude_client.aclose()
+            logger.info("✅ Claude client connections closed")
+        except Exception as e:
+            logger.error(f"❌ Failed to close Claude client: {e}")
+
+    # Close pooled read-only connections to the data service databases
+    close_all_pools()
+
 # Disable caching for development
 @fastapi_app.middleware("http")
 async def disable_cache(request, call_next):
@@ -263,9 +284,23 @@ if os.path.exists("test_images"):
     fastapi_app.mount("/test_images", StaticFiles(directory="test_images"), name="test_images")
 
 # Initialize global rate limiter for API calls
-# This prevents acceleration limit errors when multiple photos are analyzed
-global_rate_limiter = GlobalRateLimiter(min_delay_seconds=1.2)
-logger.info("Global rate limiter initialized (1.2s minimum delay)")
+# Shared by the text and vision clients so they draw on the same per-model budgets
+global_rate_limiter = GlobalRateLimiter(
+    requests_per_minute=settings.rate_limit_requests_per_minute,
+    tokens_per_minute=settings.rate_limit_tokens_per_minute,
+    max_concurrency=settings.rate_limit_max_concurrency
+)
+logger.info(
+    f"Global rate limiter initialized ({settings.rate_limit_requests_per_minute} RPM, "
+    f"{settings.rate_limit_tokens_per_minute} TPM, {settings.rate_limit_max_concurrency} concurrent)"
+)
+
+# Separate limiter for the public Overpass API (OpenStreetMap), shared by
+# enrichment and location intelligence; 429/504s pause every caller together
+overpass_rate_limiter = GlobalRateLimiter(
+    requests_per_minute=settings.overpass_requests_per_minute,
+    max_concurrency=settings.overpass_max_concurrency
+)
 
 # ============================================================================
 # COLLABORATION IN-MEMORY STORAGE
@@ -286,9 +321,23 @@ def _cleanup_expired_sessions():
         del active_sessions[email]
         logger.debug(f"Expired session for {email}")
 
+# Initialize persistent LLM response cache
+llm_response_cache = None
+if settings.llm_cache_enabled:
+    try:
+        llm_response_cache = PersistentCache(
+            db_path=os.path.join(settings.cache_dir, "llm_responses.db"),
+            max_size_mb=settings.llm_cache_max_mb,
+            default_ttl_seconds=settings.llm_cache_ttl_seconds
+        )
+        logger.info(f"LLM response cache initialized ({llm_response_cache.size()} entries)")
+    except Exception as e:
+        logger.warning(f"Failed to initialize LLM response cache: {e}")
+        llm_response_cache = None
+
 # Initialize Claude client
 try:
-    claude_client = ClaudeClient()
+    claude_client = ClaudeClient(response_cache=llm_response_cache, rate_limiter=global_rate_limiter)
     if claude_client.is_available():
         logger.info("Claude API client initialized successfully")
     else:
@@ -305,7 +354,9 @@ try:
         config={
             "google_credentials_path": settings.google_application_credentials,
             "anthropic_api_key": settings.anthropic_api_key,
-            "rate_limiter": global_rate_limiter  # Pass rate limiter to vision client
+            "rate_limiter": global_rate_limiter,  # Pass rate limiter to vision client
+            "batch_size": settings.vision_batch_size,
+            "batch_window_seconds": settings.vision_batch_window_ms / 1000
         }
     )
     logger.info(f"Vision client initialized: {settings.vision_provider}")
@@ -313,13 +364,30 @@ except Exception as e:
     logger.warning(f"Failed to initialize vision client, using mock: {e}")
     vision_client = make_vision_client(VisionProvider.MOCK, {})
 
+# Initialize persistent vision analysis cache
+vision_analysis_cache = None
+if settings.vision_cache_enabled:
+    try:
+        vision_analysis_cache = PersistentCache(
+            db_path=os.path.join(settings.cache_dir, "vision_analyses.db"),
+            max_size_mb=settings.vision_cache_max_mb,
+            default_ttl_seconds=settings.vision_cache_ttl_seconds
+        )
+        logger.info(f"Vision analysis cache initialized ({vision_analysis_cache.size()} entries)")
+    except Exception as e:
+        logger.warning(f"Failed to initialize vision analysis cache: {e}")
+        vision_analysis_cache = None
+
 # Initialize services
 generator = Generator(claude_client=claude_client)
 compressor = RewriteCompressor()
 vision_adapter = VisionAdapter(
     vision_client=vision_client,
     max_size_mb=settings.vision_max_image_mb,
-    allowed_types=settings.vision_allowed_types.split(",")
+    allowed_types=settings.vision_allowed_types.split(","),
+    analysis_cache=vision_analysis_cache,
+    max_dimension=settings.vision_max_dimension,
+    jpeg_quality=settings.vision_jpeg_quality
 )
 length_policy = LengthPolicy()
 
@@ -329,12 +397,39 @@ shrink_service = ShrinkService(
     required_keywords=[kw.strip() for kw in settings.compliance_required_keywords.split(",") if kw.strip()]
 )
 
+# Initialize offline OpenStreetMap amenity store (built by scripts/build_osm_amenities.py)
+osm_amenity_store = None
+try:
+    osm_amenity_store = get_osm_amenity_store(settings.osm_amenities_db_path)
+except Exception as e:
+    logger.warning(f"Failed to initialize OSM amenity store: {e}")
+    osm_amenity_store = None
+
+# Initialize local postcode directory (built by scripts/build_postcode_directory.py)
+postcode_directory = None
+try:
+    postcode_directory = get_postcode_directory(settings.postcode_db_path)
+except Exception as e:
+    logger.warning(f"Failed to initialize postcode directory: {e}")
+    postcode_directory = None
+
 # Initialize enrichment service
 enrichment_service = None
+geocoding_client = None
+places_client = None
 if settings.enrichment_enabled:
     try:
-        geocoding_client = GeocodingClient(timeout_seconds=settings.enrichment_timeout_seconds)
-        places_client = PlacesClient(timeout_seconds=settings.enrichment_timeout_seconds)
+        geocoding_client = GeocodingClient(
+            timeout_seconds=settings.enrichment_timeout_seconds,
+            directory=postcode_directory,
+            remote_fallback=settings.postcode_remote_fallback
+        )
+        places_client = PlacesClient(
+            timeout_seconds=settings.enrichment_timeout_seconds,
+            rate_limiter=overpass_rate_limiter,
+            amenity_store=osm_amenity_store,
+            overpass_fallback=settings.osm_overpass_fallback
+        )
         cache_manager = CacheManager(max_size=settings.enrichment_cache_max_size)
         enrichment_service = EnrichmentService(
             geocoding_client=geocoding_client,
@@ -397,6 +492,17 @@ except Exception as e:
     logger.warning(f"Failed to initialize GP service: {e}")
     gp_service = None
 
+
+def _warm_geo_indexes():
+    """Load the schools/transport/GP datasets into the shared geo index (runs in a worker thread)."""
+    for service in (schools_service, transport_service, gp_service):
+        if service is None:
+            continue
+        try:
+            service.warm_geo_index()
+        except Exception as e:
+            logger.warning(f"Failed to load geo index for {type(service).__name__}: {e}")
+
 # Initialize address lookup client (Ideal Postcodes)
 address_lookup_client = None
 if settings.ideal_postcodes_api_key:
@@ -453,7 +559,7 @@ except Exception as e:
 
 # Initialize UK brochure generator
 try:
-    uk_brochure_generator = get_brochure_generator(claude_client=claude_client)
+    uk_brochure_generator = get_brochure_generator(claude_client=claude_client, epc_service=epc_service)
     logger.info("UK brochure generator initialized")
 except Exception as e:
     logger.warning(f"Failed to initialize UK brochure generator: {e}")
@@ -523,6 +629,58 @@ async def health_check():
     return HealthResponse(status="ok", version="1.0.0")
 
 
+@fastapi_app.get("/api/rate-limiter/stats")
+async def rate_limiter_stats():
+    """
+    Get in-flight, queue and per-model budget state of the shared rate limiter.
+
+    Returns:
+        Dict of limiter stats
+    """
+    return global_rate_limiter.stats()
+
+
+@fastapi_app.get("/api/overpass-limiter/stats")
+async def overpass_limiter_stats():
+    """
+    Get in-flight, queue and backoff state of the Overpass API rate limiter.
+
+    Returns:
+        Dict of limiter stats
+    """
+    return overpass_rate_limiter.stats()
+
+
+@fastapi_app.get("/api/llm-cache/stats")
+async def llm_cache_stats():
+    """
+    Get hit/miss counters for the persistent LLM response cache.
+
+    Returns:
+        Dict with enabled flag and cache stats
+    """
+    stats = claude_client.cache_stats() if claude_client else None
+    return {
+        "enabled": stats is not None,
+        "stats": stats
+    }
+
+
+@fastapi_app.get("/api/vision-cache/stats")
+async def vision_cache_stats():
+    """
+    Get hit/miss counters for the persistent vision analysis cache.
+
+    Returns:
+        Dict with enabled flag and cache stats
+    """
+    stats = vision_adapter.cache_stats()
+    return {
+        "enabled": stats is not None,
+        "stats": stats
+    }
+
+
 @fastapi_app.post("/generate", response_model=GenerateResponse)
 async def generate_listing(request: GenerateRequest):
     """
@@ -559,7 +717,8 @@ async def generate_listing(request: GenerateRequest):
             num_variants=3,
             enrichment_data=enrichment_data,
             photo_analysis=request.photo_analysis,
-            brochure_sections=request.brochure_sections
+            brochure_sections=request.brochure_sections,
+            use_cache=not request.regenerate
         )
         
         metadata = {
@@ -661,127 +820,169 @@ async def generate_listing(request: GenerateRequest):
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
+def _sse_event(event: str, data) -> str:
+    """Format a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    """Wrap an async generator of SSE strings in an unbuffered streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _load_session_for_edit(session_id: Optional[str]):
+    """
+    Load a brochure session for an AI edit, enforcing its edit limit.
+
+    Returns:
+        The session, or None if no session_id was given or it failed to load
+
+    Raises:
+        HTTPException: 429 if the session's edit limit has been reached
+    """
+    if not session_id or not brochure_session_service:
+        return None
+
+    try:
+        session = brochure_session_service.load_session(session_id)
+
+        # Check if edit limit reached
+        if session.usage_stats.get('edits_count', 0) >= session.usage_stats.get('edit_limit', 100):
+            raise HTTPException(
+                status_code=429,
+                detail=f"Edit limit of {session.usage_stats.get('edit_limit', 100)} reached for this brochure. Please contact support to increase your limit."
+            )
+        return session
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to load session {session_id}: {e}")
+        return None
+
+
+def _build_room_prompt(prompt: str, target_words: int, session) -> str:
+    """Build the full room-description prompt, with property context from the session if available."""
+    # Extract property context from session if available
+    property_context = ""
+    if session and hasattr(session, 'property') and session.property:
+        prop = session.property
+        context_parts = []
+        if prop.get('keyFeatures'):
+            features = prop['keyFeatures']
+            if isinstance(features, list):
+                features = ', '.join(features)
+            context_parts.append(f"Key Features: {features}")
+        if prop.get('address'):
+            context_parts.append(f"Address: {prop['address']}")
+        if prop.get('askingPrice') or prop.get('price'):
+            context_parts.append(f"Price: {prop.get('askingPrice') or prop.get('price')}")
+        if prop.get('bedrooms'):
+            context_parts.append(f"Bedrooms: {prop['bedrooms']}")
+        if prop.get('bathrooms'):
+            context_parts.append(f"Bathrooms: {prop['bathrooms']}")
+        if prop.get('propertyType'):
+            context_parts.append(f"Property Type: {prop['propertyType']}")
+        if prop.get('style'):
+            context_parts.append(f"Style: {prop['style']}")
+        if prop.get('listed'):
+            context_parts.append(f"Listed Status: {prop['listed']}")
+        if context_parts:
+            property_context = "\n\nPROPERTY CONTEXT:\n" + "\n".join(context_parts) + "\n\nYou MUST reference the key features listed above in your description. Do not write generic text — make it specific to THIS property."
+            logger.info(f"Injected property context: {property_context[:200]}...")
+
+    # Import shared guardrails
+    from services.guardrails import get_base_guardrails, get_room_specific_additions
+
+    # Build full prompt with enhanced guardrails
+    base_guardrails = get_base_guardrails(target_words)
+    room_additions = get_room_specific_additions()
+
+    return f"""You are a professional property copywriter for Savills, writing natural, engaging property descriptions.
+
+{base_guardrails}
+
+{room_additions}
+{property_context}
+
+TASK:
+{prompt}
+
+Remember: Lead with facts, not feelings. Specific details, not vague praise."""
+
+
+def _record_room_edit(session, session_id: str, full_prompt: str, text: str) -> Optional[Dict]:
+    """Charge a room edit to the session's usage stats and return the stats for the response."""
+    if not session:
+        return None
+
+    input_tokens = len(full_prompt) // 4  # rough estimate
+    output_tokens = len(text) // 4
+    cost = (input_tokens * 0.003 / 1000) + (output_tokens * 0.015 / 1000)
+
+    # Update session usage stats
+    session.usage_stats['edits_count'] = session.usage_stats.get('edits_count', 0) + 1
+    session.usage_stats['total_cost_usd'] = session.usage_stats.get('total_cost_usd', 0.183) + cost
+
+    # Check if limit reached after this edit
+    if session.usage_stats['edits_count'] >= session.usage_stats.get('edit_limit', 100):
+        session.usage_stats['edit_limit_reached'] = True
+
+    # Save updated session
+    brochure_session_service.update_session(session_id, session)
+
+    logger.info(f"✅ Room edit #{session.usage_stats['edits_count']}, cost: ${cost:.4f}, total: ${session.usage_stats['total_cost_usd']:.4f}")
+
+    return {
+        "edits_count": session.usage_stats['edits_count'],
+        "edit_limit": session.usage_stats.get('edit_limit', 100),
+        "total_cost_usd": session.usage_stats['total_cost_usd'],
+        "edit_limit_reached": session.usage_stats.get('edit_limit_reached', False),
+        "this_request_cost_usd": cost
+    }
+
+
 @fastapi_app.post("/generate/room")
 async def generate_room_description(request: dict):
     """
     Generate ONLY a room-specific description using a custom prompt.
     Bypasses the full property description template.
 
-    Expects: {"prompt": "Your custom prompt here", "target_words": 180, "session_id": "optional"}
+    Expects: {"prompt": "Your custom prompt here", "target_words": 180, "session_id": "optional", "regenerate": false}
     Returns: {"text": "Generated description", "word_count": int, "usage_stats": {...}}
     """
     try:
         prompt = request.get("prompt", "")
         target_words = request.get("target_words", 180)
         session_id = request.get("session_id", None)
+        regenerate = bool(request.get("regenerate", False))
 
         if not prompt:
             raise HTTPException(status_code=400, detail="Prompt is required")
 
         # Check edit limit if session_id provided
-        session = None
-        if session_id and brochure_session_service:
-            try:
-                session = brochure_session_service.load_session(session_id)
-
-                # Check if edit limit reached
-                if session.usage_stats.get('edits_count', 0) >= session.usage_stats.get('edit_limit', 100):
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Edit limit of {session.usage_stats.get('edit_limit', 100)} reached for this brochure. Please contact support to increase your limit."
-                    )
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.warning(f"Failed to load session {session_id}: {e}")
-                session = None
+        session = _load_session_for_edit(session_id)
 
         logger.info(f"Room description request: {prompt[:100]}...")
 
-        # Extract property context from session if available
-        property_context = ""
-        if session and hasattr(session, 'property') and session.property:
-            prop = session.property
-            context_parts = []
-            if prop.get('keyFeatures'):
-                features = prop['keyFeatures']
-                if isinstance(features, list):
-                    features = ', '.join(features)
-                context_parts.append(f"Key Features: {features}")
-            if prop.get('address'):
-                context_parts.append(f"Address: {prop['address']}")
-            if prop.get('askingPrice') or prop.get('price'):
-                context_parts.append(f"Price: {prop.get('askingPrice') or prop.get('price')}")
-            if prop.get('bedrooms'):
-                context_parts.append(f"Bedrooms: {prop['bedrooms']}")
-            if prop.get('bathrooms'):
-                context_parts.append(f"Bathrooms: {prop['bathrooms']}")
-            if prop.get('propertyType'):
-                context_parts.append(f"Property Type: {prop['propertyType']}")
-            if prop.get('style'):
-                context_parts.append(f"Style: {prop['style']}")
-            if prop.get('listed'):
-                context_parts.append(f"Listed Status: {prop['listed']}")
-            if context_parts:
-                property_context = "\n\nPROPERTY CONTEXT:\n" + "\n".join(context_parts) + "\n\nYou MUST reference the key features listed above in your description. Do not write generic text — make it specific to THIS property."
-                logger.info(f"Injected property context: {property_context[:200]}...")
-
-        # Import shared guardrails
-        from services.guardrails import get_base_guardrails, get_room_specific_additions
-
-        # Build full prompt with enhanced guardrails
-        base_guardrails = get_base_guardrails(target_words)
-        room_additions = get_room_specific_additions()
-
-        full_prompt = f"""You are a professional property copywriter for Savills, writing natural, engaging property descriptions.
-
-{base_guardrails}
-
-{room_additions}
-{property_context}
-
-TASK:
-{prompt}
-
-Remember: Lead with facts, not feelings. Specific details, not vague praise."""
+        full_prompt = _build_room_prompt(prompt, target_words, session)
 
         # Directly call Claude with the custom prompt
         text = await claude_client.generate_completion(
             prompt=full_prompt,
             temperature=0.7,
-            max_tokens=800
+            max_tokens=800,
+            use_cache=not regenerate
         )
 
         word_count = len(text.split())
         logger.info(f"Generated room description: {word_count} words")
 
         # Calculate cost and update usage stats if session exists
-        usage_stats = None
-        if session:
-            input_tokens = len(full_prompt) // 4  # rough estimate
-            output_tokens = len(text) // 4
-            cost = (input_tokens * 0.003 / 1000) + (output_tokens * 0.015 / 1000)
-
-            # Update session usage stats
-            session.usage_stats['edits_count'] = session.usage_stats.get('edits_count', 0) + 1
-            session.usage_stats['total_cost_usd'] = session.usage_stats.get('total_cost_usd', 0.183) + cost
-
-            # Check if limit reached after this edit
-            if session.usage_stats['edits_count'] >= session.usage_stats.get('edit_limit', 100):
-                session.usage_stats['edit_limit_reached'] = True
-
-            # Save updated session
-            brochure_session_service.update_session(session_id, session)
-
-            usage_stats = {
-                "edits_count": session.usage_stats['edits_count'],
-                "edit_limit": session.usage_stats.get('edit_limit', 100),
-                "total_cost_usd": session.usage_stats['total_cost_usd'],
-                "edit_limit_reached": session.usage_stats.get('edit_limit_reached', False),
-                "this_request_cost_usd": cost
-            }
-
-            logger.info(f"✅ Room edit #{session.usage_stats['edits_count']}, cost: ${cost:.4f}, total: ${session.usage_stats['total_cost_usd']:.4f}")
+        usage_stats = _record_room_edit(session, session_id, full_prompt, text)
 
         return {
             "text": text,
@@ -796,6 +997,57 @@ Remember: Lead with facts, not feelings. Specific details, not vague praise."""
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
 
+@fastapi_app.post("/generate/room/stream")
+async def generate_room_description_stream(request: dict):
+    """
+    Streaming version of /generate/room.
+
+    Accepts the same body and returns server-sent events:
+    - delta: {"text": "..."} as Claude writes
+    - complete: the same payload /generate/room returns
+    - error: {"detail": "..."} if generation fails mid-stream
+    """
+    prompt = request.get("prompt", "")
+    target_words = request.get("target_words", 180)
+    session_id = request.get("session_id", None)
+    regenerate = bool(request.get("regenerate", False))
+
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+    if not claude_client or not claude_client.is_available():
+        raise HTTPException(status_code=503, detail="Claude API not available")
+
+    session = _load_session_for_edit(session_id)
+    full_prompt = _build_room_prompt(prompt, target_words, session)
+
+    logger.info(f"Streaming room description request: {prompt[:100]}...")
+
+    async def events():
+        chunks = []
+        try:
+            async for chunk in claude_client.stream_completion(
+                prompt=full_prompt,
+                temperature=0.7,
+                max_tokens=800,
+                use_cache=not regenerate
+            ):
+                chunks.append(chunk)
+                yield _sse_event("delta", {"text": chunk})
+
+            text = "".join(chunks)
+            usage_stats = _record_room_edit(session, session_id, full_prompt, text)
+            yield _sse_event("complete", {
+                "text": text,
+                "word_count": len(text.split()),
+                "usage_stats": usage_stats
+            })
+        except Exception as e:
+            logger.error(f"Room description streaming failed: {str(e)}")
+            yield _sse_event("error", {"detail": f"Generation failed: {str(e)}"})
+
+    return _sse_response(events())
+
+
 @fastapi_app.post("/generate/fast", response_model=GenerateResponse)
 async def generate_listing_fast(request: GenerateRequest):
     """
@@ -819,7 +1071,8 @@ async def generate_listing_fast(request: GenerateRequest):
             num_variants=1,
             enrichment_data=None,  # No enrichment for speed
             photo_analysis=request.photo_analysis,
-            brochure_sections=request.brochure_sections
+            brochure_sections=request.brochure_sections,
+            use_cache=not request.regenerate
         )
 
         metadata = {
@@ -946,6 +1199,52 @@ async def generate_uk_brochure(request: dict):
         )
 
 
+@fastapi_app.post("/generate/uk-brochure/stream")
+async def generate_uk_brochure_stream(request: dict):
+    """
+    Streaming version of /generate/uk-brochure.
+
+    Accepts the same body and returns server-sent events:
+    - delta: {"text": "..."} raw text as Claude writes
+    - section: {"key": "situation", "content": "..."} once a section is finished
+    - complete: the same payload /generate/uk-brochure returns
+    - error: {"detail": "..."} if generation fails mid-stream
+    """
+    logger.info("UK brochure streaming request received")
+
+    if not uk_brochure_generator:
+        raise HTTPException(
+            status_code=503,
+            detail="UK brochure generator not available"
+        )
+
+    property_data = request.get("property_data", {})
+    if not property_data:
+        raise HTTPException(
+            status_code=400,
+            detail="property_data is required"
+        )
+
+    async def events():
+        try:
+            async for event, payload in uk_brochure_generator.stream_brochure(
+                property_data=property_data,
+                location_data=request.get("location_data", {}),
+                photo_analysis=request.get("photo_analysis", []),
+                enrichment_data=request.get("enrichment_data", {}),
+                tone=request.get("tone", "premium")
+            ):
+                if event == "delta":
+                    yield _sse_event("delta", {"text": payload})
+                else:
+                    yield _sse_event(event, payload)
+        except Exception as e:
+            logger.error(f"UK brochure streaming failed: {str(e)}")
+            yield _sse_event("error", {"detail": f"UK brochure generation failed: {str(e)}"})
+
+    return _sse_response(events())
+
+
 @fastapi_app.post("/enrich", response_model=EnrichmentResponse)
 async def enrich_location(request: EnrichmentRequest):
     """
@@ -1220,50 +1519,216 @@ async def shrink_text(request: ShrinkRequest):
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
 
+def _group_prepared_uploads(indices: List[int], prepared: Dict[int, PreparedImage]) -> List[List[int]]:
+    """
+    Group uploads into near-duplicate clusters (representative first).
+
+    Returns singleton groups when duplicate detection is disabled.
+    """
+    if not settings.photo_dedup_enabled:
+        return [[index] for index in indices]
+    groups = group_near_duplicates(
+        [prepared[index].perceptual_hash for index in indices],
+        settings.photo_duplicate_threshold
+    )
+    return [[indices[position] for position in group] for group in groups]
+
+
+async def _analyze_duplicate_group(
+    group: List[int],
+    uploads: List[Tuple[str, bytes]],
+    prepared: Dict[int, PreparedImage],
+    semaphore: asyncio.Semaphore
+) -> List[ImageAnalysisResponse]:
+    """
+    Analyze a group's representative and reuse its result for the near-duplicates.
+
+    The group id is the representative's upload index.
+
+    Returns:
+        One ImageAnalysisResponse per group member, in group order
+    """
+    representative = group[0]
+    representative_filename = uploads[representative][0]
+    async with semaphore:
+        analysis = await vision_adapter.analyze_prepared(prepared[representative], representative_filename)
+
+    if len(group) == 1:
+        return [analysis]
+
+    results = [analysis.model_copy(update={"duplicate_group": representative})]
+    for index in group[1:]:
+        results.append(analysis.model_copy(update={
+            "filename": uploads[index][0],
+            "perceptual_hash": prepared[index].perceptual_hash,
+            "duplicate_group": representative,
+            "duplicate_of": representative_filename
+        }))
+    return results
+
+
+async def _prepare_uploads(
+    uploads: List[Tuple[str, bytes]]
+) -> Tuple[Dict[int, PreparedImage], List[Dict]]:
+    """
+    Validate and prepare uploads, keeping per-file failures instead of raising.
+
+    Returns:
+        (prepared images by upload index,
+         {"index", "filename", "status": "error", "error"} entries for the rest)
+    """
+    valid_indices = []
+    errors = []
+    for index, (filename, content) in enumerate(uploads):
+        try:
+            vision_adapter.validate_image(content, filename)
+            valid_indices.append(index)
+        except ValidationError as e:
+            logger.warning(f"Validation failed for {filename}: {str(e)}")
+            errors.append({"index": index, "filename": filename, "status": "error", "error": str(e)})
+
+    prepared_images = await asyncio.gather(
+        *(vision_adapter.prepare_image(uploads[index][1]) for index in valid_indices),
+        return_exceptions=True
+    )
+    prepared = {}
+    for index, result in zip(valid_indices, prepared_images):
+        if isinstance(result, Exception):
+            logger.error(f"Image preparation failed for {uploads[index][0]}: {str(result)}")
+            errors.append({"index": index, "filename": uploads[index][0], "status": "error", "error": f"Could not read image: {str(result)}"})
+        else:
+            prepared[index] = result
+    return prepared, errors
+
+
+async def _analyze_group_entries(
+    group: List[int],
+    uploads: List[Tuple[str, bytes]],
+    prepared: Dict[int, PreparedImage],
+    semaphore: asyncio.Semaphore
+) -> List[Dict]:
+    """
+    Analyze one near-duplicate group, returning per-file result entries instead of raising.
+
+    Returns:
+        {"index", "filename", "status": "ok", "analysis": {...}} or
+        {"index", "filename", "status": "error", "error": "..."} per member
+    """
+    try:
+        analyses = await _analyze_duplicate_group(group, uploads, prepared, semaphore)
+        return [
+            {"index": index, "filename": uploads[index][0], "status": "ok", "analysis": analysis.model_dump()}
+            for index, analysis in zip(group, analyses)
+        ]
+    except Exception as e:
+        logger.error(f"Image analysis failed for {uploads[group[0]][0]}: {str(e)}")
+        return [
+            {"index": index, "filename": uploads[index][0], "status": "error", "error": f"Analysis failed: {str(e)}"}
+            for index in group
+        ]
+
+
 @fastapi_app.post("/analyze-images")
-async def analyze_images(files: List[UploadFile] = File(...)):
+async def analyze_images(files: List[UploadFile] = File(...), stream: bool = False):
     """
     Analyze uploaded property images.
 
+    Images are analyzed concurrently; the shared rate limiter in the vision
+    client decides how many Claude calls actually run at once.
+
+    Near-duplicate photos (burst frames) are grouped by perceptual hash and
+    only one representative per group is sent to the vision provider; the
+    others get a copy of its analysis with duplicate_group (the
+    representative's upload index) and duplicate_of (its filename) set, so
+    the editor can collapse them.
+
+    With ?stream=true the response is NDJSON: one line per image as soon as
+    its analysis completes ({"index", "filename", "status": "ok", "analysis"}
+    or {"index", "filename", "status": "error", "error"}), then a final
+    {"status": "done", "total", "succeeded", "failed", "duplicates"} line. A
+    bad file only produces an error line; the rest of the batch carries on.
+
+    Without stream the response is a JSON list in upload order. A file that
+    fails validation or analysis gets an entry with error set (and no
+    attributes) instead of failing the whole upload.
+
     Args:
         files: List of image files to analyze
+        stream: Stream per-image NDJSON results as they complete
 
     Returns:
-        List[ImageAnalysisResponse]: Analysis results for each image
-
-    Raises:
-        HTTPException: If analysis fails
+        List[ImageAnalysisResponse]: Analysis results for each image, in upload order
+        (or a StreamingResponse when stream=true)
     """
-    logger.info(f"Image analysis request received: {len(files) if files else 0} files")
+    logger.info(f"Image analysis request received: {len(files) if files else 0} files (stream={stream})")
 
     if not files:
         raise HTTPException(status_code=422, detail="No files provided")
-    
-    try:
-        results = []
-        for file in files:
-            # Read file content
-            content = await file.read()
 
+    uploads = [(file.filename, await file.read()) for file in files]
+    # Enough images in flight to fill a vision batch for every concurrent call
+    semaphore = asyncio.Semaphore(max(1, settings.rate_limit_max_concurrency) * max(1, settings.vision_batch_size))
+
+    if stream:
+        async def ndjson_results():
+            prepared, invalid_entries = await _prepare_uploads(uploads)
+            for entry in invalid_entries:
+                yield json.dumps(entry) + "\n"
+
+            valid_indices = sorted(prepared)
+            groups = _group_prepared_uploads(valid_indices, prepared)
+
+            tasks = [
+                asyncio.create_task(_analyze_group_entries(group, uploads, prepared, semaphore))
+                for group in groups
+            ]
+            succeeded = 0
             try:
-                # Analyze image (rate limiting handled by GlobalRateLimiter in vision client)
-                analysis = await vision_adapter.analyze_image(
-                    image_data=content,
-                    filename=file.filename
-                )
-                results.append(analysis)
-            except ValidationError as e:
-                # Return validation error for specific file
-                logger.warning(f"Validation failed for {file.filename}: {str(e)}")
-                raise HTTPException(status_code=400, detail=f"{file.filename}: {str(e)}")
+                for next_done in asyncio.as_completed(tasks):
+                    for entry in await next_done:
+                        if entry["status"] == "ok":
+                            succeeded += 1
+                        yield json.dumps(entry) + "\n"
+
+                yield json.dumps({
+                    "status": "done",
+                    "total": len(uploads),
+                    "succeeded": succeeded,
+                    "failed": len(uploads) - succeeded,
+                    "duplicates": len(valid_indices) - len(groups)
+                }) + "\n"
+            finally:
+                # Client went away - stop paying for analyses nobody will read
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(
+            ndjson_results(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
 
-        return results
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Image analysis failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Image analysis failed: {str(e)}")
+    # Non-streaming: same per-file handling, collected into one list in
+    # upload order; a file that fails gets an entry with only error set
+    prepared, entries = await _prepare_uploads(uploads)
+    groups = _group_prepared_uploads(sorted(prepared), prepared)
+    for group_entries in await asyncio.gather(*(
+        _analyze_group_entries(group, uploads, prepared, semaphore) for group in groups
+    )):
+        entries.extend(group_entries)
+
+    results: List[Optional[ImageAnalysisResponse]] = [None] * len(uploads)
+    for entry in entries:
+        if entry["status"] == "ok":
+            results[entry["index"]] = ImageAnalysisResponse(**entry["analysis"])
+        else:
+            results[entry["index"]] = ImageAnalysisResponse(
+                filename=entry["filename"],
+                attributes=[],
+                suggested_caption="",
+                error=entry["error"]
+            )
+    return results
 
 
 @fastapi_app.post("/api/remove-background", response_model=BackgroundRemovalResponse)
@@ -1578,11 +2043,12 @@ Provide ONLY the rewritten text, no explanations or meta-commentary."""
             import random
             regenerated_text = random.choice(mock_variants)
         else:
-            # Call Claude
+            # Call Claude (always fresh - this is an explicit regenerate action)
             response = await claude_client.generate_completion(
                 prompt=prompt,
                 max_tokens=500,
-                temperature=0.8
+                temperature=0.8,
+                use_cache=False
             )
             regenerated_text = response.strip()
 
@@ -2066,6 +2532,109 @@ async def process_ai_command(request: dict):
         raise HTTPException(status_code=500, detail=f"AI command failed: {str(e)}")
 
 
+def _build_transform_prompt(request: TextTransformRequest) -> str:
+    """Build the Claude prompt for a text transformation request."""
+    # Build transformation prompt based on style
+    style_instructions = {
+        TextTransformationStyle.PARAGRAPH: "Rewrite this as flowing, elegant prose with smooth transitions between sentences.",
+        TextTransformationStyle.BULLET_POINTS: "Extract the key points and present them as a clean bullet point list. Start each point with '•'. Be concise and impactful.",
+        TextTransformationStyle.KEY_FEATURES: "Identify and highlight the 3-5 most compelling features. Present each as a short, punchy statement that emphasizes benefits.",
+        TextTransformationStyle.CONCISE: "Condense this text to be 30-40% shorter while preserving all key selling points. Make every word count.",
+        TextTransformationStyle.ELABORATE: "Expand this text with more vivid descriptions, sensory details, and lifestyle benefits. Make it 50% longer and more evocative.",
+        TextTransformationStyle.PROFESSIONAL: "Rewrite in a formal, professional tone suitable for corporate clients and high-end properties. Use simple, direct language like real estate agents. Include specific measurements and facts where possible.",
+        TextTransformationStyle.FRIENDLY: "Rewrite in a warm, welcoming tone that makes readers feel at home. Use inclusive language.",
+        TextTransformationStyle.LUXURY: "Rewrite in a luxury, boutique, lifestyle tone. Aspirational and sophisticated. Emphasize prestige, quality, exclusivity, and refined living. Use elegant but not flowery language.",
+        TextTransformationStyle.BOUTIQUE: "Rewrite in a boutique, lifestyle-focused tone. Warm, aspirational storytelling. Focus on experience and emotion. Paint a picture of lifestyle benefits.",
+        TextTransformationStyle.LIFESTYLE: "Rewrite with lifestyle-focused aspirational language. Emphasize how the space enhances daily living. Focus on experience, atmosphere, and quality of life.",
+        TextTransformationStyle.STRAIGHTFORWARD: "Rewrite in a basic, straightforward, factual style. Minimal adjectives. Focus on practical details and concrete facts. Simple, direct sentences like Savills.",
+        TextTransformationStyle.FACTUAL: "Rewrite using ONLY factual information. Remove ALL embellishment, flowery language, and subjective descriptions. Include measurements, dates, specific counts. Focus ONLY on structural features."
+    }
+
+    instruction = style_instructions.get(
+        request.transformation_style,
+        "Rewrite this text to improve clarity and impact."
+    )
+
+    # Add context from page type if available
+    context_note = ""
+    if request.page_type:
+        context_note = f"\n\nContext: This describes the {request.page_type} of a property."
+
+    # Add custom instruction if provided
+    if request.custom_instruction:
+        instruction += f"\n\nAdditional instruction: {request.custom_instruction}"
+
+    # Build the full prompt with Savills-style requirements
+    return f"""{instruction}{context_note}
+
+Page Title: {request.page_title}
+
+CRITICAL WRITING RULES (ALWAYS FOLLOW):
+1. Focus ONLY on STRUCTURAL features (built-ins, room sizes, windows, doors, architectural details)
+2. NEVER describe furniture, art, rugs, chandeliers, curtains, bedding, decorative items
+3. NEVER use AI phrases: "distinguished residence", "epitomises", "seamlessly blending", "sanctuary"
+4. NEVER use hyphens mid-sentence (e.g. "open-plan" → "open plan", "well-appointed" → "well appointed")
+5. Use SIMPLE language: "wonderfully presented", "excellent proportions", "lovely aspect"
+6. NO flowery descriptions: "restorative repose", "enchanting vistas", "morning contemplation"
+7. Include CONCRETE FACTS: measurements, dates, specific counts when possible
+8. Write SHORT, factual sentences. Professional but direct.
+
+Original Text:
+{request.original_text}
+
+Transformed Text:"""
+
+
+def _finish_transform(request: TextTransformRequest, session, prompt: str, transformed_text: str) -> TextTransformResponse:
+    """Charge a transform to the session's usage stats and build the before/after response."""
+    # Calculate cost and update usage stats if session exists
+    if session:
+        input_tokens = len(prompt) // 4  # rough estimate
+        output_tokens = len(transformed_text) // 4
+        cost = (input_tokens * 0.003 / 1000) + (output_tokens * 0.015 / 1000)
+
+        # Update session usage stats
+        session.usage_stats['transforms_count'] = session.usage_stats.get('transforms_count', 0) + 1
+        session.usage_stats['total_cost_usd'] = session.usage_stats.get('total_cost_usd', 0.183) + cost
+
+        # Save updated session
+        brochure_session_service.update_session(request.session_id, session)
+
+        logger.info(f"✅ Transform #{session.usage_stats['transforms_count']}, cost: ${cost:.4f}, total: ${session.usage_stats['total_cost_usd']:.4f}")
+
+    # Generate preview message
+    style_names = {
+        TextTransformationStyle.PARAGRAPH: "flowing prose",
+        TextTransformationStyle.BULLET_POINTS: "bullet points",
+        TextTransformationStyle.KEY_FEATURES: "key features",
+        TextTransformationStyle.CONCISE: "concise version",
+        TextTransformationStyle.ELABORATE: "detailed version",
+        TextTransformationStyle.PROFESSIONAL: "professional tone",
+        TextTransformationStyle.FRIENDLY: "friendly tone",
+        TextTransformationStyle.LUXURY: "luxury/boutique tone",
+        TextTransformationStyle.BOUTIQUE: "boutique/lifestyle tone",
+        TextTransformationStyle.LIFESTYLE: "lifestyle-focused tone",
+        TextTransformationStyle.STRAIGHTFORWARD: "straightforward/factual",
+        TextTransformationStyle.FACTUAL: "pure factual"
+    }
+
+    style_name = style_names.get(request.transformation_style, "new format")
+    preview_message = f"Transformed to {style_name}"
+
+    if len(transformed_text) < len(request.original_text) * 0.7:
+        preview_message += f" ({len(transformed_text)} chars, {int((1 - len(transformed_text)/len(request.original_text)) * 100)}% shorter)"
+    elif len(transformed_text) > len(request.original_text) * 1.3:
+        preview_message += f" ({len(transformed_text)} chars, {int((len(transformed_text)/len(request.original_text) - 1) * 100)}% longer)"
+
+    return TextTransformResponse(
+        original_text=request.original_text,
+        transformed_text=transformed_text,
+        transformation_style=request.transformation_style,
+        preview_message=preview_message,
+        success=True
+    )
+
+
 @fastapi_app.post("/api/transform-text", response_model=TextTransformResponse)
 async def transform_text(request: TextTransformRequest):
     """
@@ -2084,22 +2653,7 @@ async def transform_text(request: TextTransformRequest):
         logger.info(f"🤖 Text transformation request: {request.transformation_style} for '{request.page_title}'")
 
         # Check edit limit if session_id provided
-        session = None
-        if request.session_id and brochure_session_service:
-            try:
-                session = brochure_session_service.load_session(request.session_id)
-
-                # Check if edit limit reached
-                if session.usage_stats.get('edits_count', 0) >= session.usage_stats.get('edit_limit', 100):
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Edit limit of {session.usage_stats.get('edit_limit', 100)} reached for this brochure. Please contact support to increase your limit."
-                    )
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.warning(f"Failed to load session {request.session_id}: {e}")
-                session = None
+        session = _load_session_for_edit(request.session_id)
 
         # Check if Claude client is available
         if not claude_client or not claude_client.is_available():
@@ -2112,112 +2666,18 @@ async def transform_text(request: TextTransformRequest):
                 success=False
             )
 
-        # Build transformation prompt based on style
-        style_instructions = {
-            TextTransformationStyle.PARAGRAPH: "Rewrite this as flowing, elegant prose with smooth transitions between sentences.",
-            TextTransformationStyle.BULLET_POINTS: "Extract the key points and present them as a clean bullet point list. Start each point with '•'. Be concise and impactful.",
-            TextTransformationStyle.KEY_FEATURES: "Identify and highlight the 3-5 most compelling features. Present each as a short, punchy statement that emphasizes benefits.",
-            TextTransformationStyle.CONCISE: "Condense this text to be 30-40% shorter while preserving all key selling points. Make every word count.",
-            TextTransformationStyle.ELABORATE: "Expand this text with more vivid descriptions, sensory details, and lifestyle benefits. Make it 50% longer and more evocative.",
-            TextTransformationStyle.PROFESSIONAL: "Rewrite in a formal, professional tone suitable for corporate clients and high-end properties. Use simple, direct language like real estate agents. Include specific measurements and facts where possible.",
-            TextTransformationStyle.FRIENDLY: "Rewrite in a warm, welcoming tone that makes readers feel at home. Use inclusive language.",
-            TextTransformationStyle.LUXURY: "Rewrite in a luxury, boutique, lifestyle tone. Aspirational and sophisticated. Emphasize prestige, quality, exclusivity, and refined living. Use elegant but not flowery language.",
-            TextTransformationStyle.BOUTIQUE: "Rewrite in a boutique, lifestyle-focused tone. Warm, aspirational storytelling. Focus on experience and emotion. Paint a picture of lifestyle benefits.",
-            TextTransformationStyle.LIFESTYLE: "Rewrite with lifestyle-focused aspirational language. Emphasize how the space enhances daily living. Focus on experience, atmosphere, and quality of life.",
-            TextTransformationStyle.STRAIGHTFORWARD: "Rewrite in a basic, straightforward, factual style. Minimal adjectives. Focus on practical details and concrete facts. Simple, direct sentences like Savills.",
-            TextTransformationStyle.FACTUAL: "Rewrite using ONLY factual information. Remove ALL embellishment, flowery language, and subjective descriptions. Include measurements, dates, specific counts. Focus ONLY on structural features."
-        }
-
-        instruction = style_instructions.get(
-            request.transformation_style,
-            "Rewrite this text to improve clarity and impact."
-        )
-
-        # Add context from page type if available
-        context_note = ""
-        if request.page_type:
-            context_note = f"\n\nContext: This describes the {request.page_type} of a property."
-
-        # Add custom instruction if provided
-        if request.custom_instruction:
-            instruction += f"\n\nAdditional instruction: {request.custom_instruction}"
-
-        # Build the full prompt with Savills-style requirements
-        prompt = f"""{instruction}{context_note}
-
-Page Title: {request.page_title}
-
-CRITICAL WRITING RULES (ALWAYS FOLLOW):
-1. Focus ONLY on STRUCTURAL features (built-ins, room sizes, windows, doors, architectural details)
-2. NEVER describe furniture, art, rugs, chandeliers, curtains, bedding, decorative items
-3. NEVER use AI phrases: "distinguished residence", "epitomises", "seamlessly blending", "sanctuary"
-4. NEVER use hyphens mid-sentence (e.g. "open-plan" → "open plan", "well-appointed" → "well appointed")
-5. Use SIMPLE language: "wonderfully presented", "excellent proportions", "lovely aspect"
-6. NO flowery descriptions: "restorative repose", "enchanting vistas", "morning contemplation"
-7. Include CONCRETE FACTS: measurements, dates, specific counts when possible
-8. Write SHORT, factual sentences. Professional but direct.
-
-Original Text:
-{request.original_text}
-
-Transformed Text:"""
+        prompt = _build_transform_prompt(request)
 
         # Call Claude API
         try:
             response = await claude_client.generate_completion(
                 prompt=prompt,
                 max_tokens=1000,
-                temperature=0.7
+                temperature=0.7,
+                use_cache=not request.regenerate
             )
 
-            transformed_text = response.strip()
-
-            # Calculate cost and update usage stats if session exists
-            if session:
-                input_tokens = len(prompt) // 4  # rough estimate
-                output_tokens = len(transformed_text) // 4
-                cost = (input_tokens * 0.003 / 1000) + (output_tokens * 0.015 / 1000)
-
-                # Update session usage stats
-                session.usage_stats['transforms_count'] = session.usage_stats.get('transforms_count', 0) + 1
-                session.usage_stats['total_cost_usd'] = session.usage_stats.get('total_cost_usd', 0.183) + cost
-
-                # Save updated session
-                brochure_session_service.update_session(request.session_id, session)
-
-                logger.info(f"✅ Transform #{session.usage_stats['transforms_count']}, cost: ${cost:.4f}, total: ${session.usage_stats['total_cost_usd']:.4f}")
-
-            # Generate preview message
-            style_names = {
-                TextTransformationStyle.PARAGRAPH: "flowing prose",
-                TextTransformationStyle.BULLET_POINTS: "bullet points",
-                TextTransformationStyle.KEY_FEATURES: "key features",
-                TextTransformationStyle.CONCISE: "concise version",
-                TextTransformationStyle.ELABORATE: "detailed version",
-                TextTransformationStyle.PROFESSIONAL: "professional tone",
-                TextTransformationStyle.FRIENDLY: "friendly tone",
-                TextTransformationStyle.LUXURY: "luxury/boutique tone",
-                TextTransformationStyle.BOUTIQUE: "boutique/lifestyle tone",
-                TextTransformationStyle.LIFESTYLE: "lifestyle-focused tone",
-                TextTransformationStyle.STRAIGHTFORWARD: "straightforward/factual",
-                TextTransformationStyle.FACTUAL: "pure factual"
-            }
-
-            style_name = style_names.get(request.transformation_style, "new format")
-            preview_message = f"Transformed to {style_name}"
-
-            if len(transformed_text) < len(request.original_text) * 0.7:
-                preview_message += f" ({len(transformed_text)} chars, {int((1 - len(transformed_text)/len(request.original_text)) * 100)}% shorter)"
-            elif len(transformed_text) > len(request.original_text) * 1.3:
-                preview_message += f" ({len(transformed_text)} chars, {int((len(transformed_text)/len(request.original_text) - 1) * 100)}% longer)"
-
-            return TextTransformResponse(
-                original_text=request.original_text,
-                transformed_text=transformed_text,
-                transformation_style=request.transformation_style,
-                preview_message=preview_message,
-                success=True
-            )
+            return _finish_transform(request, session, prompt, response.strip())
 
         except Exception as api_error:
             logger.error(f"Claude API call failed: {api_error}")
@@ -2238,6 +2698,46 @@ Transformed Text:"""
         )
 
 
+@fastapi_app.post("/api/transform-text/stream")
+async def transform_text_stream(request: TextTransformRequest):
+    """
+    Streaming version of /api/transform-text.
+
+    Accepts the same body and returns server-sent events:
+    - delta: {"text": "..."} as Claude writes
+    - complete: the same payload /api/transform-text returns
+    - error: {"detail": "..."} if transformation fails mid-stream
+    """
+    logger.info(f"🤖 Streaming text transformation: {request.transformation_style} for '{request.page_title}'")
+
+    session = _load_session_for_edit(request.session_id)
+
+    if not claude_client or not claude_client.is_available():
+        raise HTTPException(status_code=503, detail="Claude API not available")
+
+    prompt = _build_transform_prompt(request)
+
+    async def events():
+        chunks = []
+        try:
+            async for chunk in claude_client.stream_completion(
+                prompt=prompt,
+                max_tokens=1000,
+                temperature=0.7,
+                use_cache=not request.regenerate
+            ):
+                chunks.append(chunk)
+                yield _sse_event("delta", {"text": chunk})
+
+            result = _finish_transform(request, session, prompt, "".join(chunks).strip())
+            yield _sse_event("complete", result.model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Text transformation streaming failed: {e}")
+            yield _sse_event("error", {"detail": f"Text transformation failed: {str(e)}"})
+
+    return _sse_response(events())
+
+
 @fastapi_app.post("/api/repurpose-brochure", response_model=RepurposeResponse)
 async def repurpose_brochure(request: RepurposeRequest):
     """
@@ -2353,7 +2853,8 @@ KEY_FEATURES:
             response = await claude_client.generate_completion(
                 prompt=prompt,
                 max_tokens=800,
-                temperature=0.7
+                temperature=0.7,
+                use_cache=not request.regenerate
             )
 
             # Calculate cost
@@ -3488,6 +3989,35 @@ async def search_epc_by_postcode(postcode: str, limit: int = 50):
         raise HTTPException(status_code=500, detail=f"EPC search failed: {str(e)}")
 
 
+@fastapi_app.get("/epc/address")
+async def search_epc_by_address(postcode: str, address: str, limit: int = 5):
+    """
+    Find the EPC certificate for a specific address
+
+    Addresses are matched on normalised tokens ("Flat 3, 12 High St" ~
+    "APARTMENT 3 12 HIGH STREET"); candidates are ranked by match_score
+    """
+    logger.info(f"EPC address request: postcode={postcode}")
+
+    if not epc_service or not epc_service.available:
+        raise HTTPException(status_code=503, detail="EPC service not available")
+
+    try:
+        candidates = await asyncio.to_thread(
+            epc_service.get_address_candidates, postcode, address, max(1, min(limit, 20))
+        )
+        return {
+            "postcode": postcode,
+            "address": address,
+            "count": len(candidates),
+            "candidates": candidates
+        }
+
+    except Exception as e:
+        logger.error(f"EPC address search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"EPC address search failed: {str(e)}")
+
+
 @fastapi_app.get("/epc/stats")
 async def get_epc_statistics():
     """Get EPC database statistics"""
@@ -3502,6 +4032,33 @@ async def get_epc_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@fastapi_app.get("/epc/area-stats")
+async def get_epc_area_statistics(postcode: str, rating: Optional[str] = None):
+    """
+    Energy efficiency aggregates for a postcode's sector and district
+
+    With a rating (A-G), also returns how that rating compares with homes
+    in the area, e.g. "more energy efficient than 72% of homes in SW1A 1"
+    """
+    if not epc_service or not epc_service.available:
+        raise HTTPException(status_code=503, detail="EPC service not available")
+    if rating is not None and parse_rating(rating) is None:
+        raise HTTPException(status_code=422, detail="rating must be a single EPC band (A-G)")
+
+    def area_statistics():
+        stats = epc_service.get_area_statistics(postcode)
+        if rating is not None:
+            stats["comparison"] = epc_service.compare_to_area(postcode, rating, stats)
+        return stats
+
+    try:
+        stats = await asyncio.to_thread(area_statistics)
+        return {"postcode": postcode, **stats}
+    except Exception as e:
+        logger.error(f"Failed to get EPC area stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # =============================================================================
 # SCHOOLS WITH OFSTED RATINGS ENDPOINTS
 # =============================================================================
@@ -3580,6 +4137,20 @@ async def get_schools_summary(latitude: float, longitude: float, radius_km: floa
 # LOCATION INTELLIGENCE ENDPOINT
 # =============================================================================
 
+# Initialize persistent location report cache (disk tier; the memory tier lives in the service)
+location_report_cache = None
+if settings.location_cache_enabled:
+    try:
+        location_report_cache = PersistentCache(
+            db_path=os.path.join(settings.cache_dir, "location_reports.db"),
+            max_size_mb=settings.location_cache_max_mb,
+            default_ttl_seconds=settings.location_cache_ttl_seconds
+        )
+        logger.info(f"Location report cache initialized ({location_report_cache.size()} entries)")
+    except Exception as e:
+        logger.warning(f"Failed to initialize location report cache: {e}")
+        location_report_cache = None
+
 # Initialize location intelligence service (uses OFFICIAL UK GOVERNMENT DATA)
 try:
     from services.location_intelligence import get_location_intelligence_service
@@ -3587,7 +4158,13 @@ try:
         schools_service=schools_service,       # Ofsted (gov.uk) - VERIFIED
         transport_service=transport_service,   # NaPTAN (DfT) - VERIFIED
         gp_service=gp_service,                 # NHS Digital - VERIFIED
-        places_client=places_client            # OpenStreetMap (crowdsourced)
+        places_client=places_client,           # OpenStreetMap (crowdsourced)
+        section_timeout_seconds=settings.location_section_timeout_seconds,
+        max_workers=settings.location_max_workers,
+        report_cache=location_report_cache,
+        memory_cache_size=settings.location_cache_memory_entries if settings.location_cache_enabled else 0,
+        cache_ttl_seconds=settings.location_cache_ttl_seconds,
+        cache_cell_degrees=settings.location_cache_cell_degrees
     )
     logger.info("Location intelligence service initialized with official UK government data")
 except Exception as e:
@@ -3599,7 +4176,8 @@ except Exception as e:
 async def get_location_intelligence(
     latitude: float,
     longitude: float,
-    radius_km: float = 1.6
+    radius_km: float = 1.6,
+    refresh: bool = False
 ):
     """
     Get comprehensive location intelligence for a property.
@@ -3612,6 +4190,7 @@ async def get_location_intelligence(
     - Leisure amenities (parks, pubs, restaurants)
 
     Returns verified positive data only, suitable for property marketing.
+    Reports are cached per ~200m cell; pass refresh=true to recompute.
     """
     if not location_intelligence:
         raise HTTPException(
@@ -3623,7 +4202,8 @@ async def get_location_intelligence(
         report = await location_intelligence.get_full_location_report(
             latitude=latitude,
             longitude=longitude,
-            radius_km=radius_km
+            radius_km=radius_km,
+            use_cache=not refresh
         )
         return report
     except Exception as e:
@@ -3631,6 +4211,99 @@ async def get_location_intelligence(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@fastapi_app.post("/location/intelligence/batch")
+async def get_location_intelligence_batch(request: LocationBatchRequest):
+    """
+    Location intelligence for many properties, e.g. a newly onboarded portfolio.
+
+    Each location is a postcode or latitude/longitude. Properties in the
+    same ~200m cache cell share one report, and every completed report
+    section is written to the location cache so later single-property
+    requests are instant.
+
+    The response is NDJSON, one line per property as soon as its report is
+    ready ({"index", "status": "ok", "postcode", "latitude", "longitude",
+    "report"} or {"index", "status": "error", "error"}), then a final
+    {"status": "done", "total", "succeeded", "failed", "complete",
+    "incomplete"} line. Incomplete reports had a section time out (usually
+    OpenStreetMap behind its rate limit); re-running the batch fills them in.
+
+    Args:
+        request: LocationBatchRequest with locations, radius and refresh flag
+
+    Returns:
+        StreamingResponse of NDJSON results
+    """
+    if not location_intelligence:
+        raise HTTPException(
+            status_code=503,
+            detail="Location intelligence service not available"
+        )
+    if len(request.locations) > settings.location_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.location_batch_max_items} locations per batch"
+        )
+
+    async def ndjson_results():
+        succeeded = 0
+        complete = 0
+        async for entry in location_intelligence.iter_batch_reports(
+            [item.model_dump() for item in request.locations],
+            radius_km=request.radius_km,
+            geocoder=geocoding_client,
+            concurrency=settings.location_batch_concurrency,
+            use_cache=not request.refresh
+        ):
+            if entry["status"] == "ok":
+                succeeded += 1
+                if entry["report"].get("complete"):
+                    complete += 1
+            yield json.dumps(entry) + "\n"
+
+        yield json.dumps({
+            "status": "done",
+            "total": len(request.locations),
+            "succeeded": succeeded,
+            "failed": len(request.locations) - succeeded,
+            "complete": complete,
+            "incomplete": succeeded - complete
+        }) + "\n"
+
+    return StreamingResponse(
+        ndjson_results(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@fastapi_app.get("/api/sqlite-pool/stats")
+async def sqlite_pool_stats():
+    """
+    Get open connections and reuse counters for the pooled read-only
+    connections to the EPC, schools, NaPTAN and GP databases.
+
+    Returns:
+        Dict of pool stats keyed by database file name
+    """
+    return pool_stats()
+
+
+@fastapi_app.get("/api/location-cache/stats")
+async def location_cache_stats():
+    """
+    Get hit counters for the location report cache.
+
+    Returns:
+        Dict with enabled flag and cache stats
+    """
+    stats = location_intelligence.cache_stats() if location_intelligence else None
+    return {
+        "enabled": stats is not None,
+        "stats": stats
+    }
+
+
 # =============================================================================
 # BROCHURE EDITING SESSION ENDPOINTS
 # =============================================================================
@@ -3673,6 +4346,35 @@ async def debug_brochure_session(request: Request):
         traceback.print_exc()
         return {"error": str(e)}
 
+def _assign_photo_duplicate_groups(photos: List[BrochurePhoto]) -> int:
+    """
+    Hash session photos and mark near-duplicate groups so the editor can collapse them.
+
+    Photos that already carry a perceptual_hash (from /analyze-images) are not
+    re-decoded. Duplicates without analysis inherit their representative's.
+
+    Returns:
+        Number of photos marked as duplicates of another
+    """
+    for photo in photos:
+        if not photo.perceptual_hash:
+            photo.perceptual_hash = dhash_data_url(photo.dataUrl, settings.vision_max_dimension)
+
+    duplicates = 0
+    groups = group_near_duplicates([photo.perceptual_hash for photo in photos], settings.photo_duplicate_threshold)
+    for group in groups:
+        if len(group) == 1:
+            continue
+        representative = photos[group[0]]
+        for index in group:
+            photos[index].duplicate_group = group[0]
+        for index in group[1:]:
+            if not photos[index].analysis and representative.analysis:
+                photos[index].analysis = dict(representative.analysis)
+            duplicates += 1
+    return duplicates
+
+
 @fastapi_app.post("/api/brochure/session", response_model=BrochureSessionResponse)
 async def create_brochure_session(request: BrochureSessionCreateRequest):
     """
@@ -3718,6 +4420,14 @@ async def create_brochure_session(request: BrochureSessionCreateRequest):
             logger.info(f"    has analysis: {hasattr(first_photo, 'analysis')}")
             logger.info(f"    analysis value: {first_photo.analysis if hasattr(first_photo, 'analysis') else 'NO ATTRIBUTE'}")
 
+        # Group near-duplicate photos (base64 decode + hash is CPU-bound)
+        if settings.photo_dedup_enabled and session_data.photos:
+            try:
+                duplicates = await asyncio.to_thread(_assign_photo_duplicate_groups, session_data.photos)
+                logger.info(f"🔁 {duplicates}/{len(session_data.photos)} photos are near-duplicates")
+            except Exception as e:
+                logger.warning(f"Failed to group duplicate photos: {e}. Continuing without groups.")
+
         # Score photos for hero page selection
         try:
             scorer = get_photo_scorer()
@@ -165,6 +165,7 @@ class GenerateRequest(BaseModel):
     photo_assignments: Optional[PhotoAssignments] = Field(default=None, description="Photo category assignments for brochure pages")
     photo_analysis: Optional[PhotoAnalysisData] = Field(default=None, description="Vision AI analysis of uploaded photos")
     brochure_sections: Optional[Dict[str, Any]] = Field(default=None, description="Section-specific photo mappings for coordinated text generation")
+    regenerate: bool = Field(default=False, description="Bypass the LLM response cache and generate fresh copy")
 
 
 class GeneratedVariant(BaseModel):
@@ -251,6 +252,10 @@ class ImageAnalysisResponse(BaseModel):
     room_type: Optional[str] = None
     attributes: List[ImageAttribute]
     suggested_caption: str
+    perceptual_hash: Optional[str] = None  # 64-bit dHash (hex) for near-duplicate detection
+    duplicate_group: Optional[int] = None  # Shared by near-identical photos in the same upload
+    duplicate_of: Optional[str] = None  # Filename whose analysis was reused for this near-duplicate
+    error: Optional[str] = None  # Set (with no attributes) when this file could not be analyzed
 
 
 class EnrichmentRequest(BaseModel):
@@ -305,6 +310,27 @@ class PostcodeAutocompleteResponse(BaseModel):
     addresses: List[AddressSuggestion]
 
 
+class LocationBatchItem(BaseModel):
+    """One property in a batch location intelligence request."""
+    postcode: Optional[str] = Field(None, description="UK postcode (used if coordinates are not given)")
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode='after')
+    def require_location(self):
+        """Each item needs a postcode or both coordinates."""
+        if self.postcode is None and (self.latitude is None or self.longitude is None):
+            raise ValueError("Provide a postcode or both latitude and longitude")
+        return self
+
+
+class LocationBatchRequest(BaseModel):
+    """Request for location intelligence on many properties at once."""
+    locations: List[LocationBatchItem] = Field(..., min_length=1)
+    radius_km: float = Field(1.6, gt=0, le=10)
+    refresh: bool = Field(False, description="Recompute instead of using cached reports")
+
+
 class AddressLookupRequest(BaseModel):
     """Request for full address lookup."""
     postcode: str = Field(..., description="Full UK postcode (e.g., 'GU6 7HH', 'M1 4BT')")
@@ -462,6 +488,8 @@ class BrochurePhoto(BaseModel):
     height: Optional[int] = Field(default=None, description="Image height in pixels")
     analysis: Optional[Dict[str, Any]] = Field(default=None, description="Vision AI analysis: {attributes: [...], caption: str, room_type: str}")
     impact_score: Optional[float] = Field(default=None, description="Photo impact score 0-100 (higher = better for hero page)")
+    perceptual_hash: Optional[str] = Field(default=None, description="64-bit dHash (hex) for near-duplicate detection")
+    duplicate_group: Optional[int] = Field(default=None, description="Group shared by near-identical photos (None if unique)")
 
 
 class BrochurePage(BaseModel):
@@ -545,6 +573,7 @@ class TextTransformRequest(BaseModel):
     custom_instruction: Optional[str] = Field(default=None, description="Additional custom instructions")
     page_type: Optional[str] = Field(default=None, description="Type of page (e.g., 'kitchen', 'bedroom')")
     session_id: Optional[str] = Field(default=None, description="Brochure session ID for usage tracking")
+    regenerate: bool = Field(default=False, description="Bypass the LLM response cache and generate fresh text")
 
 
 class TextTransformResponse(BaseModel):
@@ -564,6 +593,7 @@ class RepurposeRequest(BaseModel):
     """Request to repurpose brochure content for different platforms."""
     session_id: str = Field(description="Brochure session ID to repurpose from")
     platforms: List[str] = Field(description="List of platforms: 'rightmove', 'zoopla', 'onthemarket', 'facebook', 'instagram', 'linkedin', 'email'")
+    regenerate: bool = Field(default=False, description="Bypass the LLM response cache and generate fresh content")
 
 
 class PlatformContent(BaseModel):
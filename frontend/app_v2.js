@@ -4528,11 +4528,15 @@ async function analyzePhotosForFeatures() {
 
                 if (response.ok) {
                     const batchResults = await response.json();
-                    analysisResults.push(...batchResults);
 
-                    // Mark these photos as analyzed
-                    batch.forEach(photo => {
-                        window.analyzedPhotoIds.add(photo.id);
+                    // Mark these photos as analyzed; results come back in upload order
+                    batchResults.forEach((result, idx) => {
+                        if (result.error) {
+                            failedPhotos.push(batch[idx].name);
+                            return;
+                        }
+                        analysisResults.push(result);
+                        window.analyzedPhotoIds.add(batch[idx].id);
                     });
 
                     console.log(`✅ Batch ${batchNumber}/${totalBatches} complete (${analysisResults.length}/${totalPhotos} photos analyzed)`);
@@ -1521,6 +1521,10 @@ async function autoAssignPhotos() {
         let assignedCount = 0;
 
         analysisResults.forEach((result, photoIndex) => {
+            if (result.error) {
+                console.warn(`Photo ${photoIndex} could not be analyzed: ${result.error}`);
+                return;
+            }
             const roomType = result.room_type;
             console.log(`Photo ${photoIndex}: ${roomType}`);
 
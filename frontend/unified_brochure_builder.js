@@ -262,7 +262,8 @@ async function syncPhotosToUnifiedState() {
 
             if (apiResponse.ok) {
                 const batchResults = await apiResponse.json();
-                visionAnalysis.push(...batchResults);
+                // Files the server couldn't analyze fall back like a failed batch
+                visionAnalysis.push(...batchResults.map(result => (result && result.error) ? null : result));
                 console.log(`   ✅ Batch ${Math.floor(i/BATCH_SIZE) + 1} complete: ${batchResults.length} photos analyzed`);
             } else {
                 console.warn(`   ⚠️ Batch ${Math.floor(i/BATCH_SIZE) + 1} failed, using filename fallback for these photos`);
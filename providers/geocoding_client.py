@@ -1,11 +1,18 @@
 """
 Geocoding client for UK postcodes using postcodes.io API.
 Free, no API key required, UK-specific.
+
+When the local postcode directory is built (see
+scripts/build_postcode_directory.py), lookups and autocomplete are answered
+from it and postcodes.io is only used if the directory is unavailable.
 """
+import asyncio
 import httpx
 import logging
 from typing import Optional
 
+from services.postcode_directory import PostcodeDirectory
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,14 +26,24 @@ class GeocodingClient:
     
     BASE_URL = "https://api.postcodes.io"
     
-    def __init__(self, timeout_seconds: int = 10):
+    def __init__(
+        self,
+        timeout_seconds: int = 10,
+        directory: Optional[PostcodeDirectory] = None,
+        remote_fallback: bool = False
+    ):
         """
         Initialize the geocoding client.
         
         Args:
             timeout_seconds: HTTP request timeout
+            directory: Optional local postcode directory, used before postcodes.io
+            remote_fallback: Also ask postcodes.io about postcodes missing from
+                the directory (e.g. ones newer than the ONSPD release)
         """
         self.timeout = timeout_seconds
+        self.directory = directory if directory is not None and directory.available else None
+        self.remote_fallback = remote_fallback
         self.client = httpx.AsyncClient(timeout=self.timeout)
     
     async def close(self):
@@ -50,6 +67,14 @@ class GeocodingClient:
             - country: str
             Returns None if postcode not found or API error.
         """
+        if self.directory is not None:
+            try:
+                result = await asyncio.to_thread(self.directory.lookup, postcode)
+                if result is not None or not self.remote_fallback:
+                    return result
+            except Exception as e:
+                logger.warning(f"Postcode directory lookup failed: {e}")
+
         # Normalize postcode (remove spaces, uppercase)
         normalized = postcode.replace(" ", "").upper()
         
@@ -112,6 +137,23 @@ class GeocodingClient:
             - district: str
             Returns empty list if no matches or API error.
         """
+        if self.directory is not None:
+            try:
+                addresses = [
+                    {
+                        "postcode": details["postcode"],
+                        "district": details.get("district", ""),
+                        "county": details.get("county", ""),
+                        "latitude": details["latitude"],
+                        "longitude": details["longitude"],
+                    }
+                    for details in await asyncio.to_thread(self.directory.autocomplete, partial_postcode, 10)
+                ]
+                if addresses or not self.remote_fallback:
+                    return addresses
+            except Exception as e:
+                logger.warning(f"Postcode directory autocomplete failed: {e}")
+
         # Normalize postcode (remove extra spaces, uppercase)
         normalized = partial_postcode.strip().upper()
 
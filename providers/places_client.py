@@ -3,28 +3,22 @@ Places client for Overpass API (OpenStreetMap data).
 Free, no API key required, worldwide coverage.
 
 Enhanced with branded supermarkets and estate agent relevant POIs.
+
+When an offline OSM amenity store is configured (see
+scripts/build_osm_amenities.py), lookups are answered locally and the
+Overpass API is only used as an optional fallback.
 """
+import asyncio
 import httpx
 import logging
-import math
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Sequence, Tuple
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
-logger = logging.getLogger(__name__)
-
-
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in km."""
-    R = 6371  # Earth's radius in km
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+from services.distance_utils import haversine_km
+from services.osm_amenity_store import OSMAmenityStore
+from services.rate_limiter import GlobalRateLimiter, limited, retry_after_seconds
 
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-    return R * c
+logger = logging.getLogger(__name__)
 
 
 class PlacesClient:
@@ -43,6 +37,12 @@ class PlacesClient:
 
     BASE_URL = "https://overpass-api.de/api/interpreter"
 
+    # Budget key in the shared rate limiter
+    RATE_LIMIT_KEY = "overpass"
+
+    # Derived element emitted before each category's results in combined queries
+    MARKER_TYPE = "category"
+
     # Branded supermarket indicators (Waitrose = affluent area)
     SUPERMARKET_BRANDS = {
         "waitrose": "Waitrose",
@@ -107,19 +107,99 @@ class PlacesClient:
         "atms": '["amenity"="atm"]',
     }
     
-    def __init__(self, timeout_seconds: int = 10):
+    def __init__(
+        self,
+        timeout_seconds: int = 10,
+        rate_limiter: Optional[GlobalRateLimiter] = None,
+        amenity_store: Optional[OSMAmenityStore] = None,
+        overpass_fallback: bool = True
+    ):
         """
         Initialize the places client.
         
         Args:
             timeout_seconds: HTTP request timeout
+            rate_limiter: Optional limiter shared by every Overpass caller
+            amenity_store: Optional offline OSM store, used before Overpass
+            overpass_fallback: Query Overpass for anything the store can't answer
         """
         self.timeout = timeout_seconds
+        self.rate_limiter = rate_limiter
+        self.amenity_store = amenity_store if amenity_store is not None and amenity_store.available else None
+        self.overpass_fallback = overpass_fallback
         self.client = httpx.AsyncClient(timeout=self.timeout)
     
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
+
+    async def _post_query(self, overpass_query: str) -> httpx.Response:
+        """
+        POST a query through the shared limiter.
+
+        429/504 responses pause every Overpass caller (honouring retry-after)
+        and raise HTTPStatusError so the tenacity retry kicks in.
+        """
+        async with limited(self.rate_limiter, self.RATE_LIMIT_KEY):
+            response = await self.client.post(
+                self.BASE_URL,
+                data={"data": overpass_query}
+            )
+
+        if response.status_code in [429, 504]:
+            logger.warning(f"Overpass API {response.status_code}, will retry...")
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.report_rate_limited(self.RATE_LIMIT_KEY, retry_after_seconds(e))
+                raise
+
+        if response.status_code == 200 and self.rate_limiter is not None:
+            self.rate_limiter.report_success(self.RATE_LIMIT_KEY)
+        return response
+
+    async def _search_store(
+        self,
+        latitude: float,
+        longitude: float,
+        categories: Sequence[str],
+        radius_meters: int
+    ) -> Optional[Dict[str, List[dict]]]:
+        """
+        Answer from the offline store if it covers every category.
+
+        The R*Tree query runs in a worker thread to keep the event loop free.
+
+        Returns:
+            Dict of category -> POI list, or None to fall back to Overpass
+        """
+        if self.amenity_store is None or not self.amenity_store.covers(categories):
+            return None
+        try:
+            return await asyncio.to_thread(
+                self.amenity_store.search_many, latitude, longitude, categories, radius_meters
+            )
+        except Exception as e:
+            logger.warning(f"OSM amenity store query failed: {e}")
+            return None
+
+    @staticmethod
+    def _element_location(element: Dict) -> Optional[Tuple[str, float, float]]:
+        """(name, lat, lon) of a node or way (using its center), or None."""
+        name = element.get("tags", {}).get("name", "Unnamed")
+        if element.get("type") == "node":
+            lat = element.get("lat")
+            lon = element.get("lon")
+        elif element.get("type") == "way":
+            center = element.get("center", {})
+            lat = center.get("lat")
+            lon = center.get("lon")
+        else:
+            return None
+        if lat is None or lon is None:
+            return None
+        return name, lat, lon
     
     @retry(
         stop=stop_after_attempt(3),
@@ -154,6 +234,12 @@ class PlacesClient:
         if category not in self.CATEGORY_QUERIES:
             logger.warning(f"Unknown category: {category}")
             return []
+
+        local = await self._search_store(latitude, longitude, [category], radius_meters)
+        if local is not None:
+            return local[category]
+        if not self.overpass_fallback:
+            return []
         
         query_filter = self.CATEGORY_QUERIES[category]
         
@@ -170,15 +256,7 @@ class PlacesClient:
         try:
             logger.info(f"Searching {category} near ({latitude}, {longitude})")
             
-            response = await self.client.post(
-                self.BASE_URL,
-                data={"data": overpass_query}
-            )
-
-            # Raise exception for 429/504 to trigger retry
-            if response.status_code in [429, 504]:
-                logger.warning(f"Overpass API {response.status_code}, will retry...")
-                response.raise_for_status()
+            response = await self._post_query(overpass_query)
 
             if response.status_code != 200:
                 logger.error(f"Overpass API error: {response.status_code}")
@@ -189,24 +267,10 @@ class PlacesClient:
             
             pois = []
             for element in elements:
-                # Extract name
-                name = element.get("tags", {}).get("name", "Unnamed")
-                
-                # Extract coordinates
-                if element.get("type") == "node":
-                    lat = element.get("lat")
-                    lon = element.get("lon")
-                elif element.get("type") == "way":
-                    # For ways, use center point
-                    center = element.get("center", {})
-                    lat = center.get("lat")
-                    lon = center.get("lon")
-                else:
-                    continue
-                
-                if lat is None or lon is None:
+                location = self._element_location(element)
+                if location is None:
                     continue
-                
+                name, lat, lon = location
                 pois.append({
                     "name": name,
                     "latitude": lat,
@@ -227,6 +291,123 @@ class PlacesClient:
             logger.error(f"Unexpected Overpass API error: {e}")
             return []
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=2, min=4, max=30),
+        retry=retry_if_exception_type((httpx.HTTPStatusError, httpx.TimeoutException)),
+        reraise=True
+    )
+    async def search_many(
+        self,
+        latitude: float,
+        longitude: float,
+        categories: Sequence[str],
+        radius_meters: int = 1600
+    ) -> Dict[str, List[dict]]:
+        """
+        Search several categories with one combined Overpass query.
+
+        Each category's results are preceded by a marker element tagged with
+        the category name, so the response is split client-side. Categories
+        run in order on the server; if it times out part-way through, the
+        categories that finished are still returned.
+
+        Args:
+            latitude: Center point latitude
+            longitude: Center point longitude
+            categories: Categories to search (keys of CATEGORY_QUERIES)
+            radius_meters: Search radius in meters
+
+        Returns:
+            Dict of category -> POI list (same shape as search_nearby) for
+            every category that completed. Categories missing from the dict
+            failed or timed out and should not be treated as empty.
+        """
+        categories = [c for c in dict.fromkeys(categories) if c in self.CATEGORY_QUERIES]
+        if not categories:
+            return {}
+
+        local = await self._search_store(latitude, longitude, categories, radius_meters)
+        if local is not None:
+            return local
+        if not self.overpass_fallback:
+            return {}
+
+        # Leave the server enough time to report a timeout before the client gives up
+        server_timeout = max(1, int(self.timeout) - 2)
+        statements = [f"[out:json][timeout:{server_timeout}];"]
+        for category in categories:
+            query_filter = self.CATEGORY_QUERIES[category]
+            statements.append(f"""
+        make {self.MARKER_TYPE} name="{category}";
+        out;
+        (
+          node{query_filter}(around:{radius_meters},{latitude},{longitude});
+          way{query_filter}(around:{radius_meters},{latitude},{longitude});
+        );
+        out center;""")
+        overpass_query = "".join(statements)
+
+        try:
+            logger.info(f"Searching {len(categories)} categories near ({latitude}, {longitude})")
+
+            response = await self._post_query(overpass_query)
+
+            if response.status_code != 200:
+                logger.error(f"Overpass API error: {response.status_code}")
+                return {}
+
+            data = response.json()
+        except httpx.TimeoutException:
+            logger.error(f"Overpass API timeout for {len(categories)} categories")
+            return {}
+        except httpx.RequestError as e:
+            logger.error(f"Overpass API request error: {e}")
+            return {}
+        except httpx.HTTPStatusError:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected Overpass API error: {e}")
+            return {}
+
+        results: Dict[str, List[dict]] = {}
+        current = None
+        for element in data.get("elements", []):
+            if element.get("type") == self.MARKER_TYPE:
+                current = element.get("tags", {}).get("name")
+                if current in self.CATEGORY_QUERIES:
+                    results[current] = []
+                else:
+                    current = None
+                continue
+            if current is None:
+                continue
+            location = self._element_location(element)
+            if location is None:
+                continue
+            name, lat, lon = location
+            results[current].append({
+                "name": name,
+                "latitude": lat,
+                "longitude": lon,
+                "type": current,
+            })
+
+        remark = data.get("remark")
+        if remark:
+            # Runtime error (usually the server timeout): the category being
+            # output when it hit may be cut short
+            if current is not None:
+                results.pop(current, None)
+            logger.warning(
+                f"Overpass partial result ({len(results)}/{len(categories)} categories): {remark}"
+            )
+        else:
+            logger.info(
+                "Found " + ", ".join(f"{len(pois)} {category}" for category, pois in results.items()) + " nearby"
+            )
+        return results
+
     async def search_with_distance(
         self,
         latitude: float,
@@ -240,7 +421,29 @@ class PlacesClient:
         Returns list sorted by distance with distance_km and distance_miles added.
         """
         pois = await self.search_nearby(latitude, longitude, category, radius_meters)
+        return self._with_distance(latitude, longitude, pois)
+
+    async def search_many_with_distance(
+        self,
+        latitude: float,
+        longitude: float,
+        categories: Sequence[str],
+        radius_meters: int = 1600
+    ) -> Dict[str, List[Dict]]:
+        """
+        search_many() with distances added; each list sorted by distance.
 
+        Categories that didn't complete come back as empty lists.
+        """
+        results = await self.search_many(latitude, longitude, categories, radius_meters)
+        return {
+            category: self._with_distance(latitude, longitude, results.get(category, []))
+            for category in categories
+        }
+
+    @staticmethod
+    def _with_distance(latitude: float, longitude: float, pois: List[Dict]) -> List[Dict]:
+        """Add distance_km/distance_miles to each POI and sort nearest first."""
         for poi in pois:
             dist_km = haversine_km(latitude, longitude, poi['latitude'], poi['longitude'])
             poi['distance_km'] = round(dist_km, 2)
@@ -265,38 +468,42 @@ class PlacesClient:
         - budget: List of Aldi, Lidl, Co-op
         - nearest_premium: Closest premium supermarket (if any)
         - highlights: List of text highlights for brochure
+        - complete: False if any brand's search failed or timed out (the
+          lists are then partial, not a sign there are no such shops)
         """
         result = {
             'premium': [],
             'major': [],
             'budget': [],
             'nearest_premium': None,
-            'highlights': []
+            'highlights': [],
+            'complete': False
         }
 
         # Search each brand category
         premium_brands = ['waitrose', 'marks_and_spencer']
         major_brands = ['sainsburys', 'tesco', 'morrisons', 'asda']
         budget_brands = ['aldi', 'lidl', 'coop']
+        brands = premium_brands + major_brands + budget_brands
 
-        all_supermarkets = []
-
-        for brand in premium_brands + major_brands + budget_brands:
-            try:
-                pois = await self.search_with_distance(latitude, longitude, brand, radius_meters)
-                for poi in pois:
-                    poi['brand'] = self.SUPERMARKET_BRANDS.get(brand, brand)
-                    all_supermarkets.append(poi)
-
-                    if brand in premium_brands:
-                        result['premium'].append(poi)
-                    elif brand in major_brands:
-                        result['major'].append(poi)
-                    else:
-                        result['budget'].append(poi)
-            except Exception as e:
-                logger.warning(f"Error searching {brand}: {e}")
-                continue
+        try:
+            found = await self.search_many(latitude, longitude, brands, radius_meters)
+        except Exception as e:
+            logger.warning(f"Error searching supermarkets: {e}")
+            found = {}
+        result['complete'] = all(brand in found for brand in brands)
+
+        for brand, pois in found.items():
+            pois = self._with_distance(latitude, longitude, pois)
+            for poi in pois:
+                poi['brand'] = self.SUPERMARKET_BRANDS.get(brand, brand)
+
+                if brand in premium_brands:
+                    result['premium'].append(poi)
+                elif brand in major_brands:
+                    result['major'].append(poi)
+                else:
+                    result['budget'].append(poi)
 
         # Sort each category by distance
         for key in ['premium', 'major', 'budget']:
@@ -345,22 +552,16 @@ class PlacesClient:
         }
 
         try:
-            # Train stations (comprehensive search)
-            result['stations'] = await self.search_with_distance(
-                latitude, longitude, 'train_stations', radius_meters
+            found = await self.search_many_with_distance(
+                latitude, longitude, ['train_stations', 'stations', 'tube_stations'], radius_meters
             )
-            # Fallback to general stations if train_stations empty
-            if not result['stations']:
-                result['stations'] = await self.search_with_distance(
-                    latitude, longitude, 'stations', radius_meters
-                )
+            # Train stations (comprehensive search), falling back to general stations
+            result['stations'] = found['train_stations'] or found['stations']
             if result['stations']:
                 result['nearest_station'] = result['stations'][0]
 
             # Tube stations (London)
-            result['tube_stations'] = await self.search_with_distance(
-                latitude, longitude, 'tube_stations', radius_meters
-            )
+            result['tube_stations'] = found['tube_stations']
             if result['tube_stations']:
                 result['nearest_tube'] = result['tube_stations'][0]
 
@@ -403,15 +604,9 @@ class PlacesClient:
         }
 
         try:
-            result['gp_surgeries'] = await self.search_with_distance(
-                latitude, longitude, 'gp_surgeries', radius_meters
-            )
-            result['pharmacies'] = await self.search_with_distance(
-                latitude, longitude, 'pharmacies', radius_meters
-            )
-            result['dentists'] = await self.search_with_distance(
-                latitude, longitude, 'dentists', radius_meters
-            )
+            result.update(await self.search_many_with_distance(
+                latitude, longitude, ['gp_surgeries', 'pharmacies', 'dentists'], radius_meters
+            ))
         except Exception as e:
             logger.warning(f"Error searching medical: {e}")
 
@@ -432,6 +627,8 @@ class PlacesClient:
     ) -> Dict:
         """
         Search for leisure facilities near a location.
+
+        complete is False if any category's search failed or timed out.
         """
         result = {
             'parks': [],
@@ -439,27 +636,19 @@ class PlacesClient:
             'restaurants': [],
             'pubs': [],
             'cafes': [],
-            'highlights': []
+            'highlights': [],
+            'complete': False
         }
+        categories = ['parks', 'pubs', 'restaurants', 'cafes', 'gyms']
 
         try:
-            result['parks'] = await self.search_with_distance(
-                latitude, longitude, 'parks', radius_meters
-            )
-            result['pubs'] = await self.search_with_distance(
-                latitude, longitude, 'pubs', radius_meters
-            )
-            result['restaurants'] = await self.search_with_distance(
-                latitude, longitude, 'restaurants', radius_meters
-            )
-            result['cafes'] = await self.search_with_distance(
-                latitude, longitude, 'cafes', radius_meters
-            )
-            result['gyms'] = await self.search_with_distance(
-                latitude, longitude, 'gyms', radius_meters
-            )
+            found = await self.search_many(latitude, longitude, categories, radius_meters)
         except Exception as e:
             logger.warning(f"Error searching leisure: {e}")
+            found = {}
+        result['complete'] = all(category in found for category in categories)
+        for category, pois in found.items():
+            result[category] = self._with_distance(latitude, longitude, pois)
 
         # Generate highlights (ONLY POSITIVE, only named places)
         named_parks = [p for p in result['parks'] if p['name'] != 'Unnamed']
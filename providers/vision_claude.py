@@ -1,14 +1,78 @@
 """
 Claude vision provider using Anthropic's Claude API with vision capabilities.
 """
+from dataclasses import dataclass
 from typing import Dict, List, Optional
+import asyncio
 import logging
 import anthropic
 import base64
 import os
 
+from services.rate_limiter import Priority, call_with_rate_limit
+
 logger = logging.getLogger(__name__)
 
+# Rough per-image input token reservation for the rate limiter
+# (Claude bills ~width*height/750 tokens, capped around 1,600 after resizing)
+IMAGE_TOKEN_ESTIMATE = 1600
+
+# Output token budget per image in a batched call (one JSON object each)
+BATCH_OUTPUT_TOKENS_PER_IMAGE = 700
+
+ANALYSIS_SCHEMA = """{
+  "room_type": "kitchen|bedroom|bathroom|living_room|dining_room|garden|exterior|hallway|office|garage|other",
+  "detected_features": ["feature1", "feature2"],
+  "finishes": ["finish1", "finish2"],
+  "light_level": "bright|moderate|dim",
+  "view_hint": "garden_view|street_view|park_view|null",
+  "interior": true|false,
+  "orientation_hint": "front_aspect|rear_aspect|side_aspect|null",
+  "caption": "Simple factual 8-12 word description of what is visible",
+  "headline": "Room type in 2-4 words",
+  "selling_points": ["visible feature 1", "visible feature 2"]
+}"""
+
+ANALYSIS_RULES = """VALID FEATURES (ONLY list if clearly visible):
+- Structural: fireplace, bay_window, sash_windows, french_doors, bifold_doors, skylights, exposed_beams
+- Outdoor: garden, driveway, garage, parking, patio, decking
+- Kitchen: kitchen_island, breakfast_bar, range_cooker, integrated_appliances
+- Bedroom: ensuite, fitted_wardrobes
+- Bathroom: freestanding_bath, walk_in_shower
+
+VALID FINISHES (ONLY list if clearly visible):
+- Floors: hardwood_floors, tiles, carpet, laminate
+- Surfaces: granite_countertops, wooden_worktops
+- Appliances: stainless_steel_appliances, integrated_appliances
+
+CAPTION RULES - BE FACTUAL:
+- ONLY describe what you can actually see in the photo
+- DO NOT invent features, finishes, or qualities not visible
+- DO NOT use marketing fluff like "stunning", "exceptional", "beautifully appointed"
+- DO NOT claim "quality finishes" unless you can specifically identify them
+- Simple descriptions like "Kitchen with cream units and tiled floor" are preferred
+- For exteriors: describe the building style and visible features only
+
+GOOD CAPTION EXAMPLES:
+- "Kitchen with cream cabinets, built-in oven, and dining area"
+- "Double bedroom with fitted wardrobes and carpet flooring"
+- "Semi-detached house with front garden and driveway"
+- "Living room with fireplace and bay window"
+
+BAD CAPTIONS (DO NOT USE):
+- "Stunning chef's kitchen with premium finishes" (marketing fluff)
+- "Property photograph with quality finishes throughout" (generic, not descriptive)
+- "Luxurious principal suite" (aspirational, not factual)"""
+
+
+@dataclass
+class _PendingImage:
+    """An image waiting to be sent in the next batched call."""
+    image_bytes: bytes
+    filename: str
+    future: asyncio.Future
+
+
 # Vision model options - Sonnet is best balance of quality/cost for property photos
 VISION_MODELS = {
     "haiku": "claude-haiku-4-5-20251001",       # Cheapest, may hallucinate
@@ -25,32 +89,172 @@ class VisionClaudeClient:
     features, room types, finishes, and generate captions.
     """
 
-    def __init__(self, api_key: str = None, rate_limiter=None, model: str = None):
+    # Bump when _build_analysis_prompt changes so cached analyses are invalidated
+    prompt_version = "1"
+
+    def __init__(
+        self,
+        api_key: str = None,
+        rate_limiter=None,
+        model: str = None,
+        batch_size: int = 1,
+        batch_window_seconds: float = 0.05
+    ):
         """
         Initialize Claude vision client.
 
         Args:
             api_key: Anthropic API key
-            rate_limiter: Optional GlobalRateLimiter instance for rate limiting
+            rate_limiter: Optional GlobalRateLimiter shared with the text client
             model: Vision model to use (haiku/sonnet/opus) - defaults to VISION_MODEL env var or sonnet
+            batch_size: Maximum images per API call (1 disables batching)
+            batch_window_seconds: How long to wait for more images before sending a partial batch
         """
         self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY is required for Claude vision")
 
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        # Async client so analyses overlap; retries go through the shared limiter
+        self.client = anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            max_retries=0 if rate_limiter is not None else 2
+        )
         self.rate_limiter = rate_limiter
 
         # Get model from parameter, env var, or default to haiku (cheapest)
         model_key = model or os.getenv('VISION_MODEL', 'haiku').lower()
         self.model = VISION_MODELS.get(model_key, VISION_MODELS['haiku'])
 
-        logger.info(f"Initialized Claude vision client with model: {self.model}")
+        # Concurrent analyze_image() calls are coalesced into multi-image calls
+        self.batch_size = max(1, batch_size)
+        self.batch_window_seconds = batch_window_seconds
+        self._pending: List[_PendingImage] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks = set()
+
+        logger.info(f"Initialized Claude vision client with model: {self.model}, batch_size={self.batch_size}")
 
     async def analyze_image(self, image_bytes: bytes, filename: str) -> Dict:
         """
         Analyze property image using Claude's vision API.
 
+        With batching enabled, images submitted concurrently (e.g. a photo
+        upload) are packed into one multi-image call of up to batch_size
+        images, which shares a single copy of the analysis prompt.
+
+        Args:
+            image_bytes: Raw image data
+            filename: Image filename (for metadata)
+
+        Returns:
+            Structured analysis dict
+        """
+        if self.batch_size <= 1:
+            return await self._analyze_single(image_bytes, filename)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingImage(image_bytes, filename, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush_pending()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                self.batch_window_seconds, self._flush_pending
+            )
+        return await future
+
+    def _flush_pending(self):
+        """Send everything queued so far as one batch."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task isn't garbage collected mid-flight
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[_PendingImage]):
+        """Analyze a batch and resolve each caller's future."""
+        try:
+            if len(batch) == 1:
+                results = [await self._analyze_single(batch[0].image_bytes, batch[0].filename)]
+            else:
+                results = await self._analyze_batch(batch)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, result in zip(batch, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+    async def _analyze_batch(self, batch: List[_PendingImage]) -> List[Dict]:
+        """
+        Analyze several images in one API call.
+
+        Any image without a usable entry in the response (or every image, if
+        the call itself fails) is re-analyzed with a single-image call.
+
+        Returns:
+            Analyses in batch order
+        """
+        filenames = [item.filename for item in batch]
+        logger.debug(f"Claude analyzing batch of {len(batch)}: {', '.join(filenames)}")
+
+        content = []
+        for number, item in enumerate(batch, start=1):
+            content.append({"type": "text", "text": f"Image {number}:"})
+            content.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": self._get_media_type(item.filename, item.image_bytes),
+                    "data": base64.b64encode(item.image_bytes).decode('utf-8'),
+                },
+            })
+        prompt = self._build_batch_prompt(len(batch))
+        content.append({"type": "text", "text": prompt})
+        max_tokens = BATCH_OUTPUT_TOKENS_PER_IMAGE * len(batch)
+
+        analyses: Dict[int, Dict] = {}
+        try:
+            message = await call_with_rate_limit(
+                self.rate_limiter,
+                self.model,
+                len(prompt) // 4 + IMAGE_TOKEN_ESTIMATE * len(batch) + max_tokens,
+                Priority.BULK,
+                lambda: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": content}],
+                )
+            )
+            analyses = self._parse_batch_response(message.content[0].text, filenames)
+        except Exception as e:
+            logger.warning(f"Batched vision analysis failed, falling back to single calls: {str(e)}")
+
+        missing = [index for index in range(len(batch)) if index not in analyses]
+        if missing:
+            if analyses:
+                logger.warning(f"Batched vision response missing {len(missing)}/{len(batch)} images, retrying individually")
+            retried = await asyncio.gather(*(
+                self._analyze_single(batch[index].image_bytes, batch[index].filename)
+                for index in missing
+            ))
+            analyses.update(zip(missing, retried))
+
+        return [
+            analyses[index] if index in missing else self._validate_analysis(analyses[index], batch[index].filename)
+            for index in range(len(batch))
+        ]
+
+    async def _analyze_single(self, image_bytes: bytes, filename: str) -> Dict:
+        """
+        Analyze one image in its own API call.
+
         Args:
             image_bytes: Raw image data
             filename: Image filename (for metadata)
@@ -63,41 +267,43 @@ class VisionClaudeClient:
         # Encode image to base64
         image_base64 = base64.b64encode(image_bytes).decode('utf-8')
 
-        # Determine media type from filename
-        media_type = self._get_media_type(filename)
+        # Determine media type (the adapter may have re-encoded to JPEG)
+        media_type = self._get_media_type(filename, image_bytes)
 
         # Create the vision analysis prompt
         prompt = self._build_analysis_prompt()
 
         try:
-            # Apply global rate limiting if available
-            if self.rate_limiter:
-                await self.rate_limiter.wait_if_needed()
-                logger.debug(f"Rate limiter enforced for {filename}")
-
-            # Call Claude with vision using configured model
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": media_type,
-                                    "data": image_base64,
+            # Call Claude with vision using configured model, queued behind
+            # interactive text requests in the shared rate limiter
+            message = await call_with_rate_limit(
+                self.rate_limiter,
+                self.model,
+                len(prompt) // 4 + IMAGE_TOKEN_ESTIMATE + 1024,
+                Priority.BULK,
+                lambda: self.client.messages.create(
+                    model=self.model,
+                    max_tokens=1024,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "image",
+                                    "source": {
+                                        "type": "base64",
+                                        "media_type": media_type,
+                                        "data": image_base64,
+                                    },
                                 },
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ],
-                    }
-                ],
+                                {
+                                    "type": "text",
+                                    "text": prompt
+                                }
+                            ],
+                        }
+                    ],
+                )
             )
 
             # Parse Claude's response
@@ -115,8 +321,17 @@ class VisionClaudeClient:
             # Return minimal analysis that flags the image needs manual review
             return self._fallback_analysis(filename, error=str(e))
 
-    def _get_media_type(self, filename: str) -> str:
-        """Determine media type from filename extension."""
+    def _get_media_type(self, filename: str, image_bytes: bytes = b"") -> str:
+        """Determine media type from the image signature, falling back to filename extension."""
+        if image_bytes.startswith(b"\xff\xd8\xff"):
+            return "image/jpeg"
+        if image_bytes.startswith(b"\x89PNG"):
+            return "image/png"
+        if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+            return "image/webp"
+        if image_bytes.startswith((b"GIF87a", b"GIF89a")):
+            return "image/gif"
+
         filename_lower = filename.lower()
         if filename_lower.endswith('.png'):
             return "image/png"
@@ -131,54 +346,25 @@ class VisionClaudeClient:
 
     def _build_analysis_prompt(self) -> str:
         """Build the prompt for Claude to analyze the property image with JSON output."""
-        return """Analyze this property photograph. Describe ONLY what you can actually see.
+        return f"""Analyze this property photograph. Describe ONLY what you can actually see.
 
 You MUST respond with ONLY valid JSON in this exact format:
-{
-  "room_type": "kitchen|bedroom|bathroom|living_room|dining_room|garden|exterior|hallway|office|garage|other",
-  "detected_features": ["feature1", "feature2"],
-  "finishes": ["finish1", "finish2"],
-  "light_level": "bright|moderate|dim",
-  "view_hint": "garden_view|street_view|park_view|null",
-  "interior": true|false,
-  "orientation_hint": "front_aspect|rear_aspect|side_aspect|null",
-  "caption": "Simple factual 8-12 word description of what is visible",
-  "headline": "Room type in 2-4 words",
-  "selling_points": ["visible feature 1", "visible feature 2"]
-}
+{ANALYSIS_SCHEMA}
 
-VALID FEATURES (ONLY list if clearly visible):
-- Structural: fireplace, bay_window, sash_windows, french_doors, bifold_doors, skylights, exposed_beams
-- Outdoor: garden, driveway, garage, parking, patio, decking
-- Kitchen: kitchen_island, breakfast_bar, range_cooker, integrated_appliances
-- Bedroom: ensuite, fitted_wardrobes
-- Bathroom: freestanding_bath, walk_in_shower
+{ANALYSIS_RULES}
 
-VALID FINISHES (ONLY list if clearly visible):
-- Floors: hardwood_floors, tiles, carpet, laminate
-- Surfaces: granite_countertops, wooden_worktops
-- Appliances: stainless_steel_appliances, integrated_appliances
+Respond with ONLY the JSON object."""
 
-CAPTION RULES - BE FACTUAL:
-- ONLY describe what you can actually see in the photo
-- DO NOT invent features, finishes, or qualities not visible
-- DO NOT use marketing fluff like "stunning", "exceptional", "beautifully appointed"
-- DO NOT claim "quality finishes" unless you can specifically identify them
-- Simple descriptions like "Kitchen with cream units and tiled floor" are preferred
-- For exteriors: describe the building style and visible features only
+    def _build_batch_prompt(self, count: int) -> str:
+        """Build the prompt for analyzing `count` labelled images in one call."""
+        return f"""Analyze each of the {count} property photographs above (labelled Image 1 to Image {count}) independently. Describe ONLY what you can actually see in each one.
 
-GOOD CAPTION EXAMPLES:
-- "Kitchen with cream cabinets, built-in oven, and dining area"
-- "Double bedroom with fitted wardrobes and carpet flooring"
-- "Semi-detached house with front garden and driveway"
-- "Living room with fireplace and bay window"
+You MUST respond with ONLY a valid JSON array containing exactly {count} objects, one per image in order. Each object has an "image" field with the image number, plus the fields in this exact format:
+{ANALYSIS_SCHEMA}
 
-BAD CAPTIONS (DO NOT USE):
-- "Stunning chef's kitchen with premium finishes" (marketing fluff)
-- "Property photograph with quality finishes throughout" (generic, not descriptive)
-- "Luxurious principal suite" (aspirational, not factual)
+{ANALYSIS_RULES}
 
-Respond with ONLY the JSON object."""
+Respond with ONLY the JSON array."""
 
     def _parse_claude_response(self, response_text: str, filename: str) -> Dict:
         """Parse Claude's JSON response into a dict."""
@@ -186,19 +372,7 @@ Respond with ONLY the JSON object."""
         import re
 
         # Default result structure
-        result = {
-            "filename": filename,
-            "room_type": "other",
-            "detected_features": [],
-            "finishes": [],
-            "light_level": "moderate",
-            "view_hint": None,
-            "interior": True,
-            "orientation_hint": None,
-            "suggested_caption": "",
-            "headline": "",
-            "selling_points": []
-        }
+        result = self._default_result(filename)
 
         try:
             # Try to extract JSON from the response (in case there's extra text)
@@ -207,29 +381,7 @@ Respond with ONLY the JSON object."""
                 json_str = json_match.group()
                 parsed = json.loads(json_str)
 
-                # Map parsed values to result
-                if 'room_type' in parsed:
-                    result['room_type'] = str(parsed['room_type']).lower()
-                if 'detected_features' in parsed and isinstance(parsed['detected_features'], list):
-                    result['detected_features'] = [str(f).strip() for f in parsed['detected_features'] if f]
-                if 'finishes' in parsed and isinstance(parsed['finishes'], list):
-                    result['finishes'] = [str(f).strip() for f in parsed['finishes'] if f]
-                if 'light_level' in parsed:
-                    result['light_level'] = str(parsed['light_level']).lower()
-                if 'view_hint' in parsed:
-                    vh = parsed['view_hint']
-                    result['view_hint'] = None if vh in [None, 'null', 'none'] else str(vh).lower()
-                if 'interior' in parsed:
-                    result['interior'] = bool(parsed['interior'])
-                if 'orientation_hint' in parsed:
-                    oh = parsed['orientation_hint']
-                    result['orientation_hint'] = None if oh in [None, 'null', 'none'] else str(oh).lower()
-                if 'caption' in parsed:
-                    result['suggested_caption'] = str(parsed['caption'])
-                if 'headline' in parsed:
-                    result['headline'] = str(parsed['headline'])
-                if 'selling_points' in parsed and isinstance(parsed['selling_points'], list):
-                    result['selling_points'] = [str(p).strip() for p in parsed['selling_points'] if p]
+                self._apply_parsed_fields(parsed, result)
 
                 logger.debug(f"Successfully parsed JSON response for {filename}")
             else:
@@ -242,6 +394,86 @@ Respond with ONLY the JSON object."""
 
         return result
 
+    def _default_result(self, filename: str) -> Dict:
+        """Empty analysis structure filled in by the parsers."""
+        return {
+            "filename": filename,
+            "room_type": "other",
+            "detected_features": [],
+            "finishes": [],
+            "light_level": "moderate",
+            "view_hint": None,
+            "interior": True,
+            "orientation_hint": None,
+            "suggested_caption": "",
+            "headline": "",
+            "selling_points": []
+        }
+
+    def _apply_parsed_fields(self, parsed: Dict, result: Dict) -> None:
+        """Map a parsed JSON analysis object onto the result structure."""
+        if 'room_type' in parsed:
+            result['room_type'] = str(parsed['room_type']).lower()
+        if 'detected_features' in parsed and isinstance(parsed['detected_features'], list):
+            result['detected_features'] = [str(f).strip() for f in parsed['detected_features'] if f]
+        if 'finishes' in parsed and isinstance(parsed['finishes'], list):
+            result['finishes'] = [str(f).strip() for f in parsed['finishes'] if f]
+        if 'light_level' in parsed:
+            result['light_level'] = str(parsed['light_level']).lower()
+        if 'view_hint' in parsed:
+            vh = parsed['view_hint']
+            result['view_hint'] = None if vh in [None, 'null', 'none'] else str(vh).lower()
+        if 'interior' in parsed:
+            result['interior'] = bool(parsed['interior'])
+        if 'orientation_hint' in parsed:
+            oh = parsed['orientation_hint']
+            result['orientation_hint'] = None if oh in [None, 'null', 'none'] else str(oh).lower()
+        if 'caption' in parsed:
+            result['suggested_caption'] = str(parsed['caption'])
+        if 'headline' in parsed:
+            result['headline'] = str(parsed['headline'])
+        if 'selling_points' in parsed and isinstance(parsed['selling_points'], list):
+            result['selling_points'] = [str(p).strip() for p in parsed['selling_points'] if p]
+
+    def _parse_batch_response(self, response_text: str, filenames: List[str]) -> Dict[int, Dict]:
+        """
+        Parse a batched response (JSON array) into per-image analyses.
+
+        Entries are matched by their "image" number, falling back to array
+        position. Images whose entry is missing or unusable are left out so
+        the caller can re-analyze them individually.
+
+        Returns:
+            Dict mapping 0-based image index to analysis
+        """
+        import json
+        import re
+
+        json_match = re.search(r'\[[\s\S]*\]', response_text)
+        if not json_match:
+            logger.warning("No JSON array found in batched vision response")
+            return {}
+        try:
+            parsed = json.loads(json_match.group())
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON parse error in batched vision response: {e}")
+            return {}
+        if not isinstance(parsed, list):
+            return {}
+
+        analyses = {}
+        for position, entry in enumerate(parsed):
+            if not isinstance(entry, dict) or not entry.get('room_type') or not entry.get('caption'):
+                continue
+            index = entry.get('image')
+            index = index - 1 if isinstance(index, int) else position
+            if not 0 <= index < len(filenames) or index in analyses:
+                continue
+            result = self._default_result(filenames[index])
+            self._apply_parsed_fields(entry, result)
+            analyses[index] = result
+        return analyses
+
     def _parse_text_response(self, response_text: str, filename: str, result: Dict) -> Dict:
         """Fallback text parser for non-JSON responses."""
         lines = response_text.strip().split('\n')
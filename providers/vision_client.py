@@ -83,7 +83,12 @@ def make_vision_client(provider: VisionProvider, config: dict) -> VisionClient:
             from providers.vision_mock import VisionMockClient
             return VisionMockClient()
         rate_limiter = config.get("rate_limiter")  # Optional rate limiter
-        return VisionClaudeClient(api_key=api_key, rate_limiter=rate_limiter)
+        return VisionClaudeClient(
+            api_key=api_key,
+            rate_limiter=rate_limiter,
+            batch_size=config.get("batch_size", 1),
+            batch_window_seconds=config.get("batch_window_seconds", 0.05)
+        )
 
     else:
         raise ValueError(f"Unsupported vision provider: {provider}")
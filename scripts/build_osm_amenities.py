@@ -0,0 +1,172 @@
+"""
+OSM Amenity Store Builder - offline copy of the PlacesClient categories
+Ingests an OpenStreetMap PBF extract (e.g. Geofabrik great-britain-latest.osm.pbf)
+into data/osm/amenities.db for services/osm_amenity_store.py
+
+Requires pyosmium (pip install osmium) - only needed to build the store.
+
+Usage:
+    python scripts/build_osm_amenities.py great-britain-latest.osm.pbf [--output data/osm/amenities.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from providers.places_client import PlacesClient  # noqa: E402
+from services.osm_amenity_store import SCHEMA, compile_tag_filter, tags_match  # noqa: E402
+
+try:
+    import osmium
+except ImportError:
+    osmium = None
+
+
+def compile_categories():
+    """Compiled tag clauses per category, plus the tag keys worth looking at"""
+    categories = {
+        category: compile_tag_filter(query_filter)
+        for category, query_filter in PlacesClient.CATEGORY_QUERIES.items()
+    }
+    # An element can only match if it has the first (positive) key of some category
+    keys = {clauses[0][0] for clauses in categories.values()}
+    return categories, keys
+
+
+class AmenityHandler(osmium.SimpleHandler if osmium else object):
+    """Collects (osm_type, osm_id, category, name, lat, lon) rows in batches"""
+
+    def __init__(self, conn, categories, keys, batch_size=50000):
+        super().__init__()
+        self.conn = conn
+        self.categories = categories
+        self.keys = keys
+        self.batch_size = batch_size
+        self.batch = []
+        self.total = 0
+
+    def _add(self, osm_type, osm_id, tags, lat, lon):
+        for category, clauses in self.categories.items():
+            if tags_match(tags, clauses):
+                self.batch.append((osm_type, osm_id, category, tags.get("name"), lat, lon))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def _tags(self, element):
+        if not any(key in element.tags for key in self.keys):
+            return None
+        return {tag.k: tag.v for tag in element.tags}
+
+    def node(self, n):
+        tags = self._tags(n)
+        if tags is not None and n.location.valid():
+            self._add("node", n.id, tags, n.location.lat, n.location.lon)
+
+    def way(self, w):
+        tags = self._tags(w)
+        if tags is None:
+            return
+        # Same as Overpass `out center`: middle of the way's bounding box
+        lats = []
+        lons = []
+        for node in w.nodes:
+            if node.location.valid():
+                lats.append(node.location.lat)
+                lons.append(node.location.lon)
+        if lats:
+            self._add("way", w.id, tags, (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2)
+
+    def flush(self):
+        if not self.batch:
+            return
+        self.conn.executemany("""
+            INSERT INTO amenities (osm_type, osm_id, category, name, latitude, longitude)
+            VALUES (?,?,?,?,?,?)
+        """, self.batch)
+        self.conn.commit()
+        self.total += len(self.batch)
+        print(f"  {self.total:,} amenities...")
+        self.batch = []
+
+
+def build(pbf_path, db_path):
+    """Build the store into a temporary file, then swap it into place"""
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+
+    categories, keys = compile_categories()
+    handler = AmenityHandler(conn, categories, keys)
+    # Ways need their node locations for the center point
+    handler.apply_file(pbf_path, locations=True, idx="flex_mem")
+    handler.flush()
+
+    print("\nBuilding spatial index...")
+    conn.execute("""
+        INSERT INTO amenities_rtree
+        SELECT id, latitude, latitude, longitude, longitude FROM amenities
+    """)
+    conn.executemany("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", [
+        ("built_at", datetime.now(timezone.utc).isoformat(timespec="seconds")),
+        ("source", os.path.basename(pbf_path)),
+        ("categories", ",".join(categories)),
+    ])
+    conn.commit()
+
+    counts = conn.execute("""
+        SELECT category, COUNT(*) FROM amenities GROUP BY category ORDER BY category
+    """).fetchall()
+    conn.execute("VACUUM")
+    conn.close()
+
+    # Atomic swap so running services (and the geo caches keyed on mtime) see a complete file
+    os.replace(tmp_path, db_path)
+    return handler.total, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline OSM amenity store")
+    parser.add_argument("pbf", help="OpenStreetMap .osm.pbf extract")
+    parser.add_argument(
+        "--output",
+        default=str(Path(__file__).resolve().parent.parent / "data" / "osm" / "amenities.db"),
+        help="Output SQLite database"
+    )
+    args = parser.parse_args()
+
+    if osmium is None:
+        sys.exit("pyosmium is required to read PBF files: pip install osmium")
+
+    print("\n" + "="*60)
+    print("OSM AMENITY STORE BUILDER")
+    print("="*60 + "\n")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    start = time.time()
+    print(f"Reading {args.pbf}\n")
+    total, counts = build(args.pbf, args.output)
+    elapsed = time.time() - start
+
+    print("\n" + "="*60)
+    print("COMPLETE!")
+    print("="*60)
+    for category, count in counts:
+        print(f"  {category:20s} {count:>10,}")
+    print(f"Amenities in database: {total:,}")
+    print(f"Processing time: {elapsed:.1f}s")
+    print(f"Database: {args.output}")
+    print(f"Size: {os.path.getsize(args.output)/(1024*1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Postcode Directory Builder - local copy of the ONS Postcode Directory (ONSPD)
+Builds data/postcodes/postcodes.db for services/postcode_directory.py
+
+Download the ONSPD ZIP from the ONS Open Geography Portal and pass it as-is;
+the UK data file and the local authority/county name lookups are read from
+inside the archive. A bare ONSPD CSV also works, with name lookups given via
+--names (CSV files whose first two columns are code, name).
+
+Usage:
+    python scripts/build_postcode_directory.py ONSPD_FEB_2025.zip [--output data/postcodes/postcodes.db]
+"""
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.postcode_directory import SCHEMA, normalize_postcode  # noqa: E402
+
+COUNTRIES = {
+    "E92000001": "England",
+    "W92000004": "Wales",
+    "S92000003": "Scotland",
+    "N92000002": "Northern Ireland",
+    "L93000001": "Channel Islands",
+    "M83000003": "Isle of Man",
+}
+
+# ONSPD uses lat 99.999999 for postcodes without a grid reference
+NO_LOCATION_LAT = 99.0
+
+
+def read_names(rows, names):
+    """Add code -> name pairs from a lookup CSV (first two columns)"""
+    reader = csv.reader(rows)
+    next(reader, None)  # header
+    for row in reader:
+        if len(row) >= 2 and row[0]:
+            names[row[0].strip()] = row[1].strip()
+
+
+def open_source(path, name_files):
+    """Open the ONSPD data CSV (from a ZIP or directly) and load name lookups"""
+    names = {}
+    for name_file in name_files:
+        with open(name_file, encoding="utf-8-sig", errors="ignore") as f:
+            read_names(f, names)
+
+    if not zipfile.is_zipfile(path):
+        return open(path, encoding="utf-8-sig", errors="ignore"), names
+
+    zf = zipfile.ZipFile(path)
+    members = zf.namelist()
+    for member in members:
+        base = os.path.basename(member)
+        if member.endswith(".csv") and ("LA_UA names" in base or "County names" in base):
+            with zf.open(member) as f:
+                read_names(io.TextIOWrapper(f, encoding="utf-8-sig", errors="ignore"), names)
+
+    data_files = [m for m in members if m.startswith("Data/") and m.endswith("_UK.csv")]
+    if not data_files:
+        sys.exit(f"No Data/*_UK.csv found in {path}")
+    return io.TextIOWrapper(zf.open(data_files[0]), encoding="utf-8-sig", errors="ignore"), names
+
+
+def build(path, db_path, name_files, batch_size=50000):
+    """Build the directory into a temporary file, then swap it into place"""
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+
+    source, names = open_source(path, name_files)
+    print(f"Loaded {len(names):,} area names")
+
+    total = 0
+    skipped = 0
+    batch = []
+    with source:
+        for row in csv.DictReader(source):
+            # Live postcodes with a location only
+            if row.get("doterm") or not row.get("lat"):
+                skipped += 1
+                continue
+            try:
+                lat = float(row["lat"])
+                lon = float(row["long"])
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            if lat > NO_LOCATION_LAT:
+                skipped += 1
+                continue
+
+            postcode = row.get("pcds") or row.get("pcd", "")
+            batch.append((
+                normalize_postcode(postcode),
+                " ".join(postcode.split()).upper(),
+                lat,
+                lon,
+                names.get(row.get("oslaua", ""), ""),
+                names.get(row.get("oscty", ""), ""),
+                COUNTRIES.get(row.get("ctry", ""), ""),
+            ))
+
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT OR REPLACE INTO postcodes VALUES (?,?,?,?,?,?,?)", batch)
+                total += len(batch)
+                print(f"  {total:,} postcodes...")
+                batch = []
+
+    if batch:
+        conn.executemany("INSERT OR REPLACE INTO postcodes VALUES (?,?,?,?,?,?,?)", batch)
+        total += len(batch)
+
+    conn.executemany("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", [
+        ("built_at", datetime.now(timezone.utc).isoformat(timespec="seconds")),
+        ("source", os.path.basename(path)),
+        ("postcodes", str(total)),
+    ])
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    # Atomic swap so a running service never sees a half-built file
+    os.replace(tmp_path, db_path)
+    return total, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local postcode directory from ONSPD")
+    parser.add_argument("onspd", help="ONSPD ZIP or UK data CSV")
+    parser.add_argument(
+        "--output",
+        default=str(Path(__file__).resolve().parent.parent / "data" / "postcodes" / "postcodes.db"),
+        help="Output SQLite database"
+    )
+    parser.add_argument("--names", nargs="*", default=[], help="Extra code,name lookup CSVs")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("POSTCODE DIRECTORY BUILDER")
+    print("="*60 + "\n")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    start = time.time()
+    total, skipped = build(args.onspd, args.output, args.names)
+    elapsed = time.time() - start
+
+    print("\n" + "="*60)
+    print("COMPLETE!")
+    print("="*60)
+    print(f"Live postcodes: {total:,}")
+    print(f"Skipped (terminated or no location): {skipped:,}")
+    print(f"Processing time: {elapsed:.1f}s")
+    print(f"Database: {args.output}")
+    print(f"Size: {os.path.getsize(args.output)/(1024*1024):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
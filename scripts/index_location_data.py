@@ -0,0 +1,111 @@
+"""
+Location Dataset Indexer - spatial indexes for the schools and NaPTAN databases
+Run after downloading data/schools/schools.db or data/transport/naptan.db
+
+- schools.db: schools_rtree, an R*Tree over schools.rowid used by
+  SchoolsService for bounding-box lookups, plus a (latitude, longitude)
+  index for SQLite builds without R*Tree
+- naptan.db: a (latitude, longitude) index on stops for TransportService
+
+Each database is copied, indexed from scratch (so the index always matches
+the data) and swapped into place atomically; the services only detect the
+indexes at runtime and never write to these files.
+
+Usage:
+    python scripts/index_location_data.py [--schools data/schools/schools.db] [--naptan data/transport/naptan.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def index_schools(conn):
+    """R*Tree over located schools (plus the lat/lon fallback index); returns the school count"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_schools_lat_lon ON schools(latitude, longitude)")
+    conn.execute("DROP TABLE IF EXISTS schools_rtree")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE schools_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+    except sqlite3.OperationalError as e:
+        print(f"  R*Tree unavailable in this SQLite build ({e}), lat/lon index only")
+        return conn.execute("SELECT COUNT(*) FROM schools").fetchone()[0]
+    conn.execute("""
+        INSERT INTO schools_rtree
+        SELECT rowid, latitude, latitude, longitude, longitude
+        FROM schools
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+    return conn.execute("SELECT COUNT(*) FROM schools_rtree").fetchone()[0]
+
+
+def index_naptan(conn):
+    """Coordinate index on stops; returns the stop count"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_stops_lat_lon ON stops(latitude, longitude)")
+    return conn.execute("SELECT COUNT(*) FROM stops").fetchone()[0]
+
+
+def rebuild(db_path, build_indexes):
+    """Index a copy of db_path, then swap it into place"""
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # The backup API gives a consistent copy even if the source is in WAL mode
+    source = sqlite3.connect(db_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+
+    try:
+        rows = build_indexes(conn)
+        conn.commit()
+        # A plain rollback-journal file can be opened immutable by the read pool
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build spatial indexes for the schools and NaPTAN databases")
+    parser.add_argument("--schools", default=str(DATA_DIR / "schools" / "schools.db"), help="Schools database")
+    parser.add_argument("--naptan", default=str(DATA_DIR / "transport" / "naptan.db"), help="NaPTAN database")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("LOCATION DATASET INDEXER")
+    print("="*60 + "\n")
+
+    start = time.time()
+    indexed = []
+    for label, db_path, build_indexes in [
+        ("Schools", args.schools, index_schools),
+        ("NaPTAN stops", args.naptan, index_naptan),
+    ]:
+        if not os.path.exists(db_path):
+            print(f"{label}: {db_path} not found, skipping")
+            continue
+        print(f"{label}: indexing {db_path}...")
+        indexed.append((label, rebuild(db_path, build_indexes)))
+
+    if not indexed:
+        sys.exit("No databases found - download them first")
+
+    print("\n" + "="*60)
+    print("COMPLETE!")
+    print("="*60)
+    for label, rows in indexed:
+        print(f"{label} indexed: {rows:,}")
+    print(f"Processing time: {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Location Report Precomputer - warm the location cache for a whole portfolio
+Reads a CSV of properties (a `postcode` column, or `latitude` and `longitude`
+columns) and writes one NDJSON line per property with its location report.
+
+Report sections go into the same on-disk cache the API uses
+(CACHE_DIR/location_reports.db), so /location/intelligence requests for
+these properties are then served from cache. Sections that time out
+(usually OpenStreetMap, behind its rate limit) are left out of the cache;
+the summary counts those reports as incomplete and a re-run fills them in.
+
+Usage:
+    python scripts/precompute_location_reports.py portfolio.csv [--output reports.ndjson] [--radius-km 1.6] [--refresh]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.config import settings  # noqa: E402
+from providers.geocoding_client import GeocodingClient  # noqa: E402
+from providers.places_client import PlacesClient  # noqa: E402
+from services.location_intelligence import get_location_intelligence_service  # noqa: E402
+from services.osm_amenity_store import get_osm_amenity_store  # noqa: E402
+from services.persistent_cache import PersistentCache  # noqa: E402
+from services.postcode_directory import get_postcode_directory  # noqa: E402
+from services.rate_limiter import GlobalRateLimiter  # noqa: E402
+
+
+def read_locations(csv_path):
+    """Location dicts from the input CSV (column names are case-insensitive)"""
+    locations = []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+            location = {"postcode": row.get("postcode") or None}
+            try:
+                location["latitude"] = float(row["latitude"])
+                location["longitude"] = float(row["longitude"])
+            except (KeyError, ValueError):
+                pass
+            locations.append(location)
+    return locations
+
+
+def build_service():
+    """Location intelligence wired the same way as the API"""
+    report_cache = None
+    if settings.location_cache_enabled:
+        report_cache = PersistentCache(
+            db_path=os.path.join(settings.cache_dir, "location_reports.db"),
+            max_size_mb=settings.location_cache_max_mb,
+            default_ttl_seconds=settings.location_cache_ttl_seconds
+        )
+
+    places_client = PlacesClient(
+        timeout_seconds=settings.enrichment_timeout_seconds,
+        rate_limiter=GlobalRateLimiter(
+            requests_per_minute=settings.overpass_requests_per_minute,
+            max_concurrency=settings.overpass_max_concurrency
+        ),
+        amenity_store=get_osm_amenity_store(settings.osm_amenities_db_path),
+        overpass_fallback=settings.osm_overpass_fallback
+    )
+    geocoder = GeocodingClient(
+        timeout_seconds=settings.enrichment_timeout_seconds,
+        directory=get_postcode_directory(settings.postcode_db_path),
+        remote_fallback=settings.postcode_remote_fallback
+    )
+    service = get_location_intelligence_service(
+        places_client=places_client,
+        section_timeout_seconds=settings.location_section_timeout_seconds,
+        max_workers=settings.location_max_workers,
+        report_cache=report_cache,
+        # Every report is written straight to disk; no point holding them in memory too
+        memory_cache_size=0,
+        cache_ttl_seconds=settings.location_cache_ttl_seconds,
+        cache_cell_degrees=settings.location_cache_cell_degrees
+    )
+    return service, geocoder, places_client
+
+
+async def run(args):
+    locations = read_locations(args.csv)
+    service, geocoder, places_client = build_service()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.time()
+    succeeded = 0
+    complete = 0
+    done = 0
+    try:
+        async for entry in service.iter_batch_reports(
+            locations,
+            radius_km=args.radius_km,
+            geocoder=geocoder,
+            concurrency=args.concurrency,
+            use_cache=not args.refresh
+        ):
+            out.write(json.dumps(entry) + "\n")
+            done += 1
+            if entry["status"] == "ok":
+                succeeded += 1
+                if entry["report"].get("complete"):
+                    complete += 1
+            if done % 50 == 0:
+                print(f"  {done:,}/{len(locations):,} properties...", file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+        await places_client.close()
+        await geocoder.close()
+
+    elapsed = time.time() - start
+    print(f"\nProperties: {len(locations):,}", file=sys.stderr)
+    print(f"Succeeded: {succeeded:,}", file=sys.stderr)
+    print(f"Failed: {len(locations) - succeeded:,}", file=sys.stderr)
+    print(f"Fully cached: {complete:,}", file=sys.stderr)
+    print(f"Incomplete: {succeeded - complete:,} (a section timed out; re-run to fill in)", file=sys.stderr)
+    print(f"Processing time: {elapsed:.1f}s", file=sys.stderr)
+    stats = service.cache_stats()
+    if stats and stats.get("disk"):
+        print(f"Cached report sections: {stats['disk']['entries']:,}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute location reports for a portfolio")
+    parser.add_argument("csv", help="CSV with a postcode column or latitude/longitude columns")
+    parser.add_argument("--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--radius-km", type=float, default=1.6, help="Search radius")
+    parser.add_argument("--concurrency", type=int, default=settings.location_batch_concurrency)
+    parser.add_argument("--refresh", action="store_true", help="Recompute cached reports")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,114 @@
 """
-EPC Data Processor - Fast extraction and SQLite database builder
-Processes 6GB ZIP file containing all UK domestic EPC certificates
+EPC Data Processor - Streaming, parallel SQLite database builder
+Processes the ZIP of all UK domestic EPC certificates (~6GB, one
+certificates.csv per local authority) into data/epc/epc.db
+
+- CSV members are streamed straight out of the ZIP (nothing extracted to disk)
+  and parsed in a process pool; the parent process is the single SQLite writer
+- Full builds load into a fresh file with WAL, synchronous=OFF and indexes
+  created after the load, then swap it into place atomically
+- --delta upserts into the existing database, skipping members whose CRC
+  hasn't changed since they were last ingested (tracked in ingested_files)
+- Addresses are normalised in the workers and stored in
+  address_normalized; epc_address_fts, the full-text index over it used by
+  EPCService.get_address_candidates, is built after a full load and kept
+  in step with every delta batch
+- epc_area_stats/epc_summary, the national, postcode district and sector
+  aggregates behind EPCService.get_statistics/get_area_statistics, are
+  recomputed at the end of every run
+
+Usage:
+    python scripts/process_epc_data.py all-domestic-certificates.zip [--db data/epc/epc.db]
+    python scripts/process_epc_data.py all-domestic-certificates.zip --delta
+    python scripts/process_epc_data.py all-domestic-certificates.zip --limit-files 3   # quick test build
 """
+import argparse
+import csv
+import io
+import itertools
+import multiprocessing
 import os
+import queue as queue_module
 import sqlite3
-import zipfile
-import csv
+import sys
 import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.epc_service import ADDRESS_FTS_SCHEMA, AREA_STATS_SCHEMA, RATINGS, normalize_address  # noqa: E402
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "epc" / "epc.db"
+
+# (CSV column, converter) in epc_certificates column order
+COLUMNS = [
+    ("LMK_KEY", str),
+    ("ADDRESS", str),
+    ("POSTCODE", lambda v: v.replace(" ", "").upper()),
+    ("CURRENT_ENERGY_RATING", str),
+    ("POTENTIAL_ENERGY_RATING", str),
+    ("PROPERTY_TYPE", str),
+    ("BUILT_FORM", str),
+    ("INSPECTION_DATE", str),
+    ("LODGEMENT_DATE", str),
+    ("TENURE", str),
+    ("TRANSACTION_TYPE", str),
+    ("TOTAL_FLOOR_AREA", lambda v: float(v or 0)),
+    ("NUMBER_HABITABLE_ROOMS", lambda v: int(float(v or 0))),
+    ("CURRENT_ENERGY_EFFICIENCY", lambda v: int(float(v or 0))),
+    ("POTENTIAL_ENERGY_EFFICIENCY", lambda v: int(float(v or 0))),
+]
+
+# Parsed rows are the COLUMNS values followed by the normalised address
+COLUMN_NAMES = [column.lower() for column, _ in COLUMNS] + ["address_normalized"]
+
+INSERT_SQL = "INSERT INTO epc_certificates ({}) VALUES ({})".format(
+    ", ".join(COLUMN_NAMES), ",".join("?" * len(COLUMN_NAMES))
+)
+
+# Deltas keep whichever copy of a certificate was lodged last, whatever the write order
+UPSERT_SQL = INSERT_SQL + """
+    ON CONFLICT (lmk_key) DO UPDATE SET {}
+    WHERE excluded.lodgement_date >= epc_certificates.lodgement_date
+""".format(", ".join(f"{name} = excluded.{name}" for name in COLUMN_NAMES[1:]))
+
+# External-content FTS rows are removed by replaying the stored values, so
+# deletes don't depend on what normalize_address() does today
+FTS_DELETE_SQL = """
+    INSERT INTO epc_address_fts (epc_address_fts, rowid, address_normalized, postcode)
+    SELECT 'delete', c.id, c.address_normalized, c.postcode
+    FROM epc_certificates c JOIN batch_keys k ON k.lmk_key = c.lmk_key
+"""
+FTS_INSERT_SQL = """
+    INSERT INTO epc_address_fts (rowid, address_normalized, postcode)
+    SELECT c.id, c.address_normalized, c.postcode
+    FROM epc_certificates c JOIN batch_keys k ON k.lmk_key = c.lmk_key
+"""
+FTS_REBUILD_SQL = "INSERT INTO epc_address_fts (epc_address_fts) VALUES ('rebuild')"
+
+BATCH_SIZE = 20000
 
-def create_database(db_path):
-    """Create SQLite database with optimized schema"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+# A member is failed if its worker has died, or finished without reporting,
+# when nothing has arrived on the queue for this long
+WORKER_CHECK_SECONDS = 10
 
-    cursor.execute("""
+# Area expressions over the space-free postcode: the inward code is always
+# the last three characters ("SW1A1AA" -> district "SW1A", sector "SW1A 1")
+AREA_EXPRESSIONS = {
+    "national": "'UK'",
+    "district": "substr(postcode, 1, length(postcode) - 3)",
+    "sector": "substr(postcode, 1, length(postcode) - 3) || ' ' || substr(postcode, length(postcode) - 2, 1)",
+}
+
+
+def create_database(conn, with_indexes):
+    """Create the schema (indexes are deferred for full builds)"""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS epc_certificates (
-            lmk_key TEXT PRIMARY KEY,
+            id INTEGER PRIMARY KEY,
+            lmk_key TEXT,
             address TEXT,
             postcode TEXT,
             current_energy_rating TEXT,
@@ -29,120 +122,363 @@ def create_database(db_path):
             total_floor_area REAL,
             number_habitable_rooms INTEGER,
             current_energy_efficiency INTEGER,
-            potential_energy_efficiency INTEGER
+            potential_energy_efficiency INTEGER,
+            address_normalized TEXT
         )
     """)
-
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_postcode ON epc_certificates(postcode)")
+    columns = {col[1] for col in conn.execute("PRAGMA table_info(epc_certificates)")}
+    if not {"id", "address_normalized"} <= columns:
+        sys.exit(
+            "This database predates the id and address_normalized columns; "
+            "run a full build (without --delta) to recreate it"
+        )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            member TEXT PRIMARY KEY,
+            crc INTEGER,
+            size INTEGER,
+            rows INTEGER,
+            ingested_at TEXT
+        )
+    """)
+    if with_indexes:
+        create_indexes(conn)
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'epc_address_fts'").fetchone():
+            print("Building address index for existing records...")
+            conn.execute(ADDRESS_FTS_SCHEMA)
+            conn.execute(FTS_REBUILD_SQL)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS batch_keys (lmk_key TEXT PRIMARY KEY)")
     conn.commit()
-    print("[OK] Database created")
-    return conn
 
-def process_csv_batch(csv_path, conn, batch_size=50000):
-    """Process CSV file in large batches"""
-    cursor = conn.cursor()
-    batch = []
+
+def create_indexes(conn):
+    """Unique key for upserts (older databases have it as the primary key) plus postcode lookups"""
+    has_primary_key = any(col[1] == "lmk_key" and col[5] for col in conn.execute("PRAGMA table_info(epc_certificates)"))
+    if not has_primary_key:
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_lmk_key ON epc_certificates(lmk_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_postcode ON epc_certificates(postcode)")
+
+
+# ---------------------------------------------------------------------------
+# Worker side: parse one ZIP member and stream row batches to the writer
+# ---------------------------------------------------------------------------
+
+_queue = None
+
+
+def _init_worker(queue):
+    global _queue
+    _queue = queue
+
+
+def parse_member(zip_path, member):
+    """Parse one certificates CSV, putting ("rows", member, batch) messages on the queue"""
+    rows = 0
+    errors = 0
+    _queue.put(("start", member, os.getpid()))
+    try:
+        with zipfile.ZipFile(zip_path) as zf, zf.open(member) as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", errors="ignore", newline=""))
+            header = next(reader, None) or []
+            positions = {name.strip().upper(): i for i, name in enumerate(header)}
+            fields = [(positions.get(column), convert) for column, convert in COLUMNS]
+            if fields[0][0] is None:
+                _queue.put(("done", member, 0, 0, "no LMK_KEY column"))
+                return
+
+            batch = []
+            for record in reader:
+                try:
+                    row = tuple(
+                        convert(record[i] if i is not None and i < len(record) else "")
+                        for i, convert in fields
+                    )
+                except (ValueError, IndexError):
+                    errors += 1
+                    continue
+                batch.append(row + (normalize_address(row[1]),))
+                if len(batch) >= BATCH_SIZE:
+                    _queue.put(("rows", member, batch))
+                    rows += len(batch)
+                    batch = []
+            if batch:
+                _queue.put(("rows", member, batch))
+                rows += len(batch)
+        _queue.put(("done", member, rows, errors, None))
+    except Exception as e:
+        _queue.put(("done", member, rows, errors, str(e)))
+
+
+# ---------------------------------------------------------------------------
+# Writer side
+# ---------------------------------------------------------------------------
+
+def select_members(zf, conn, delta, limit_files):
+    """Certificate CSVs to ingest (in delta mode, only new or changed ones)"""
+    members = [info for info in zf.infolist() if info.filename.endswith("certificates.csv")]
+    if delta:
+        seen = {
+            member: (crc, size)
+            for member, crc, size in conn.execute("SELECT member, crc, size FROM ingested_files")
+        }
+        members = [info for info in members if seen.get(info.filename) != (info.CRC, info.file_size)]
+    if limit_files:
+        members = members[:limit_files]
+    return members
+
+
+def write_batch(conn, batch, maintain_fts):
+    """Upsert a batch of certificates (keeping the address index in step for deltas)"""
+    if not maintain_fts:
+        conn.executemany(INSERT_SQL, batch)
+        return
+    conn.execute("DELETE FROM batch_keys")
+    conn.executemany("INSERT OR IGNORE INTO batch_keys VALUES (?)", ((row[0],) for row in batch))
+    conn.execute(FTS_DELETE_SQL)
+    conn.executemany(UPSERT_SQL, batch)
+    conn.execute(FTS_INSERT_SQL)
+
+
+def ingest(zip_path, conn, members, workers, maintain_fts):
+    """Parse members in a process pool and write their rows; returns (rows, errors, failed members)"""
+    sizes = {info.filename: info for info in members}
+    queue = multiprocessing.Queue(maxsize=workers * 4) if workers > 1 else None
     total = 0
+    errors = 0
+    failed = []
+    done = 0
+    finished = set()
+    worker_pids = {}  # member -> pid of the worker parsing it
+    start = time.time()
+    last_report = start
 
-    print(f"Processing: {os.path.basename(csv_path)}")
+    def write(message):
+        nonlocal total, errors, done, last_report
+        if message[0] == "start":
+            worker_pids[message[1]] = message[2]
+            return
+        if message[0] == "rows":
+            write_batch(conn, message[2], maintain_fts)
+            total += len(message[2])
+            now = time.time()
+            if now - last_report >= 5:
+                last_report = now
+                print(f"  {total:,} records ({total / (now - start):,.0f}/s)")
+            return
 
-    with open(csv_path, 'r', encoding='utf-8', errors='ignore') as f:
-        reader = csv.DictReader(f)
+        _, member, rows, member_errors, error = message
+        finished.add(member)
+        done += 1
+        errors += member_errors
+        if error:
+            failed.append(member)
+            print(f"[{done}/{len(members)}] {member}: FAILED ({error})")
+            return
+        info = sizes[member]
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files VALUES (?, ?, ?, ?, ?)",
+            (member, info.CRC, info.file_size, rows, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        )
+        conn.commit()
+        print(f"[{done}/{len(members)}] {member}: {rows:,} records")
+
+    if workers <= 1:
+        # Single process: parse inline, same message flow
+        class _Inline:
+            def put(self, message):
+                write(message)
+        _init_worker(_Inline())
+        for info in members:
+            parse_member(zip_path, info.filename)
+        return total, errors, failed
 
-        for row in reader:
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(queue,)) as pool:
+        results = {info.filename: pool.apply_async(parse_member, (zip_path, info.filename)) for info in members}
+        pool.close()
+        lost = False
+        while done < len(members):
             try:
-                data = (
-                    row.get('LMK_KEY', ''),
-                    row.get('ADDRESS', ''),
-                    row.get('POSTCODE', '').replace(' ', '').upper(),
-                    row.get('CURRENT_ENERGY_RATING', ''),
-                    row.get('POTENTIAL_ENERGY_RATING', ''),
-                    row.get('PROPERTY_TYPE', ''),
-                    row.get('BUILT_FORM', ''),
-                    row.get('INSPECTION_DATE', ''),
-                    row.get('LODGEMENT_DATE', ''),
-                    row.get('TENURE', ''),
-                    row.get('TRANSACTION_TYPE', ''),
-                    float(row.get('TOTAL_FLOOR_AREA', 0) or 0),
-                    int(row.get('NUMBER_HABITABLE_ROOMS', 0) or 0),
-                    int(row.get('CURRENT_ENERGY_EFFICIENCY', 0) or 0),
-                    int(row.get('POTENTIAL_ENERGY_EFFICIENCY', 0) or 0)
-                )
-                batch.append(data)
-
-                if len(batch) >= batch_size:
-                    cursor.executemany("""
-                        INSERT OR REPLACE INTO epc_certificates VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                    """, batch)
-                    conn.commit()
-                    total += len(batch)
-                    print(f"  {total:,} records...")
-                    batch = []
+                write(queue.get(timeout=WORKER_CHECK_SECONDS))
+            except queue_module.Empty:
+                for member in lost_members(results, worker_pids, finished):
+                    lost = True
+                    write(("done", member, 0, 0, "worker exited without finishing"))
+        if lost:
+            # The pool never gets results for lost tasks, so join() would wait forever
+            pool.terminate()
+        else:
+            pool.join()
+
+    return total, errors, failed
+
+
+def lost_members(results, worker_pids, finished):
+    """Unfinished members whose worker died (e.g. OOM-killed) or returned without reporting"""
+    alive = {process.pid for process in multiprocessing.active_children()}
+    return [
+        member for member, result in results.items()
+        if member not in finished and (
+            result.ready() or (member in worker_pids and worker_pids[member] not in alive)
+        )
+    ]
+
 
-            except Exception as e:
-                continue
+def histogram_median(histogram):
+    """Median of a [(value, count), ...] histogram sorted by value"""
+    total = sum(count for _, count in histogram)
+    if not total:
+        return None
+    # Values at (1-based) positions lower and upper; equal for odd totals
+    lower, upper = (total + 1) // 2, total // 2 + 1
+    seen = 0
+    low_value = None
+    for value, count in histogram:
+        seen += count
+        if low_value is None and seen >= lower:
+            low_value = value
+        if seen >= upper:
+            return (low_value + value) / 2
 
-        if batch:
-            cursor.executemany("""
-                INSERT OR REPLACE INTO epc_certificates VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, batch)
-            conn.commit()
-            total += len(batch)
 
-    print(f"  [OK] {total:,} total")
-    return total
+def build_statistics(conn):
+    """Recompute the national, district and sector aggregates in one transaction"""
+    conn.executescript(AREA_STATS_SCHEMA)
+    conn.execute("DELETE FROM epc_area_stats")
+    rating_columns = ", ".join(f"SUM(current_energy_rating = '{rating}')" for rating in RATINGS)
+
+    for area_type, area in AREA_EXPRESSIONS.items():
+        # Districts and sectors only for full postcodes
+        condition = "1" if area_type == "national" else "length(postcode) BETWEEN 5 AND 7"
+        conn.execute(f"""
+            INSERT INTO epc_area_stats
+                (area_type, area, certificates, postcodes,
+                 rating_a, rating_b, rating_c, rating_d, rating_e, rating_f, rating_g,
+                 avg_efficiency, avg_potential_efficiency)
+            SELECT '{area_type}', {area}, COUNT(*), COUNT(DISTINCT postcode), {rating_columns},
+                   AVG(NULLIF(current_energy_efficiency, 0)), AVG(NULLIF(potential_energy_efficiency, 0))
+            FROM epc_certificates
+            WHERE {condition}
+            GROUP BY 2
+        """)
+
+        # Medians from a whole-m2 floor area histogram per area, streamed in
+        # area order so only one area's histogram is held at a time
+        rows = conn.execute(f"""
+            SELECT {area}, CAST(ROUND(total_floor_area) AS INTEGER), COUNT(*)
+            FROM epc_certificates
+            WHERE total_floor_area > 0 AND {condition}
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """)
+        medians = [
+            (histogram_median([(value, count) for _, value, count in group]), area_type, area_name)
+            for area_name, group in itertools.groupby(rows, key=lambda row: row[0])
+        ]
+        conn.executemany(
+            "UPDATE epc_area_stats SET median_floor_area = ? WHERE area_type = ? AND area = ?", medians
+        )
+
+    conn.execute(
+        "INSERT OR REPLACE INTO epc_summary (key, value) VALUES ('computed_at', ?)",
+        (datetime.now(timezone.utc).isoformat(timespec="seconds"),)
+    )
+    conn.commit()
+
+
+def finish_full_build(conn):
+    """Drop duplicate certificates (keeping the latest lodgement), then build the deferred indexes"""
+    print("\nRemoving duplicate certificates...")
+    conn.execute("""
+        DELETE FROM epc_certificates
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY lmk_key ORDER BY lodgement_date DESC, id DESC
+                ) AS position
+                FROM epc_certificates
+            )
+            WHERE position = 1
+        )
+    """)
+    print("Building indexes...")
+    create_indexes(conn)
+    print("Building address index...")
+    conn.execute(ADDRESS_FTS_SCHEMA)
+    conn.execute(FTS_REBUILD_SQL)
+    conn.execute("INSERT INTO epc_address_fts (epc_address_fts) VALUES ('optimize')")
+    conn.commit()
+    print("Computing area statistics...")
+    build_statistics(conn)
+    # Leave a plain rollback-journal file so the swap doesn't strand -wal/-shm files
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA journal_mode = DELETE")
+
 
 def main():
-    zip_path = r"C:\Users\billm\Downloads\all-domestic-certificates.zip"
-    extract_dir = r"C:\Users\billm\Desktop\Listing agent\property-listing-generator\data\epc\temp"
-    db_path = r"C:\Users\billm\Desktop\Listing agent\property-listing-generator\data\epc\epc.db"
+    parser = argparse.ArgumentParser(description="Build or update the EPC database from the EPC bulk ZIP")
+    parser.add_argument("zip", help="all-domestic-certificates.zip (or a delta ZIP)")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="SQLite database to build")
+    parser.add_argument("--delta", action="store_true", help="Upsert changed members into the existing database")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Parser processes")
+    parser.add_argument("--limit-files", type=int, default=0, help="Only process the first N CSVs (test builds)")
+    args = parser.parse_args()
 
     print("\n" + "="*60)
-    print("EPC DATABASE BUILDER")
+    print("EPC DATABASE " + ("DELTA UPDATE" if args.delta else "BUILDER"))
     print("="*60 + "\n")
 
-    os.makedirs(extract_dir, exist_ok=True)
-    conn = create_database(db_path)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    build_path = args.db if args.delta else args.db + ".tmp"
+    if not args.delta and os.path.exists(build_path):
+        os.remove(build_path)
 
-    print("\nExtracting and processing ZIP file...")
-    print("(Processing first 3 CSV files as test)\n")
+    conn = sqlite3.connect(build_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    # A full build writes a scratch file, so durability only matters for deltas
+    conn.execute("PRAGMA synchronous = " + ("NORMAL" if args.delta else "OFF"))
+    conn.execute("PRAGMA cache_size = -262144")  # 256MB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    create_database(conn, with_indexes=args.delta)
 
     start = time.time()
-    grand_total = 0
+    with zipfile.ZipFile(args.zip) as zf:
+        members = select_members(zf, conn, args.delta, args.limit_files)
+    compressed_mb = sum(info.compress_size for info in members) / (1024 * 1024)
+    print(f"{len(members)} CSV files to process with {args.workers} workers ({compressed_mb:,.0f} MB compressed)\n")
 
-    with zipfile.ZipFile(zip_path, 'r') as zf:
-        csv_files = [f for f in zf.namelist() if f.endswith('.csv')][:3]  # First 3 files
-        print(f"Found {len(csv_files)} CSV files to process\n")
+    total, errors, failed = ingest(args.zip, conn, members, args.workers, maintain_fts=args.delta)
+    load_elapsed = time.time() - start
 
-        for idx, csv_file in enumerate(csv_files, 1):
-            print(f"[{idx}/{len(csv_files)}] {csv_file}")
-            zf.extract(csv_file, extract_dir)
-            csv_path = os.path.join(extract_dir, csv_file)
+    if not args.delta:
+        finish_full_build(conn)
+    else:
+        print("\nComputing area statistics...")
+        build_statistics(conn)
 
-            total = process_csv_batch(csv_path, conn)
-            grand_total += total
+    db_count, unique_postcodes = conn.execute(
+        "SELECT certificates, postcodes FROM epc_area_stats WHERE area_type = 'national'"
+    ).fetchone() or (0, 0)
+    conn.close()
 
-            os.remove(csv_path)
+    if not args.delta:
+        if failed:
+            print(f"\n{len(failed)} files failed - keeping the existing database, partial build at {build_path}")
+            sys.exit(1)
+        os.replace(build_path, args.db)
 
     elapsed = time.time() - start
-
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM epc_certificates")
-    db_count = cursor.fetchone()[0]
-
-    cursor.execute("SELECT COUNT(DISTINCT postcode) FROM epc_certificates")
-    unique_postcodes = cursor.fetchone()[0]
-
     print("\n" + "="*60)
     print("COMPLETE!")
     print("="*60)
+    print(f"Files processed: {len(members) - len(failed):,} ({len(failed)} failed)")
+    print(f"Records loaded: {total:,} ({errors:,} unparseable rows skipped)")
     print(f"Records in database: {db_count:,}")
     print(f"Unique postcodes: {unique_postcodes:,}")
+    print(f"Load throughput: {total / max(load_elapsed, 1e-9):,.0f} records/s, {compressed_mb / max(load_elapsed, 1e-9):,.1f} MB/s compressed")
     print(f"Processing time: {elapsed:.1f}s")
-    print(f"Database: {db_path}")
-    print(f"Size: {os.path.getsize(db_path)/(1024*1024):.1f} MB")
+    print(f"Database: {args.db}")
+    print(f"Size: {os.path.getsize(args.db)/(1024*1024):.1f} MB")
 
-    conn.close()
 
 if __name__ == "__main__":
     main()
@@ -5,7 +5,7 @@ Handles:
 - Session creation with photo file storage
 - Session loading with URL mapping
 - Session updates (auto-save)
-- Photo file management
+- Photo file management (content-addressed, shared between sessions)
 - Session expiry and cleanup
 """
 
@@ -25,6 +25,7 @@ from backend.schemas import (
     BrochurePhoto,
     BrochurePage
 )
+from services.photo_blob_store import PhotoBlobStore
 
 logger = logging.getLogger(__name__)
 
@@ -32,17 +33,22 @@ logger = logging.getLogger(__name__)
 class BrochureSessionService:
     """Manages brochure editing sessions with persistent storage."""
 
-    def __init__(self, base_dir: Path = None, expiry_hours: int = 24):
+    # Legacy per-session photo files (sessions created before the blob store)
+    PHOTO_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
+
+    def __init__(self, base_dir: Path = None, expiry_hours: int = 24, blob_store: PhotoBlobStore = None):
         """
         Initialize session service.
 
         Args:
             base_dir: Root directory for session storage
             expiry_hours: Hours until session expires
+            blob_store: Photo storage shared by all sessions (defaults to base_dir/blobs)
         """
         self.base_dir = base_dir or Path("brochure_sessions")
         self.expiry_hours = expiry_hours
         self.base_dir.mkdir(exist_ok=True, parents=True)
+        self.blob_store = blob_store or PhotoBlobStore(self.base_dir / "blobs")
         logger.info(f"📁 Brochure session storage: {self.base_dir.absolute()}")
 
     def create_session(self, data: BrochureSessionData) -> BrochureSessionResponse:
@@ -52,7 +58,7 @@ class BrochureSessionService:
         Process:
         1. Generate unique session ID
         2. Create session directory structure
-        3. Decode and save all photos as files
+        3. Decode and save all photos to the blob store
         4. Save metadata to session.json
         5. Return session info with photo URLs
 
@@ -71,8 +77,6 @@ class BrochureSessionService:
         try:
             # Create directory structure
             session_dir.mkdir(parents=True, exist_ok=True)
-            photos_dir = session_dir / "photos"
-            photos_dir.mkdir(exist_ok=True)
 
             # Set timestamps
             now = datetime.utcnow()
@@ -147,6 +151,7 @@ class BrochureSessionService:
             # Cleanup on failure
             if session_dir.exists():
                 shutil.rmtree(session_dir)
+            self.blob_store.release(session_id)
             raise
 
     def load_session(self, session_id: str) -> BrochureSessionData:
@@ -232,6 +237,11 @@ class BrochureSessionService:
             if new_photos:
                 logger.info(f"✅ Saved {len(new_photos)} new photos to disk")
 
+            # Photos removed from the session no longer hold their blobs
+            removed = self.blob_store.release_unused(session_id, (photo.id for photo in data.photos))
+            if removed:
+                logger.info(f"🗑️ Released {removed} photos removed from session")
+
             # Keep base64 data in JSON for Railway compatibility
             # This ensures photos persist even with ephemeral storage
             session_data_dict = data.dict()
@@ -263,10 +273,14 @@ class BrochureSessionService:
         """
         self._validate_session_id(session_id)
 
-        # Try common extensions
+        photo_path = self.blob_store.get_path(session_id, photo_id)
+        if photo_path is not None:
+            return photo_path
+
+        # Sessions from before the blob store keep their own photo files
         session_dir = self.base_dir / session_id / "photos"
 
-        for ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
+        for ext in self.PHOTO_EXTENSIONS:
             photo_path = session_dir / f"{photo_id}{ext}"
             if photo_path.exists():
                 return photo_path
@@ -286,7 +300,10 @@ class BrochureSessionService:
         self._validate_session_id(session_id)
 
         photos_dir = self.base_dir / session_id / "photos"
-        photo_urls = {}
+        photo_urls = {
+            photo_id: f"/api/brochure/session/{session_id}/photo/{photo_id}"
+            for photo_id in self.blob_store.names(session_id)
+        }
 
         if photos_dir.exists():
             for photo_file in photos_dir.iterdir():
@@ -300,7 +317,7 @@ class BrochureSessionService:
 
     def cleanup_expired(self) -> int:
         """
-        Delete all expired sessions.
+        Delete all expired sessions, then the photos no session uses any more.
 
         Returns:
             Number of sessions deleted
@@ -330,6 +347,7 @@ class BrochureSessionService:
                     if now > expires_at:
                         # Expired - delete
                         shutil.rmtree(session_dir)
+                        self.blob_store.release(session_dir.name)
                         deleted_count += 1
                         logger.info(f"🗑️ Deleted expired session {session_dir.name}")
 
@@ -337,32 +355,37 @@ class BrochureSessionService:
                 logger.warning(f"⚠️ Failed to check session {session_dir.name}: {e}")
                 continue
 
+        # References left by session directories removed some other way
+        # (a session being created has its directory before its session.json)
+        for owner in self.blob_store.owners():
+            if not (self.base_dir / owner).is_dir():
+                self.blob_store.release(owner)
+
+        self.blob_store.collect_garbage()
+
         logger.info(f"✅ Cleanup complete: {deleted_count} sessions deleted")
         return deleted_count
 
     def _save_photo_file(self, session_id: str, photo: BrochurePhoto) -> Path:
         """
-        Decode base64 photo and save to disk.
+        Decode base64 photo and save it to the blob store.
+
+        Photos already stored (by this or any other session) are not
+        written again; the session just gains a reference to them.
 
         Args:
             session_id: Session identifier
             photo: Photo with base64 dataUrl
 
         Returns:
-            Path to saved file
+            Path to the stored file
         """
-        photos_dir = self.base_dir / session_id / "photos"
-        photos_dir.mkdir(parents=True, exist_ok=True)
-
         # Decode base64 data
         image_data, extension = self._decode_base64_photo(photo.dataUrl)
 
-        # Save file
-        photo_path = photos_dir / f"{photo.id}{extension}"
-        with open(photo_path, 'wb') as f:
-            f.write(image_data)
+        photo_path = self.blob_store.put(session_id, photo.id, image_data, extension)
 
-        logger.debug(f"💾 Saved photo: {photo_path.name} ({len(image_data)} bytes)")
+        logger.debug(f"💾 Saved photo {photo.id}: {photo_path.name} ({len(image_data)} bytes)")
 
         return photo_path
 
@@ -1,53 +1,113 @@
 """
 Claude API client wrapper for property listing generation.
+
+Uses the asynchronous Anthropic SDK on top of a pooled httpx transport so
+that LLM calls never block the event loop and concurrent requests share
+keep-alive connections.
 """
 import anthropic
-from typing import Optional
+import asyncio
+import hashlib
+import httpx
+import json
+from typing import Any, AsyncIterator, Dict, Optional
 import logging
 
 from backend.config import settings
+from services.persistent_cache import PersistentCache
+from services.rate_limiter import (
+    GlobalRateLimiter,
+    Priority,
+    call_with_rate_limit,
+    is_rate_limit_error,
+    is_transient_error,
+    limited,
+    retry_after_seconds,
+    transient_retry_delay,
+)
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "You are a professional property copywriter. Generate the requested content DIRECTLY without asking questions, without conversational responses, and without explanations. Output ONLY the requested text content. Never start with 'I understand' or ask for more information - just write the content using the details provided."
+
 
 class ClaudeClient:
     """
     Wrapper for Anthropic Claude API.
     """
-    
-    def __init__(self, api_key: Optional[str] = None):
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout_seconds: Optional[float] = None,
+        response_cache: Optional[PersistentCache] = None,
+        rate_limiter: Optional[GlobalRateLimiter] = None
+    ):
         """
         Initialize Claude client.
-        
+
         Args:
             api_key: Anthropic API key (uses settings if not provided)
+            max_connections: Maximum concurrent HTTP connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            timeout_seconds: Per-request timeout
+            response_cache: Optional persistent cache for completions
+            rate_limiter: Optional shared rate limiter (also used by vision)
         """
         self.api_key = api_key or settings.anthropic_api_key
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.http_client: Optional[httpx.AsyncClient] = None
         if not self.api_key:
             logger.warning("No Anthropic API key provided")
             self.client = None
         else:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
-    
+            limits = httpx.Limits(
+                max_connections=max_connections or settings.claude_max_connections,
+                max_keepalive_connections=max_keepalive_connections or settings.claude_max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry or settings.claude_keepalive_expiry_seconds
+            )
+            timeout = httpx.Timeout(timeout_seconds or settings.claude_timeout_seconds, connect=10.0)
+            self.http_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+            # With a shared limiter, retries go back through its queue so
+            # 429s slow every caller down, not just this one
+            self.client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                http_client=self.http_client,
+                max_retries=0 if rate_limiter is not None else settings.claude_max_retries
+            )
+
     async def generate_completion(
         self,
         prompt: str,
         max_tokens: int = 1000,
         temperature: float = 0.7,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.INTERACTIVE
     ) -> str:
         """
         Generate a completion using Claude.
-        
+
+        Identical requests are served from the response cache when one is
+        configured. Pass use_cache=False for "regenerate" actions; the fresh
+        result still replaces the cached one.
+
         Args:
             prompt: The prompt to send to Claude
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature (0-1)
             model: Model to use
-            
+            use_cache: Whether to return a cached response if available
+            priority: Rate limiter lane (bulk work should pass Priority.BULK)
+
         Returns:
             Generated text
-            
+
         Raises:
             Exception: If API call fails
         """
@@ -58,43 +118,190 @@ class ClaudeClient:
         if model is None:
             model = settings.claude_model
 
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self._cache_key(model, SYSTEM_PROMPT, prompt, temperature, max_tokens)
+            if use_cache:
+                cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+                if cached is not None:
+                    logger.info(f"Claude response cache hit ({len(cached)} characters)")
+                    return cached
+
         try:
             logger.info(f"Calling Claude API ({model}) with {max_tokens} max tokens, temp={temperature}")
 
-            message = self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system="You are a professional property copywriter. Generate the requested content DIRECTLY without asking questions, without conversational responses, and without explanations. Output ONLY the requested text content. Never start with 'I understand' or ask for more information - just write the content using the details provided.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+            message = await call_with_rate_limit(
+                self.rate_limiter,
+                model,
+                self._estimate_tokens(prompt, max_tokens),
+                priority,
+                lambda: self.client.messages.create(
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    system=SYSTEM_PROMPT,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ]
+                ),
+                max_attempts=settings.claude_max_retries + 1
             )
-            
+
             # Extract text from response
             text_content = ""
             for block in message.content:
                 if block.type == "text":
                     text_content += block.text
-            
+
             logger.info(f"Claude API returned {len(text_content)} characters")
+
+            if cache_key is not None and text_content:
+                await asyncio.to_thread(self.response_cache.set, cache_key, text_content)
+
             return text_content
-            
+
         except anthropic.APIError as e:
             logger.error(f"Claude API error: {e}")
             raise Exception(f"Claude API error: {str(e)}")
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             raise Exception(f"Unexpected error: {str(e)}")
-    
+
+    async def stream_completion(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from Claude, yielding text chunks as they arrive.
+
+        Shares the response cache with generate_completion: a cached response
+        is yielded as a single chunk, and a completed stream is cached.
+
+        Args:
+            prompt: The prompt to send to Claude
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature (0-1)
+            model: Model to use
+            use_cache: Whether to return a cached response if available
+            priority: Rate limiter lane
+
+        Yields:
+            Text chunks
+
+        Raises:
+            Exception: If API call fails
+        """
+        if not self.client:
+            raise Exception("Claude API client not initialized. Set ANTHROPIC_API_KEY.")
+
+        if model is None:
+            model = settings.claude_model
+
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self._cache_key(model, SYSTEM_PROMPT, prompt, temperature, max_tokens)
+            if use_cache:
+                cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+                if cached is not None:
+                    logger.info(f"Claude response cache hit ({len(cached)} characters)")
+                    yield cached
+                    return
+
+        chunks = []
+        max_attempts = settings.claude_max_retries + 1
+        estimated_tokens = self._estimate_tokens(prompt, max_tokens)
+        logger.info(f"Streaming Claude API ({model}) with {max_tokens} max tokens, temp={temperature}")
+
+        for attempt in range(max_attempts):
+            try:
+                async with limited(self.rate_limiter, model, estimated_tokens, priority) as slot:
+                    async with self.client.messages.stream(
+                        model=model,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        system=SYSTEM_PROMPT,
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            chunks.append(text)
+                            yield text
+
+                        if slot is not None:
+                            final = await stream.get_final_message()
+                            slot.record_usage(final.usage.input_tokens, final.usage.output_tokens)
+                break
+
+            except anthropic.APIError as e:
+                # Retry only if nothing has been sent to the caller yet
+                can_retry = not chunks and attempt < max_attempts - 1
+                if self.rate_limiter is not None and is_rate_limit_error(e):
+                    self.rate_limiter.report_rate_limited(model, retry_after_seconds(e))
+                    if can_retry:
+                        continue
+                elif self.rate_limiter is not None and can_retry and is_transient_error(e):
+                    # The SDK's own retries are off when the limiter is in use
+                    await asyncio.sleep(transient_retry_delay(attempt))
+                    continue
+                logger.error(f"Claude API error: {e}")
+                raise Exception(f"Claude API error: {str(e)}")
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.report_success(model)
+
+        text_content = "".join(chunks)
+        logger.info(f"Claude API stream returned {len(text_content)} characters")
+
+        if cache_key is not None and text_content:
+            await asyncio.to_thread(self.response_cache.set, cache_key, text_content)
+
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+        """Rough token reservation for the rate limiter (~4 chars per token, full output budget)."""
+        return (len(SYSTEM_PROMPT) + len(prompt)) // 4 + max_tokens
+
+    @staticmethod
+    def _cache_key(model: str, system: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """Content-address a request: SHA-256 of every input that affects the output."""
+        payload = json.dumps([model, system, prompt, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get response cache counters.
+
+        Returns:
+            Cache stats dict, or None if caching is disabled
+        """
+        if self.response_cache is None:
+            return None
+        return self.response_cache.stats()
+
     def is_available(self) -> bool:
         """
         Check if the Claude API client is available.
-        
+
         Returns:
             True if client is initialized with API key
         """
         return self.client is not None
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled HTTP transport. Call on application shutdown.
+        """
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
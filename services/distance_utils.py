@@ -3,6 +3,7 @@ Distance calculation utilities for location enrichment.
 Uses the Haversine formula for calculating great-circle distances.
 """
 import math
+from typing import Tuple
 
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -38,6 +39,27 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return distance
 
 
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Latitude/longitude box that fully contains a circle of radius_km.
+    
+    Used to prefilter indexed coordinates before an exact haversine check.
+    
+    Args:
+        lat: Centre latitude in decimal degrees
+        lon: Centre longitude in decimal degrees
+        radius_km: Radius in kilometers
+        
+    Returns:
+        (min_lat, max_lat, min_lon, max_lon)
+    """
+    lat_delta = math.degrees(radius_km / 6371.0)
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    lon_delta = min(180.0, lat_delta / cos_lat)
+    return lat - lat_delta, lat + lat_delta, lon - lon_delta, lon + lon_delta
+
+
 def km_to_miles(km: float) -> float:
     """
     Convert kilometers to miles.
@@ -3,7 +3,6 @@ Enrichment service for property locations.
 Orchestrates geocoding and places search to provide local context.
 """
 import logging
-import asyncio
 from typing import Optional
 from providers.geocoding_client import GeocodingClient
 from providers.places_client import PlacesClient
@@ -139,26 +138,41 @@ class EnrichmentService:
         nearest = {}
         all_pois = {}
 
-        for idx, category in enumerate(categories):
-            # Add rate limiting delay between API requests (not for first request)
-            if idx > 0:
-                await asyncio.sleep(3.0)  # 3 second delay to avoid 429 errors from Overpass API
-
-            # Try cache first
+        # Serve what we can from cache, then fetch the rest in one combined query
+        missing = []
+        for category in categories:
             cache_key = f"places:{latitude:.4f},{longitude:.4f}:{category}"
             cached_pois = self.cache.get(cache_key)
-
             if cached_pois is None:
-                # Search for POIs
-                pois = await self.places.search_nearby(
-                    latitude, longitude, category, radius_meters=1600
-                )
-                self.cache.set(cache_key, pois, ttl_seconds=3600)
+                missing.append(category)
             else:
                 logger.info(f"Cache hit for {category} near ({latitude}, {longitude})")
-                pois = cached_pois
+                all_pois[category] = cached_pois
+
+        if missing:
+            try:
+                fetched = await self.places.search_many(
+                    latitude, longitude, missing, radius_meters=1600
+                )
+            except Exception as e:
+                logger.warning(f"Amenity search failed near ({latitude}, {longitude}): {e}")
+                fetched = {}
+
+            for category, pois in fetched.items():
+                cache_key = f"places:{latitude:.4f},{longitude:.4f}:{category}"
+                self.cache.set(cache_key, pois, ttl_seconds=3600)
+                all_pois[category] = pois
+
+            # Timed-out categories aren't cached, so the next request retries them
+            skipped = [category for category in missing if category not in fetched]
+            if skipped:
+                logger.warning(f"Using partial amenity data, missing: {', '.join(skipped)}")
+
+        for category in categories:
+            pois = all_pois.get(category)
+            if pois is None:
+                continue
 
-            all_pois[category] = pois
             counts[category] = len(pois)
 
             # Find nearest
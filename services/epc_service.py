@@ -4,11 +4,156 @@ Queries local SQLite database built from UK EPC data
 """
 import sqlite3
 import logging
+import re
 from typing import Optional, List, Dict
 from pathlib import Path
 
+from services.sqlite_pool import read_connection
+
 logger = logging.getLogger(__name__)
 
+# Full-text index over normalised addresses, built by scripts/process_epc_data.py.
+# External content: the text lives in epc_certificates.address_normalized and
+# the index is keyed on its INTEGER PRIMARY KEY id, which VACUUM never
+# renumbers. Deletes replay the stored text rather than re-normalising, so
+# changing ADDRESS_ABBREVIATIONS can't orphan index entries (a full build
+# applies new abbreviations).
+ADDRESS_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS epc_address_fts
+    USING fts5(address_normalized, postcode, content='epc_certificates', content_rowid='id', tokenize='unicode61')
+"""
+
+# Aggregates materialised at ingestion time by scripts/process_epc_data.py:
+# one row for the whole dataset ('national'), per postcode district
+# ('SW1A') and per postcode sector ('SW1A 1')
+AREA_STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS epc_area_stats (
+        area_type TEXT NOT NULL,
+        area TEXT NOT NULL,
+        certificates INTEGER NOT NULL,
+        postcodes INTEGER NOT NULL,
+        rating_a INTEGER, rating_b INTEGER, rating_c INTEGER, rating_d INTEGER,
+        rating_e INTEGER, rating_f INTEGER, rating_g INTEGER,
+        avg_efficiency REAL,
+        avg_potential_efficiency REAL,
+        median_floor_area REAL,
+        PRIMARY KEY (area_type, area)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS epc_summary (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+"""
+
+RATINGS = "ABCDEFG"
+
+# Fewer certificates than this and an area's rating mix isn't worth quoting
+MIN_COMPARISON_CERTIFICATES = 50
+
+# Canonical forms so "12 High St" and "12, High Street" index identically.
+# Applied to both the index and the query, so ambiguous short forms (ST =
+# Street/Saint) just need to map consistently.
+ADDRESS_ABBREVIATIONS = {
+    "RD": "ROAD", "ST": "STREET", "AVE": "AVENUE", "AV": "AVENUE", "LN": "LANE",
+    "DR": "DRIVE", "CL": "CLOSE", "CRES": "CRESCENT", "CT": "COURT", "GDNS": "GARDENS",
+    "GRN": "GREEN", "GR": "GROVE", "GRO": "GROVE", "PL": "PLACE", "SQ": "SQUARE",
+    "TER": "TERRACE", "TERR": "TERRACE", "PK": "PARK", "HSE": "HOUSE", "MT": "MOUNT",
+    "APARTMENT": "FLAT", "APT": "FLAT", "FLT": "FLAT", "UNIT": "FLAT", "MAISONETTE": "FLAT",
+    "N": "NORTH", "S": "SOUTH", "E": "EAST", "W": "WEST", "UPR": "UPPER", "LWR": "LOWER",
+}
+
+# Weight of a number token (house/flat number) relative to a word in match scores
+NUMBER_WEIGHT = 3.0
+
+# Below this score a candidate is a different property, not a spelling of the same one
+MIN_ADDRESS_MATCH_SCORE = 0.5
+
+
+def postcode_areas(postcode: str) -> Dict[str, str]:
+    """
+    Postcode district and sector for a full postcode.
+
+    Args:
+        postcode: UK postcode in any spacing/case (e.g. "sw1a 1aa")
+
+    Returns:
+        {"district": "SW1A", "sector": "SW1A 1"}, or {} if not a full postcode
+    """
+    compact = postcode.replace(" ", "").upper()
+    if not 5 <= len(compact) <= 7:
+        return {}
+    return {"district": compact[:-3], "sector": f"{compact[:-3]} {compact[-3]}"}
+
+
+def parse_rating(rating: Optional[str]) -> Optional[str]:
+    """
+    A single EPC band letter, or None if rating isn't one.
+
+    Args:
+        rating: e.g. "c" or " C "
+
+    Returns:
+        "A"-"G", or None (for "", "AB", "H", ...)
+    """
+    rating = (rating or "").strip().upper()
+    return rating if len(rating) == 1 and rating in RATINGS else None
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalise an address for indexing and matching.
+
+    Uppercases, drops punctuation, expands common abbreviations and
+    separates numbers from flat letters ("12A" -> "12 A", "FLAT3" -> "FLAT 3").
+
+    Args:
+        address: Free-text address line(s)
+
+    Returns:
+        Space-separated canonical tokens
+    """
+    text = re.sub(r"[^A-Z0-9 ]+", " ", (address or "").upper())
+    text = re.sub(r"(?<=[A-Z])(?=\d)|(?<=\d)(?=[A-Z])", " ", text)
+    return " ".join(ADDRESS_ABBREVIATIONS.get(token, token) for token in text.split())
+
+
+def address_match_score(query_tokens: List[str], candidate_tokens: List[str]) -> float:
+    """
+    Weighted token overlap between a query and a candidate address (0-1).
+
+    Numbers carry NUMBER_WEIGHT; if both sides have numbers but none in
+    common (e.g. "12 High Street" vs "14 High Street") the score is 0.
+    """
+    query, candidate = set(query_tokens), set(candidate_tokens)
+    query_numbers = {t for t in query if t.isdigit()}
+    candidate_numbers = {t for t in candidate if t.isdigit()}
+    if query_numbers and candidate_numbers and not query_numbers & candidate_numbers:
+        return 0.0
+
+    def weight(tokens):
+        return sum(NUMBER_WEIGHT if t.isdigit() else 1.0 for t in tokens)
+
+    union = weight(query | candidate)
+    return weight(query & candidate) / union if union else 0.0
+
+
+def is_address_match(query_tokens: List[str], candidate_tokens: List[str]) -> bool:
+    """
+    Whether a candidate is confidently the queried property.
+
+    Requires MIN_ADDRESS_MATCH_SCORE, and when the query has numbers the
+    candidate must share one and have none the query lacks ("12 High St"
+    is not "Rose Cottage, High Street", "Flat 4, 12 High St" or "Flat 3,
+    12 High St"). Extra query numbers are allowed, so a range such as
+    "12-14 High St" still finds the certificate for number 12.
+    """
+    query_numbers = {t for t in query_tokens if t.isdigit()}
+    if query_numbers:
+        candidate_numbers = {t for t in candidate_tokens if t.isdigit()}
+        if not candidate_numbers & query_numbers or candidate_numbers - query_numbers:
+            return False
+    return address_match_score(query_tokens, candidate_tokens) >= MIN_ADDRESS_MATCH_SCORE
+
 
 class EPCService:
     """Service for looking up EPC data by postcode"""
@@ -34,6 +179,34 @@ class EPCService:
             logger.info(f"EPC service initialized with database: {self.db_path}")
             self.available = True
 
+        # Databases built before epc_certificates had id/address_normalized
+        # carry an incompatible index; they fall back to per-postcode scans
+        self.has_address_index = (
+            self.available
+            and self._has_table('epc_address_fts')
+            and self._has_column('epc_certificates', 'address_normalized')
+        )
+        self.has_area_stats = self.available and self._has_table('epc_area_stats')
+
+    def _has_table(self, name: str) -> bool:
+        """Whether the database was built with the given table (e.g. epc_address_fts)."""
+        try:
+            return read_connection(self.db_path).execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+            ).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def _has_column(self, table: str, column: str) -> bool:
+        """Whether a table has the given column."""
+        try:
+            return any(
+                row["name"] == column
+                for row in read_connection(self.db_path).execute(f"PRAGMA table_info({table})")
+            )
+        except sqlite3.Error:
+            return False
+
     def search_by_postcode(self, postcode: str, limit: int = 50) -> List[Dict]:
         """
         Search for properties by postcode
@@ -53,8 +226,7 @@ class EPCService:
         normalized_postcode = postcode.replace(" ", "").upper()
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+            conn = read_connection(self.db_path)  # Rows are sqlite3.Row (dict-like)
             cursor = conn.cursor()
 
             cursor.execute("""
@@ -84,8 +256,6 @@ class EPCService:
             for row in cursor.fetchall():
                 results.append(dict(row))
 
-            conn.close()
-
             logger.info(f"Found {len(results)} properties for postcode: {postcode}")
             return results
 
@@ -102,51 +272,147 @@ class EPCService:
             address_line: Address line to match (fuzzy)
 
         Returns:
-            Property dictionary or None
+            Best-matching property dictionary (with match_score), or None
+            unless a candidate passes is_address_match
         """
-        if not self.available:
-            return None
+        query_tokens = normalize_address(address_line).split()
+        for candidate in self.get_address_candidates(postcode, address_line):
+            if is_address_match(query_tokens, normalize_address(candidate["address"]).split()):
+                return candidate
+        return None
 
-        normalized_postcode = postcode.replace(" ", "").upper()
-        address_search = f"%{address_line.upper()}%"
+    def get_address_candidates(self, postcode: str, address_line: str, limit: int = 5) -> List[Dict]:
+        """
+        Ranked EPC certificates matching an address.
 
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        Addresses are compared as normalised tokens (see normalize_address),
+        so "Flat 3, 12 High St" matches "APARTMENT 3 12 HIGH STREET".
+        Candidates come from the full-text address index within the postcode,
+        falling back to its postcode sector and then district (all tokens
+        required) when the postcode has no match, e.g. a mistyped inward
+        code. Ties go to the most recent certificate. Any overlap counts as a
+        candidate; get_property_by_address applies the stricter
+        is_address_match.
 
-            cursor.execute("""
-                SELECT *
-                FROM epc_certificates
-                WHERE postcode = ? AND UPPER(address) LIKE ?
-                ORDER BY lodgement_date DESC
-                LIMIT 1
-            """, (normalized_postcode, address_search))
+        Args:
+            postcode: UK postcode
+            address_line: Address to match
+            limit: Maximum candidates
 
-            row = cursor.fetchone()
-            conn.close()
+        Returns:
+            Property dictionaries with a match_score (0-1), best first
+        """
+        if not self.available:
+            return []
 
-            if row:
-                return dict(row)
-            return None
+        normalized_postcode = postcode.replace(" ", "").upper()
+        query_tokens = normalize_address(address_line).split()
+        if not query_tokens:
+            return []
 
+        try:
+            conn = read_connection(self.db_path)
+            if self.has_address_index:
+                rows = self._fts_candidates(conn, normalized_postcode, query_tokens)
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM epc_certificates WHERE postcode = ?", (normalized_postcode,)
+                ).fetchall()
         except Exception as e:
             logger.error(f"Error querying EPC database: {e}")
-            return None
+            return []
+
+        scored = []
+        for row in rows:
+            score = address_match_score(query_tokens, normalize_address(row["address"]).split())
+            if score > 0:
+                data = dict(row)
+                data.pop("address_normalized", None)
+                scored.append((score, row["lodgement_date"] or "", data))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+        results = []
+        for score, _, data in scored[:limit]:
+            data["match_score"] = round(score, 3)
+            results.append(data)
+        return results
+
+    @staticmethod
+    def _fts_candidates(conn: sqlite3.Connection, postcode: str, tokens: List[str], limit: int = 50) -> List[sqlite3.Row]:
+        """
+        Certificates for the best full-text matches (bm25) in the postcode,
+        else in its sector, else its district - never the whole country.
+        """
+        if not postcode:
+            return []
+        quoted = [f'"{token}"' for token in dict.fromkeys(tokens)]
+        sql = """
+            SELECT c.*
+            FROM epc_address_fts f
+            JOIN epc_certificates c ON c.id = f.rowid
+            WHERE epc_address_fts MATCH ? {area_filter}
+            ORDER BY f.rank
+            LIMIT ?
+        """
+        rows = conn.execute(
+            sql.format(area_filter=""),
+            (f'postcode : "{postcode}" AND ({" OR ".join(quoted)})', limit)
+        ).fetchall()
+        if rows or not postcode_areas(postcode):
+            return rows
+
+        # Postcodes are stored without the space, so the sector is all but the
+        # last two characters and the district all but the last three; the
+        # prefix match narrows the index, the substr() check makes it exact
+        # (prefix "SW11" alone would also match SW11 4xx in district SW11)
+        for suffix_length in (2, 3):
+            area = postcode[:-suffix_length]
+            rows = conn.execute(
+                sql.format(area_filter=f"AND substr(c.postcode, 1, length(c.postcode) - {suffix_length}) = ?"),
+                (f'postcode : "{area}" * AND {" AND ".join(quoted)}', area, limit)
+            ).fetchall()
+            if rows:
+                return rows
+        return []
 
     def get_statistics(self) -> Dict:
         """
         Get database statistics
 
+        Read from the aggregates materialised at ingestion time when
+        available (constant time), otherwise computed over the whole table.
+
         Returns:
             Dictionary with total records, unique postcodes, etc.
         """
         if not self.available:
             return {"available": False}
 
+        if self.has_area_stats:
+            try:
+                conn = read_connection(self.db_path)
+                national = conn.execute(
+                    "SELECT * FROM epc_area_stats WHERE area_type = 'national'"
+                ).fetchone()
+                summary = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM epc_summary")}
+                if national:
+                    stats = self._area_row_to_dict(national)
+                    return {
+                        "available": True,
+                        "total_records": stats["certificates"],
+                        "unique_postcodes": stats["postcodes"],
+                        "rating_distribution": {
+                            rating: count for rating, count in stats["rating_distribution"].items() if count
+                        },
+                        "average_efficiency": stats["average_efficiency"],
+                        "median_floor_area": stats["median_floor_area"],
+                        "computed_at": summary.get("computed_at")
+                    }
+            except Exception as e:
+                logger.warning(f"Error reading EPC aggregates, computing statistics: {e}")
+
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = read_connection(self.db_path).cursor()
 
             cursor.execute("SELECT COUNT(*) FROM epc_certificates")
             total_records = cursor.fetchone()[0]
@@ -163,8 +429,6 @@ class EPCService:
             """)
             rating_distribution = {row[0]: row[1] for row in cursor.fetchall()}
 
-            conn.close()
-
             return {
                 "available": True,
                 "total_records": total_records,
@@ -175,3 +439,100 @@ class EPCService:
         except Exception as e:
             logger.error(f"Error getting statistics: {e}")
             return {"available": False, "error": str(e)}
+
+    def get_area_statistics(self, postcode: str) -> Dict:
+        """
+        Energy efficiency aggregates for a postcode's sector and district.
+
+        Args:
+            postcode: Full UK postcode
+
+        Returns:
+            Dict with sector, district and national aggregates (each None if
+            not available): certificates, rating_distribution,
+            average_efficiency, median_floor_area, ...
+        """
+        areas = postcode_areas(postcode)
+        result = {"available": False, "sector": None, "district": None, "national": None}
+        if not self.has_area_stats or not areas:
+            return result
+
+        try:
+            rows = read_connection(self.db_path).execute("""
+                SELECT * FROM epc_area_stats
+                WHERE (area_type = 'sector' AND area = ?)
+                   OR (area_type = 'district' AND area = ?)
+                   OR area_type = 'national'
+            """, (areas["sector"], areas["district"])).fetchall()
+        except Exception as e:
+            logger.error(f"Error reading EPC area statistics: {e}")
+            return result
+
+        for row in rows:
+            result[row["area_type"]] = self._area_row_to_dict(row)
+        result["available"] = any(result[level] for level in ("sector", "district"))
+        return result
+
+    def compare_to_area(self, postcode: str, rating: str, stats: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        How a property's EPC rating compares with homes nearby.
+
+        Uses the sector when it has enough certificates, otherwise the
+        district if that does (MIN_COMPARISON_CERTIFICATES). Only favourable
+        comparisons produce a highlight, in line with the rest of the
+        brochure copy.
+
+        Args:
+            postcode: Property postcode
+            rating: Current energy rating (A-G)
+            stats: get_area_statistics(postcode), if already fetched
+
+        Returns:
+            Dict with area, certificates, better_than_percent and highlight
+            (None if not favourable), or None if the rating isn't a single
+            band or neither area has enough certificates
+        """
+        rating = parse_rating(rating)
+        if rating is None:
+            return None
+
+        if stats is None:
+            stats = self.get_area_statistics(postcode)
+        area = next((
+            stats[level] for level in ("sector", "district")
+            if stats[level] and sum(stats[level]["rating_distribution"].values()) >= MIN_COMPARISON_CERTIFICATES
+        ), None)
+        if area is None:
+            return None
+
+        distribution = area["rating_distribution"]
+        rated = sum(distribution.values())
+        worse = sum(distribution[r] for r in RATINGS[RATINGS.index(rating) + 1:])
+        better_than = round(100 * worse / rated)
+
+        highlight = None
+        if better_than >= 50:
+            highlight = f"EPC rating {rating}: more energy efficient than {better_than}% of homes in {area['area']}"
+
+        return {
+            "area": area["area"],
+            "area_type": area["area_type"],
+            "certificates": area["certificates"],
+            "better_than_percent": better_than,
+            "highlight": highlight
+        }
+
+    @staticmethod
+    def _area_row_to_dict(row: sqlite3.Row) -> Dict:
+        return {
+            "area_type": row["area_type"],
+            "area": row["area"],
+            "certificates": row["certificates"],
+            "postcodes": row["postcodes"],
+            "rating_distribution": {rating: row[f"rating_{rating.lower()}"] or 0 for rating in RATINGS},
+            "average_efficiency": round(row["avg_efficiency"], 1) if row["avg_efficiency"] is not None else None,
+            "average_potential_efficiency": (
+                round(row["avg_potential_efficiency"], 1) if row["avg_potential_efficiency"] is not None else None
+            ),
+            "median_floor_area": row["median_floor_area"]
+        }
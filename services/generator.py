@@ -1,6 +1,9 @@
 """
 Property listing copy generator.
 """
+import asyncio
+import logging
+import re
 from typing import List, Dict, Optional
 from backend.schemas import (
     GenerateRequest,
@@ -16,6 +19,11 @@ from services.compliance_checker import ComplianceChecker
 from services.brand_styles import build_brand_prompt_section
 from services.agency_templates import get_template_service, PropertyCharacter, TemplateType
 
+logger = logging.getLogger(__name__)
+
+# Marker line separating variants in single-call responses, e.g. "=== VARIANT 2 ==="
+VARIANT_MARKER_RE = re.compile(r"^\s*=+\s*VARIANT\s+(\d+)\s*=+\s*$", re.IGNORECASE | re.MULTILINE)
+
 
 class GenerationError(Exception):
     """Raised when generation fails."""
@@ -138,7 +146,8 @@ class Generator:
         num_variants: int = 3,
         enrichment_data: dict = None,
         photo_analysis: any = None,
-        brochure_sections: dict = None
+        brochure_sections: dict = None,
+        use_cache: bool = True
     ) -> List[Dict]:
         """
         Generate multiple listing variants.
@@ -149,6 +158,7 @@ class Generator:
             enrichment_data: Optional enrichment data from EnrichmentService
             photo_analysis: Optional photo vision analysis
             brochure_sections: Optional section-photo mappings for brochures
+            use_cache: Whether cached LLM responses may be reused
 
         Returns:
             List of GeneratedVariant dicts
@@ -165,7 +175,9 @@ class Generator:
 
         if self.claude_client is not None and self.claude_client.is_available():
             # Use real LLM generation
-            return await self._generate_with_llm(request, num_variants, enrichment_data, photo_analysis, brochure_sections)
+            return await self._generate_with_llm(
+                request, num_variants, enrichment_data, photo_analysis, brochure_sections, use_cache
+            )
         else:
             # Use mock generation
             return self._generate_mock(request, num_variants, enrichment_data)
@@ -176,7 +188,8 @@ class Generator:
         num_variants: int,
         enrichment_data: dict = None,
         photo_analysis: any = None,
-        brochure_sections: dict = None
+        brochure_sections: dict = None,
+        use_cache: bool = True
     ) -> List[Dict]:
         """
         Generate variants using Claude API.
@@ -187,6 +200,7 @@ class Generator:
             enrichment_data: Optional enrichment data
             photo_analysis: Optional photo vision analysis
             brochure_sections: Optional section-photo mappings
+            use_cache: Whether cached LLM responses may be reused
 
         Returns:
             List of variant dicts
@@ -197,29 +211,98 @@ class Generator:
         if self.claude_client is None:
             raise GenerationError("Claude client not initialized")
 
+        from backend.config import settings
+
         try:
             # Build prompt with photo analysis and section mappings
             prompt = self._build_prompt(request, enrichment_data, photo_analysis, brochure_sections)
+        except Exception as e:
+            raise GenerationError(f"LLM generation failed: {str(e)}")
+
+        variants_by_id: Dict[int, Dict] = {}
+        errors = []
 
-            # Generate variants
-            variants = []
-            for i in range(num_variants):
-                # Call Claude API
+        # Single-call mode: ask for every variant in one response so the
+        # shared prompt is only sent once
+        if settings.generation_mode == "single_call" and num_variants > 1:
+            try:
                 response_text = await self.claude_client.generate_completion(
-                    prompt=prompt,
-                    max_tokens=1000,
-                    temperature=0.7 + (i * 0.1)  # Vary temperature for variety
+                    prompt=self._build_multi_variant_prompt(prompt, num_variants),
+                    max_tokens=1000 * num_variants,
+                    temperature=0.8,
+                    use_cache=use_cache
+                )
+                variants_by_id = self._parse_multi_variant_response(response_text, num_variants)
+            except Exception as e:
+                logger.warning(f"Single-call generation failed, falling back to per-variant calls: {e}")
+                errors.append(e)
+
+            if len(variants_by_id) < num_variants:
+                logger.info(
+                    f"Single-call generation parsed {len(variants_by_id)}/{num_variants} variants, "
+                    "generating the rest individually"
                 )
 
-                # Parse response
-                variant = self._parse_variant_response(response_text, i + 1)
-                variants.append(variant)
+        # Per-variant calls for anything still missing, dispatched concurrently
+        missing = [i for i in range(num_variants) if i + 1 not in variants_by_id]
+        if missing:
+            semaphore = asyncio.Semaphore(max(1, settings.generation_max_concurrency))
+
+            async def generate_one(i: int) -> Dict:
+                async with semaphore:
+                    response_text = await self.claude_client.generate_completion(
+                        prompt=prompt,
+                        max_tokens=1000,
+                        temperature=0.7 + (i * 0.1),  # Vary temperature for variety
+                        use_cache=use_cache
+                    )
+                return self._parse_variant_response(response_text, i + 1)
+
+            results = await asyncio.gather(
+                *(generate_one(i) for i in missing),
+                return_exceptions=True
+            )
 
-            return variants
+            for i, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Variant {i + 1} failed: {result}")
+                    errors.append(result)
+                else:
+                    variants_by_id[i + 1] = result
+
+        if not variants_by_id:
+            raise GenerationError(f"LLM generation failed: {str(errors[0])}")
+
+        # Return in variant order
+        return [variants_by_id[variant_id] for variant_id in sorted(variants_by_id)]
+
+    def _build_multi_variant_prompt(self, prompt: str, num_variants: int) -> str:
+        """
+        Extend the single-variant prompt to request several variants in one response.
+
+        Args:
+            prompt: Prompt built by _build_prompt
+            num_variants: Number of variants to request
+
+        Returns:
+            Prompt string
+        """
+        return f"""{prompt}
+
+MULTIPLE VARIANTS:
+Write {num_variants} distinct variants of this listing in a single response.
+Each variant must follow the format above (HEADLINE, DESCRIPTION, KEY_FEATURES) in full.
+Give each variant a different headline, opening sentence and emphasis - do not repeat phrasing between variants.
+Start each variant with a marker line on its own, exactly like this:
+
+=== VARIANT 1 ===
+HEADLINE: ...
+
+=== VARIANT 2 ===
+HEADLINE: ...
+
+Continue up to VARIANT {num_variants}. Output nothing before the first marker or after the last variant."""
 
-        except Exception as e:
-            raise GenerationError(f"LLM generation failed: {str(e)}")
-    
     def _build_prompt(self, request: GenerateRequest, enrichment_data: dict = None, photo_analysis: any = None, brochure_sections: dict = None) -> str:
         """
         Build prompt for Claude API.
@@ -637,6 +720,38 @@ TONE-SPECIFIC GUARDRAILS (RELAXED - BOUTIQUE/PREMIUM):
 
         return "\n".join(lines)
 
+    def _parse_multi_variant_response(self, response_text: str, num_variants: int) -> Dict[int, Dict]:
+        """
+        Parse a single-call response containing several variants.
+
+        Variants whose block is missing or lacks a headline/description are
+        left out so the caller can regenerate them individually.
+
+        Args:
+            response_text: Raw response from Claude
+            num_variants: Number of variants requested
+
+        Returns:
+            Dict of variant_id -> variant dict for each valid variant
+        """
+        parts = VARIANT_MARKER_RE.split(response_text or "")
+
+        # parts = [preamble, id, block, id, block, ...]
+        variants = {}
+        for marker, block in zip(parts[1::2], parts[2::2]):
+            variant_id = int(marker)
+            if variant_id < 1 or variant_id > num_variants or variant_id in variants:
+                continue
+            if "HEADLINE:" not in block or "DESCRIPTION:" not in block:
+                continue
+
+            variant = self._parse_variant_response(block, variant_id)
+            if variant["word_count"] == 0:
+                continue
+            variants[variant_id] = variant
+
+        return variants
+
     def _parse_variant_response(self, response_text: str, variant_id: int) -> Dict:
         """
         Parse Claude's response into a variant dict.
@@ -0,0 +1,207 @@
+"""
+Shared in-memory geo index for the location datasets (schools, NaPTAN, GP practices).
+
+Each dataset is loaded from its SQLite file once per process into compact
+coordinate arrays bucketed on a fixed lat/lon grid. Small datasets keep
+their full rows; large ones (bus stops) keep only an integer id per point
+and the caller fetches details for the few hits from SQLite. Radius and k-nearest
+queries only look at the grid cells overlapping the search area, then apply
+a cheap equirectangular prefilter before the exact haversine distance.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services.distance_utils import bounding_box, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# ~2.2 km of latitude (~1.4 km of longitude in southern England) per cell
+DEFAULT_CELL_DEGREES = 0.02
+
+KM_PER_DEGREE = 111.195  # Mean Earth radius * pi / 180
+
+
+class GeoIndex:
+    """
+    Grid-bucketed point index.
+
+    Rows are kept as-is (e.g. sqlite3.Row, or an array of integer ids) and
+    returned with their distance; coordinates live in parallel float arrays
+    so distance checks never touch the row objects.
+    """
+
+    def __init__(
+        self,
+        points: Sequence[Tuple[float, float]],
+        rows: Sequence[Any],
+        cell_degrees: float = DEFAULT_CELL_DEGREES
+    ):
+        """
+        Build the index.
+
+        Args:
+            points: (latitude, longitude) per row
+            rows: Row objects (or ids) returned by queries, parallel to points
+            cell_degrees: Grid cell size in degrees
+        """
+        self.cell_degrees = cell_degrees
+        self.rows = rows if isinstance(rows, array) else list(rows)
+        self.lats = array("d", (lat for lat, _ in points))
+        self.lons = array("d", (lon for _, lon in points))
+
+        cells: Dict[Tuple[int, int], array] = {}
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            key = (math.floor(lat / cell_degrees), math.floor(lon / cell_degrees))
+            bucket = cells.get(key)
+            if bucket is None:
+                bucket = cells[key] = array("I")
+            bucket.append(i)
+        self.cells = cells
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_sqlite(
+        cls,
+        db_path: str,
+        query: str,
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+        id_column: Optional[str] = None
+    ) -> "GeoIndex":
+        """
+        Load an index from a SQLite query.
+
+        The query must select `latitude` and `longitude` columns; rows with
+        missing coordinates are skipped. With id_column, only that integer
+        column is kept per point (queries return (distance_km, id)) instead
+        of the whole row.
+        """
+        started = time.monotonic()
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            points = []
+            rows = array("q") if id_column else []
+            for row in conn.execute(query):
+                lat, lon = row["latitude"], row["longitude"]
+                if lat is None or lon is None:
+                    continue
+                points.append((float(lat), float(lon)))
+                rows.append(row[id_column] if id_column else row)
+        finally:
+            conn.close()
+
+        index = cls(points, rows, cell_degrees)
+        logger.info(
+            f"Loaded geo index from {os.path.basename(db_path)}: {len(index)} points, "
+            f"{len(index.cells)} cells in {time.monotonic() - started:.2f}s"
+        )
+        return index
+
+    def _candidates(self, lat: float, lon: float, radius_km: float):
+        """Indices of points in grid cells overlapping the radius bounding box."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        size = self.cell_degrees
+        for cell_lat in range(math.floor(min_lat / size), math.floor(max_lat / size) + 1):
+            for cell_lon in range(math.floor(min_lon / size), math.floor(max_lon / size) + 1):
+                bucket = self.cells.get((cell_lat, cell_lon))
+                if bucket is not None:
+                    yield from bucket
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        predicate: Optional[Callable[[Any], bool]] = None
+    ) -> List[Tuple[float, Any]]:
+        """
+        All rows within radius_km, nearest first.
+
+        Args:
+            latitude: Centre latitude
+            longitude: Centre longitude
+            radius_km: Search radius in km
+            predicate: Optional row filter
+
+        Returns:
+            List of (distance_km, row) sorted by distance
+        """
+        lats, lons, rows = self.lats, self.lons, self.rows
+        # Flat-earth prefilter in degrees; padded so points near the edge are
+        # always left for the exact haversine check to decide
+        lon_scale = math.cos(math.radians(latitude))
+        limit_sq = (radius_km / KM_PER_DEGREE) ** 2 * 1.05
+
+        results = []
+        for i in self._candidates(latitude, longitude, radius_km):
+            d_lat = lats[i] - latitude
+            d_lon = (lons[i] - longitude) * lon_scale
+            if d_lat * d_lat + d_lon * d_lon > limit_sq:
+                continue
+            if predicate is not None and not predicate(rows[i]):
+                continue
+            distance = haversine_km(latitude, longitude, lats[i], lons[i])
+            if distance <= radius_km:
+                results.append((distance, rows[i]))
+
+        results.sort(key=lambda item: item[0])
+        return results
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 1,
+        max_radius_km: float = 50.0,
+        predicate: Optional[Callable[[Any], bool]] = None
+    ) -> List[Tuple[float, Any]]:
+        """
+        The k nearest rows, searching outwards up to max_radius_km.
+
+        Returns:
+            Up to k (distance_km, row) pairs sorted by distance
+        """
+        radius = self.cell_degrees * KM_PER_DEGREE
+        while True:
+            radius = min(radius, max_radius_km)
+            found = self.within(latitude, longitude, radius, predicate)
+            # Everything within `radius` has been seen, so the first k are exact
+            if len(found) >= k or radius >= max_radius_km:
+                return found[:k]
+            radius *= 2
+
+
+_indexes: Dict[Tuple[str, str], Tuple[float, GeoIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_geo_index(
+    db_path: str,
+    query: str,
+    cell_degrees: float = DEFAULT_CELL_DEGREES,
+    id_column: Optional[str] = None
+) -> GeoIndex:
+    """
+    Shared index for (db_path, query), loaded once per process.
+
+    Reloaded automatically when the database file is replaced (mtime change),
+    e.g. after re-running a download script. See GeoIndex.from_sqlite for
+    id_column.
+    """
+    mtime = os.path.getmtime(db_path)
+    key = (os.path.abspath(db_path), query)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        index = GeoIndex.from_sqlite(db_path, query, cell_degrees, id_column)
+        _indexes[key] = (mtime, index)
+        return index
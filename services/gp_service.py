@@ -15,25 +15,23 @@ Contains 12,000+ active GP practices in England.
 """
 import sqlite3
 import logging
-import math
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 
-logger = logging.getLogger(__name__)
-
+from backend.config import settings
+from services.distance_utils import haversine_km
+from services.geo_index import get_geo_index
+from services.sqlite_pool import read_connection
 
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in km."""
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+logger = logging.getLogger(__name__)
 
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
 
-    return R * c
+# Columns held in memory by the shared geo index
+PRACTICES_INDEX_QUERY = """
+    SELECT code, name, address, postcode, town, phone, latitude, longitude
+    FROM gp_practices
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+"""
 
 
 class GPService:
@@ -82,44 +80,28 @@ class GPService:
             return []
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            if settings.geo_index_enabled:
+                nearby = get_geo_index(self.db_path, PRACTICES_INDEX_QUERY).within(latitude, longitude, radius_km)
+            else:
+                nearby = self._nearby_from_db(latitude, longitude, radius_km)
 
-            query = """
-                SELECT * FROM gp_practices
-                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
-            """
-
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
-
-            # Calculate distances and filter
             practices = []
-            for row in rows:
-                if row['latitude'] and row['longitude']:
-                    distance = haversine_km(
-                        latitude, longitude,
-                        float(row['latitude']), float(row['longitude'])
-                    )
-
-                    if distance <= radius_km:
-                        practices.append({
-                            'code': row['code'],
-                            'name': row['name'],
-                            'address': row['address'],
-                            'postcode': row['postcode'],
-                            'town': row['town'],
-                            'phone': row['phone'],
-                            'latitude': row['latitude'],
-                            'longitude': row['longitude'],
-                            'distance_km': round(distance, 2),
-                            'distance_miles': round(distance * 0.621371, 2),
-                            'data_source': 'NHS Digital Organisation Data Service',
-                            'verification_url': f'https://odsportal.digital.nhs.uk/Organisation/Search?Code={row["code"]}',
-                            'verified': True
-                        })
+            for distance, row in nearby:
+                practices.append({
+                    'code': row['code'],
+                    'name': row['name'],
+                    'address': row['address'],
+                    'postcode': row['postcode'],
+                    'town': row['town'],
+                    'phone': row['phone'],
+                    'latitude': row['latitude'],
+                    'longitude': row['longitude'],
+                    'distance_km': round(distance, 2),
+                    'distance_miles': round(distance * 0.621371, 2),
+                    'data_source': 'NHS Digital Organisation Data Service',
+                    'verification_url': f'https://odsportal.digital.nhs.uk/Organisation/Search?Code={row["code"]}',
+                    'verified': True
+                })
 
             # Sort by distance
             practices.sort(key=lambda p: p['distance_km'])
@@ -130,6 +112,39 @@ class GPService:
             logger.error(f"Error finding nearby GP practices: {e}")
             return []
 
+    def warm_geo_index(self) -> None:
+        """Load the shared in-memory index now rather than on the first query."""
+        if self.available and settings.geo_index_enabled:
+            get_geo_index(self.db_path, PRACTICES_INDEX_QUERY)
+
+    def _nearby_from_db(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float
+    ) -> List[Tuple[float, sqlite3.Row]]:
+        """Practices within radius by scanning the gp_practices table."""
+        cursor = read_connection(self.db_path).cursor()
+
+        query = """
+            SELECT * FROM gp_practices
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """
+
+        cursor.execute(query)
+        rows = cursor.fetchall()
+
+        nearby = []
+        for row in rows:
+            if row['latitude'] is not None and row['longitude'] is not None:
+                distance = haversine_km(
+                    latitude, longitude,
+                    float(row['latitude']), float(row['longitude'])
+                )
+                if distance <= radius_km:
+                    nearby.append((distance, row))
+        return nearby
+
     def get_gp_summary(
         self,
         latitude: float,
@@ -14,10 +14,20 @@ DATA VERIFICATION:
 All government data includes verification URLs and official codes.
 Crowdsourced data is marked as unverified.
 """
+import asyncio
+import copy
+import functools
+import hashlib
 import logging
-from typing import Optional, Dict, List
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Dict, List
 from pathlib import Path
 
+from services.cache_manager import CacheManager
+from services.persistent_cache import PersistentCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,13 +47,38 @@ class LocationIntelligenceService:
         schools_service=None,
         transport_service=None,
         gp_service=None,
-        places_client=None
+        places_client=None,
+        section_timeout_seconds: float = 5.0,
+        max_workers: int = 4,
+        report_cache: Optional[PersistentCache] = None,
+        memory_cache_size: int = 0,
+        cache_ttl_seconds: int = 7 * 24 * 3600,
+        cache_cell_degrees: float = 0.002
     ):
-        """Initialize with optional pre-created services."""
+        """
+        Initialize with optional pre-created services.
+
+        Args:
+            section_timeout_seconds: Budget per report section; slower sections are reported unavailable
+            max_workers: Threads for the blocking SQLite-backed lookups
+            report_cache: Optional on-disk tier of the report cache
+            memory_cache_size: Entries in the in-memory tier (0 disables it)
+            cache_ttl_seconds: Report cache lifetime
+            cache_cell_degrees: Size of the lat/lon cell reports are cached per
+        """
         self._schools_service = schools_service
         self._transport_service = transport_service
         self._gp_service = gp_service
         self._places_client = places_client
+        self.section_timeout_seconds = section_timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="location")
+
+        # Two-tier report cache: nearby properties share a cell, and therefore a report
+        self.report_cache = report_cache
+        self._memory_cache = CacheManager(max_size=memory_cache_size) if memory_cache_size > 0 else None
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_cell_degrees = cache_cell_degrees
+        self.memory_hits = 0
 
     @property
     def schools_service(self):
@@ -93,14 +128,33 @@ class LocationIntelligenceService:
         self,
         latitude: float,
         longitude: float,
-        radius_km: float = 1.6
+        radius_km: float = 1.6,
+        use_cache: bool = True
     ) -> Dict:
         """
         Get comprehensive location intelligence for a property.
 
         Returns all verified positive data about the location.
         Government data sources are marked as verified.
+
+        With caching enabled the report is computed for the centre of the
+        property's lat/lon cell (~200m) and shared by every property in it,
+        so distances can differ from the exact address by about 0.1 miles.
+        Each section is cached separately, so the local-data sections of a
+        cell stay cached even when an OpenStreetMap section times out; only
+        the missing sections are recomputed next time. Cache entries are
+        keyed on the dataset files' versions, so rebuilding the
+        schools/NaPTAN/GP databases invalidates them. Pass use_cache=False
+        to recompute (fresh sections replace the cached ones).
+
+        The report's `complete` flag is False when a section failed, timed
+        out or came back partial.
         """
+        cache_key = None
+        if self._caching_enabled():
+            latitude, longitude = self._snap_to_cell(latitude, longitude)
+            cache_key = self._report_cache_key(latitude, longitude, radius_km)
+
         result = {
             'schools': {
                 'available': False,
@@ -171,61 +225,74 @@ class LocationIntelligenceService:
             }
         }
 
+        # Blocking SQLite lookups go to the thread pool, Overpass calls run
+        # alongside them; every section shares the same timeout budget
+        sections: Dict[str, Callable[[], Awaitable]] = {}
+
         # 1. Schools (OFFICIAL - Ofsted)
         if self.schools_service and self.schools_service.available:
-            try:
-                schools_summary = self.schools_service.get_school_summary(
-                    latitude, longitude, radius_km
-                )
-                result['schools'] = schools_summary
-                result['schools']['data_source'] = 'Ofsted Management Information (gov.uk)'
-                result['schools']['data_verified'] = True
-            except Exception as e:
-                logger.warning(f"Error getting schools data: {e}")
+            sections['schools'] = functools.partial(
+                self._in_thread, self.schools_service.get_school_summary, latitude, longitude, radius_km
+            )
 
         # 2. Transport (OFFICIAL - NaPTAN/DfT)
         if self.transport_service and self.transport_service.available:
-            try:
-                transport_summary = self.transport_service.get_transport_summary(
-                    latitude, longitude, radius_km * 1.5  # Wider radius for transport
-                )
-                result['transport'] = transport_summary
-            except Exception as e:
-                logger.warning(f"Error getting transport data: {e}")
+            sections['transport'] = functools.partial(
+                self._in_thread, self.transport_service.get_transport_summary,
+                latitude, longitude, radius_km * 1.5  # Wider radius for transport
+            )
 
         # 3. Medical (OFFICIAL - NHS Digital)
         if self.gp_service and self.gp_service.available:
-            try:
-                gp_summary = self.gp_service.get_gp_summary(latitude, longitude, radius_km)
-                result['medical'] = gp_summary
-            except Exception as e:
-                logger.warning(f"Error getting GP data: {e}")
+            sections['medical'] = functools.partial(
+                self._in_thread, self.gp_service.get_gp_summary, latitude, longitude, radius_km
+            )
 
-        # 4. Supermarkets (OpenStreetMap - crowdsourced)
+        # 4. Supermarkets and 5. Leisure (OpenStreetMap - crowdsourced)
         if self.places_client:
-            try:
-                supermarket_data = await self.places_client.search_branded_supermarkets(
-                    latitude, longitude, int(radius_km * 1500)
-                )
-                result['supermarkets'] = supermarket_data
-                result['supermarkets']['data_source'] = 'OpenStreetMap (crowdsourced)'
-                result['supermarkets']['data_verified'] = False
-                result['supermarkets']['available'] = True
-            except Exception as e:
-                logger.warning(f"Error getting supermarket data: {e}")
-
-        # 5. Leisure (OpenStreetMap - crowdsourced)
-        if self.places_client:
-            try:
-                leisure_data = await self.places_client.search_leisure(
-                    latitude, longitude, int(radius_km * 1000)
-                )
-                result['leisure'] = leisure_data
-                result['leisure']['data_source'] = 'OpenStreetMap (crowdsourced)'
-                result['leisure']['data_verified'] = False
-                result['leisure']['available'] = True
-            except Exception as e:
-                logger.warning(f"Error getting leisure data: {e}")
+            sections['supermarkets'] = functools.partial(
+                self.places_client.search_branded_supermarkets,
+                latitude, longitude, int(radius_km * 1500)
+            )
+            sections['leisure'] = functools.partial(
+                self.places_client.search_leisure,
+                latitude, longitude, int(radius_km * 1000)
+            )
+
+        outcomes: Dict[str, Optional[Dict]] = {}
+        if cache_key is not None and use_cache:
+            cached = await asyncio.gather(*(
+                self._get_cached_report(f"{cache_key}:{name}") for name in sections
+            ))
+            outcomes.update(zip(sections, cached))
+
+        pending = [name for name in sections if outcomes.get(name) is None]
+        computed = await asyncio.gather(*(
+            self._run_section(name, sections[name]()) for name in pending
+        ))
+
+        # A section that timed out, or came back partial because some
+        # OpenStreetMap categories failed, isn't the same as "nothing nearby":
+        # it isn't cached, and is tried again on the next request
+        complete = True
+        for name, data in zip(pending, computed):
+            outcomes[name] = data
+            if data is None or not data.get('complete', True):
+                complete = False
+            elif cache_key is not None:
+                await self._store_report(f"{cache_key}:{name}", data)
+
+        for name, data in outcomes.items():
+            if data is None:
+                continue
+            result[name] = data
+            if name == 'schools':
+                result['schools']['data_source'] = 'Ofsted Management Information (gov.uk)'
+                result['schools']['data_verified'] = True
+            elif name in ('supermarkets', 'leisure'):
+                result[name]['data_source'] = 'OpenStreetMap (crowdsourced)'
+                result[name]['data_verified'] = False
+                result[name]['available'] = True
 
         # Combine highlights - prioritize VERIFIED data first
         all_highlights = []
@@ -254,9 +321,190 @@ class LocationIntelligenceService:
 
         # Generate brochure text
         result['brochure_text'] = self._generate_brochure_text(result)
+        result['complete'] = complete
 
         return result
 
+    async def iter_batch_reports(
+        self,
+        locations: List[Dict],
+        radius_km: float = 1.6,
+        geocoder=None,
+        concurrency: int = 8,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        Location reports for many properties, yielded as each completes.
+
+        Locations are {"latitude", "longitude"} or {"postcode"} (resolved with
+        the geocoder). Properties sharing a cache cell share one report
+        computation, so a portfolio of 500 instructions in a few towns costs
+        far fewer than 500 lookups; every section that completes also lands
+        in the report cache for later single-property requests. Reports whose
+        `complete` flag is False (usually OpenStreetMap sections that timed
+        out behind the Overpass rate limit) fill in on a later run.
+
+        Args:
+            locations: Location dicts, in input order
+            radius_km: Search radius for every report
+            geocoder: GeocodingClient used for postcode-only locations
+            concurrency: Reports computed at once
+            use_cache: Whether to return cached reports if available
+
+        Yields:
+            {"index", "status": "ok", "postcode", "latitude", "longitude", "report"}
+            or {"index", "status": "error", "error"} per location
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def resolve(location: Dict) -> Dict:
+            latitude, longitude = location.get('latitude'), location.get('longitude')
+            postcode = location.get('postcode')
+            if latitude is not None and longitude is not None:
+                return {'postcode': postcode, 'latitude': latitude, 'longitude': longitude}
+            if not postcode:
+                raise ValueError("Provide a postcode or both latitude and longitude")
+            if geocoder is None:
+                raise ValueError("Postcode lookup not available")
+            async with semaphore:
+                coords = await geocoder.lookup_postcode(postcode)
+            if not coords:
+                raise ValueError(f"Postcode not found: {postcode}")
+            return {'postcode': coords.get('postcode'), 'latitude': coords['latitude'], 'longitude': coords['longitude']}
+
+        resolved = await asyncio.gather(*(resolve(location) for location in locations), return_exceptions=True)
+
+        # Group by cache cell (or exact point when caching is off)
+        groups: Dict[tuple, List[int]] = {}
+        for index, place in enumerate(resolved):
+            if isinstance(place, Exception):
+                yield {'index': index, 'status': 'error', 'error': str(place)}
+                continue
+            if self._caching_enabled():
+                key = self._snap_to_cell(place['latitude'], place['longitude'])
+            else:
+                key = (place['latitude'], place['longitude'])
+            groups.setdefault(key, []).append(index)
+
+        async def run_group(indices: List[int]) -> List[Dict]:
+            first = resolved[indices[0]]
+            try:
+                async with semaphore:
+                    report = await self.get_full_location_report(
+                        first['latitude'], first['longitude'], radius_km, use_cache=use_cache
+                    )
+            except Exception as e:
+                logger.warning(f"Batch location report failed: {e}")
+                return [{'index': index, 'status': 'error', 'error': str(e)} for index in indices]
+            return [
+                {'index': index, 'status': 'ok', **resolved[index], 'report': report}
+                for index in indices
+            ]
+
+        logger.info(f"Batch location reports: {len(locations)} locations in {len(groups)} cells")
+        tasks = [asyncio.create_task(run_group(indices)) for indices in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for entry in await next_done:
+                    yield entry
+        finally:
+            # Consumer went away - don't keep computing reports nobody reads
+            for task in tasks:
+                task.cancel()
+
+    def _caching_enabled(self) -> bool:
+        return self.report_cache is not None or self._memory_cache is not None
+
+    def _snap_to_cell(self, latitude: float, longitude: float):
+        """Centre of the cache cell containing the point."""
+        size = self.cache_cell_degrees
+        return (
+            round((math.floor(latitude / size) + 0.5) * size, 6),
+            round((math.floor(longitude / size) + 0.5) * size, 6)
+        )
+
+    def _dataset_version(self) -> str:
+        """Fingerprint of the local datasets (file mtime and size)."""
+        parts = []
+        # The public properties load the services on first use, so the first
+        # report is keyed on the same datasets as every later one
+        for service in (self.schools_service, self.transport_service, self.gp_service):
+            db_path = getattr(service, 'db_path', None)
+            if db_path and getattr(service, 'available', False):
+                try:
+                    stat = os.stat(db_path)
+                    parts.append(f"{os.path.basename(db_path)}:{stat.st_mtime_ns}:{stat.st_size}")
+                except OSError:
+                    parts.append(f"{os.path.basename(db_path)}:missing")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+    def _report_cache_key(self, latitude: float, longitude: float, radius_km: float) -> str:
+        return f"location:{self._dataset_version()}:{latitude:.6f}:{longitude:.6f}:{radius_km:g}"
+
+    async def _get_cached_report(self, cache_key: str) -> Optional[Dict]:
+        """Look up a report section in memory, then on disk (promoting disk hits to memory)."""
+        if self._memory_cache is not None:
+            report = self._memory_cache.get(cache_key)
+            if report is not None:
+                self.memory_hits += 1
+                return copy.deepcopy(report)
+
+        if self.report_cache is not None:
+            report = await asyncio.to_thread(self.report_cache.get, cache_key)
+            if report is not None:
+                if self._memory_cache is not None:
+                    self._memory_cache.set(cache_key, copy.deepcopy(report), self.cache_ttl_seconds)
+                return report
+
+        return None
+
+    async def _store_report(self, cache_key: str, report: Dict):
+        if self._memory_cache is not None:
+            self._memory_cache.set(cache_key, copy.deepcopy(report), self.cache_ttl_seconds)
+        if self.report_cache is not None:
+            try:
+                await asyncio.to_thread(self.report_cache.set, cache_key, report, self.cache_ttl_seconds)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Could not cache location report: {e}")
+
+    def cache_stats(self) -> Optional[Dict]:
+        """
+        Get report cache counters.
+
+        Returns:
+            Dict with memory and disk tier stats, or None if caching is disabled
+        """
+        if not self._caching_enabled():
+            return None
+        return {
+            "memory_entries": self._memory_cache.size() if self._memory_cache is not None else 0,
+            "memory_hits": self.memory_hits,
+            "disk": self.report_cache.stats() if self.report_cache is not None else None,
+            "dataset_version": self._dataset_version(),
+            "cell_degrees": self.cache_cell_degrees
+        }
+
+    def _in_thread(self, func, *args) -> Awaitable:
+        """Run a blocking lookup on the bounded thread pool."""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _run_section(self, name: str, awaitable: Awaitable) -> Optional[Any]:
+        """
+        Await one report section within the timeout budget.
+
+        Returns:
+            Section data, or None if it failed or timed out (the section is
+            then reported as unavailable)
+        """
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.section_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Location section '{name}' timed out after {self.section_timeout_seconds}s")
+        except Exception as e:
+            logger.warning(f"Error getting {name} data: {e}")
+        return None
+
     def _generate_brochure_text(self, data: Dict) -> Dict:
         """Generate pre-formatted text for brochure sections."""
         brochure = {
@@ -302,6 +550,11 @@ class LocationIntelligenceService:
                 if tube['distance_miles'] <= 0.75:
                     bullets.append(f"{tube['name']} Underground ({tube['distance_miles']} miles)")
 
+            if transport.get('nearest_bus'):
+                bus = transport['nearest_bus']
+                if bus['distance_miles'] <= 0.25:
+                    bullets.append(f"Bus stop: {bus['name']} ({bus['distance_miles']} miles)")
+
         # Medical (VERIFIED)
         medical = data.get('medical', {})
         if medical.get('available') and medical.get('count', 0) >= 1:
@@ -347,12 +600,24 @@ def get_location_intelligence_service(
     schools_service=None,
     transport_service=None,
     gp_service=None,
-    places_client=None
+    places_client=None,
+    section_timeout_seconds: float = 5.0,
+    max_workers: int = 4,
+    report_cache: Optional[PersistentCache] = None,
+    memory_cache_size: int = 0,
+    cache_ttl_seconds: int = 7 * 24 * 3600,
+    cache_cell_degrees: float = 0.002
 ) -> LocationIntelligenceService:
     """Factory function to create location intelligence service."""
     return LocationIntelligenceService(
         schools_service=schools_service,
         transport_service=transport_service,
         gp_service=gp_service,
-        places_client=places_client
+        places_client=places_client,
+        section_timeout_seconds=section_timeout_seconds,
+        max_workers=max_workers,
+        report_cache=report_cache,
+        memory_cache_size=memory_cache_size,
+        cache_ttl_seconds=cache_ttl_seconds,
+        cache_cell_degrees=cache_cell_degrees
     )
@@ -0,0 +1,212 @@
+"""
+Offline OpenStreetMap amenity store.
+
+A local SQLite copy of the PlacesClient categories, built from a UK OSM
+extract by scripts/build_osm_amenities.py. Each (element, category) match
+is one row with a point location (way centers for areas), indexed with an
+R*Tree so radius lookups are a bounding-box probe plus an exact haversine
+check - no network, a few milliseconds per query, and the same answer for
+the same location until the store is rebuilt.
+"""
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from services.distance_utils import bounding_box, haversine_km
+from services.sqlite_pool import read_connection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS amenities (
+        id INTEGER PRIMARY KEY,
+        osm_type TEXT NOT NULL,
+        osm_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        name TEXT,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS amenities_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+# One Overpass tag clause: ["key"="value"], ["key"!="value"], ["key"~"regex"] or ["key"~"regex",i]
+_CLAUSE_RE = re.compile(r'\["([^"]+)"(=|!=|~|!~)"([^"]*)"(,i)?\]')
+
+TagClause = Tuple[str, str, object]
+
+
+def compile_tag_filter(query_filter: str) -> List[TagClause]:
+    """
+    Parse an Overpass tag filter (as used in PlacesClient.CATEGORY_QUERIES).
+
+    Args:
+        query_filter: e.g. '["shop"="supermarket"]["brand"~"Waitrose",i]'
+
+    Returns:
+        List of (key, operator, value or compiled regex) clauses
+
+    Raises:
+        ValueError: If the filter uses syntax outside the supported subset
+    """
+    clauses: List[TagClause] = []
+    position = 0
+    for match in _CLAUSE_RE.finditer(query_filter):
+        if match.start() != position:
+            break
+        key, operator, value, case_insensitive = match.groups()
+        if operator in ("~", "!~"):
+            value = re.compile(value, re.IGNORECASE if case_insensitive else 0)
+        clauses.append((key, operator, value))
+        position = match.end()
+    if position != len(query_filter) or not clauses:
+        raise ValueError(f"Unsupported tag filter: {query_filter}")
+    return clauses
+
+
+def tags_match(tags: Mapping[str, str], clauses: Sequence[TagClause]) -> bool:
+    """True if an element's tags satisfy every clause (Overpass semantics)."""
+    for key, operator, value in clauses:
+        actual = tags.get(key)
+        if operator == "=":
+            if actual != value:
+                return False
+        elif operator == "!=":
+            if actual == value:
+                return False
+        elif operator == "~":
+            if actual is None or not value.search(actual):
+                return False
+        elif actual is not None and value.search(actual):  # "!~"
+            return False
+    return True
+
+
+class OSMAmenityStore:
+    """
+    Read-only radius queries over the offline amenity database.
+
+    Queries are blocking and run on the calling thread's pooled connection;
+    async callers should run them in a worker thread.
+
+    Results have the same shape as PlacesClient.search_nearby:
+    name, latitude, longitude, type (category).
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path to amenities.db (defaults to data/osm/amenities.db)
+        """
+        if db_path is None:
+            base_dir = Path(__file__).parent.parent
+            db_path = base_dir / "data" / "osm" / "amenities.db"
+
+        self.db_path = str(db_path)
+        self.categories: frozenset = frozenset()
+
+        if not Path(self.db_path).exists():
+            logger.info(f"OSM amenity store not found at: {self.db_path}")
+            self.available = False
+            return
+
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                metadata = dict(conn.execute("SELECT key, value FROM metadata"))
+                if metadata.get("categories"):
+                    # Every category the build matched against, including ones with no results
+                    self.categories = frozenset(metadata["categories"].split(","))
+                else:
+                    self.categories = frozenset(
+                        row[0] for row in conn.execute("SELECT DISTINCT category FROM amenities")
+                    )
+            finally:
+                conn.close()
+            self.available = True
+            logger.info(
+                f"OSM amenity store initialized with {len(self.categories)} categories "
+                f"(built {metadata.get('built_at', 'unknown')})"
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"OSM amenity store unusable ({e}), falling back to Overpass")
+            self.available = False
+
+    def covers(self, categories: Sequence[str]) -> bool:
+        """True if the store can answer every one of these categories."""
+        return self.available and all(category in self.categories for category in categories)
+
+    def search_many(
+        self,
+        latitude: float,
+        longitude: float,
+        categories: Sequence[str],
+        radius_meters: int = 1600
+    ) -> Dict[str, List[dict]]:
+        """
+        Find amenities of several categories within a radius.
+
+        Args:
+            latitude: Center point latitude
+            longitude: Center point longitude
+            categories: Category names (PlacesClient.CATEGORY_QUERIES keys)
+            radius_meters: Search radius in meters
+
+        Returns:
+            Dict of category -> POI list, nearest first (every requested
+            category present, empty if none found)
+        """
+        results: Dict[str, List[dict]] = {category: [] for category in categories}
+        if not categories:
+            return results
+
+        radius_km = radius_meters / 1000
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        placeholders = ",".join("?" * len(results))
+
+        rows = read_connection(self.db_path).execute(f"""
+            SELECT a.category, a.name, a.latitude, a.longitude
+            FROM amenities_rtree r
+            JOIN amenities a ON a.id = r.id
+            WHERE r.min_lat <= ? AND r.max_lat >= ?
+              AND r.min_lon <= ? AND r.max_lon >= ?
+              AND a.category IN ({placeholders})
+        """, (max_lat, min_lat, max_lon, min_lon, *results)).fetchall()
+
+        for category, name, lat, lon in rows:
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                results[category].append((distance, {
+                    "name": name or "Unnamed",
+                    "latitude": lat,
+                    "longitude": lon,
+                    "type": category,
+                }))
+
+        return {
+            category: [poi for _, poi in sorted(found, key=lambda item: item[0])]
+            for category, found in results.items()
+        }
+
+    def search_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        category: str,
+        radius_meters: int = 1600
+    ) -> List[dict]:
+        """Find amenities of one category within a radius, nearest first."""
+        return self.search_many(latitude, longitude, [category], radius_meters)[category]
+
+
+def get_osm_amenity_store(db_path: Optional[str] = None) -> OSMAmenityStore:
+    """Factory function to get the OSM amenity store"""
+    return OSMAmenityStore(db_path=db_path)
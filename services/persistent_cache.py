@@ -0,0 +1,243 @@
+"""
+SQLite-backed persistent cache with TTL and size-bounded LRU eviction.
+Survives restarts, unlike the in-memory CacheManager.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentCache:
+    """
+    On-disk key/value cache stored in a single SQLite file.
+
+    Features:
+    - TTL-based expiry per entry
+    - Size-bounded LRU eviction (total stored bytes), with access times
+      written at most once per touch interval per entry
+    - Hit/miss/eviction counters
+    - Thread-safe (single connection guarded by a lock)
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size_mb: float = 100.0,
+        default_ttl_seconds: int = 7 * 24 * 3600,
+        touch_interval_seconds: float = 300.0
+    ):
+        """
+        Initialize the persistent cache.
+
+        Args:
+            db_path: Path to the SQLite cache file (created if missing)
+            max_size_mb: Maximum total size of stored values in MB
+            default_ttl_seconds: TTL used when set() is called without one
+            touch_interval_seconds: Minimum age of an entry's last_accessed
+                before a hit rewrites it (LRU order is only this precise)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.default_ttl_seconds = default_ttl_seconds
+        self.touch_interval_seconds = touch_interval_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_last_accessed ON cache_entries(last_accessed)"
+        )
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+        self._total_size = row[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retrieve a value from the cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value if found and not expired, None otherwise
+        """
+        value = self.get_bytes(key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        """
+        Store a JSON-serialisable value in the cache.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl_seconds: Time to live in seconds (default: default_ttl_seconds)
+        """
+        self.set_bytes(key, json.dumps(value).encode("utf-8"), ttl_seconds)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Retrieve raw bytes from the cache.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached bytes if found and not expired, None otherwise
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, expires_at, last_accessed FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at, last_accessed = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_size -= size
+                self.misses += 1
+                return None
+
+            # Hot entries would otherwise cost a write and commit on every hit
+            if now - last_accessed >= self.touch_interval_seconds:
+                self._conn.execute(
+                    "UPDATE cache_entries SET last_accessed = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            self.hits += 1
+            return bytes(value)
+
+    def set_bytes(self, key: str, value: bytes, ttl_seconds: Optional[int] = None):
+        """
+        Store raw bytes in the cache, evicting least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Bytes to cache
+            ttl_seconds: Time to live in seconds (default: default_ttl_seconds)
+        """
+        size = len(value)
+        if size > self.max_size_bytes:
+            logger.debug(f"Value for {key} ({size} bytes) exceeds cache size, not caching")
+            return
+
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT size FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if existing:
+                self._total_size -= existing[0]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, now + ttl, now)
+            )
+            self._total_size += size
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        """Drop expired entries, then LRU entries until under the size bound."""
+        if self._total_size <= self.max_size_bytes:
+            return
+
+        expired_count, expired_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE expires_at < ?", (now,)
+        ).fetchone()
+        if expired_count:
+            self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+            self._total_size -= expired_size
+            self.evictions += expired_count
+
+        while self._total_size > self.max_size_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache_entries ORDER BY last_accessed ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_size = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._total_size -= size
+                self.evictions += 1
+                if self._total_size <= self.max_size_bytes:
+                    break
+
+    def delete(self, key: str):
+        """Remove a single entry if present."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_size -= row[0]
+
+    def clear(self):
+        """Clear all cached items."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+            self._conn.commit()
+            self._total_size = 0
+
+    def size(self) -> int:
+        """Get the current number of cached items."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict with hits, misses, hit_rate, evictions, entries and size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self.size(),
+            "size_mb": round(self._total_size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_size_bytes / (1024 * 1024), 2),
+        }
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,257 @@
+"""
+Content-addressed photo storage with reference counting.
+
+Photo bytes are stored once per SHA-256 digest under a sharded directory
+tree (blobs/ab/cd/abcd...jpg); owners such as brochure sessions hold named
+references to them. Saving a photo that is already stored only adds a
+reference, and blobs are deleted by collect_garbage() once their last
+reference has been released.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoBlobStore:
+    """
+    Deduplicated photo files shared between owners.
+
+    Features:
+    - One file per distinct photo, named by its SHA-256 digest
+    - (owner, name) references with a reference count per blob
+    - Garbage collection of unreferenced blobs
+    - Thread-safe (single index connection guarded by a lock)
+    """
+
+    def __init__(self, base_dir: Path):
+        """
+        Initialize the blob store.
+
+        Args:
+            base_dir: Directory for the blob files and their index (created if missing)
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+        self.writes = 0
+        self.deduplicated = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.base_dir / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                extension TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                owner TEXT NOT NULL,
+                name TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (owner, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_refcount ON blobs(refcount);
+        """)
+        self._conn.commit()
+
+    def _blob_path(self, digest: str, extension: str) -> Path:
+        return self.base_dir / digest[:2] / digest[2:4] / f"{digest}{extension}"
+
+    def _write_blob(self, path: Path, data: bytes) -> None:
+        """Write via a temporary file so a crash never leaves a truncated blob."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _unref(self, digest: str) -> None:
+        self._conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+
+    def put(self, owner: str, name: str, data: bytes, extension: str) -> Path:
+        """
+        Store photo bytes and point owner/name at them.
+
+        Args:
+            owner: Reference owner (e.g. a session ID)
+            name: Name within the owner (e.g. a photo ID); replaces any existing reference
+            data: Photo bytes
+            extension: File extension including the dot (e.g. ".jpg")
+
+        Returns:
+            Path to the stored blob
+        """
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extension FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is not None:
+                # Same bytes always keep the extension they were first stored with
+                extension = row[0]
+            path = self._blob_path(digest, extension)
+
+            if row is not None and path.exists():
+                self.deduplicated += 1
+            else:
+                self._write_blob(path, data)
+                self.writes += 1
+
+            previous = self._conn.execute(
+                "SELECT digest FROM refs WHERE owner = ? AND name = ?", (owner, name)
+            ).fetchone()
+            if previous is not None and previous[0] == digest:
+                return path
+
+            with self._conn:
+                if previous is not None:
+                    self._unref(previous[0])
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO blobs (digest, extension, size, refcount, created_at) VALUES (?, ?, ?, 1, ?)",
+                        (digest, extension, len(data), time.time())
+                    )
+                else:
+                    self._conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO refs (owner, name, digest) VALUES (?, ?, ?)", (owner, name, digest)
+                )
+
+        return path
+
+    def get_path(self, owner: str, name: str) -> Optional[Path]:
+        """
+        Path to the blob referenced by owner/name.
+
+        Returns:
+            Blob path, or None if there is no such reference (or its file is missing)
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT b.digest, b.extension
+                FROM refs r JOIN blobs b ON b.digest = r.digest
+                WHERE r.owner = ? AND r.name = ?
+            """, (owner, name)).fetchone()
+        if row is None:
+            return None
+        path = self._blob_path(*row)
+        return path if path.exists() else None
+
+    def names(self, owner: str) -> List[str]:
+        """Names referenced by an owner."""
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM refs WHERE owner = ? ORDER BY name", (owner,)).fetchall()
+        return [row[0] for row in rows]
+
+    def owners(self) -> List[str]:
+        """Every owner holding at least one reference."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT owner FROM refs").fetchall()
+        return [row[0] for row in rows]
+
+    def release(self, owner: str) -> int:
+        """
+        Drop all of an owner's references (blobs are removed by collect_garbage).
+
+        Args:
+            owner: Reference owner
+
+        Returns:
+            Number of references released
+        """
+        with self._lock, self._conn:
+            digests = [
+                row[0] for row in self._conn.execute("SELECT digest FROM refs WHERE owner = ?", (owner,))
+            ]
+            for digest in digests:
+                self._unref(digest)
+            self._conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+        return len(digests)
+
+    def release_unused(self, owner: str, keep: Iterable[str]) -> int:
+        """
+        Drop an owner's references whose names are not in keep.
+
+        Args:
+            owner: Reference owner
+            keep: Names still in use
+
+        Returns:
+            Number of references released
+        """
+        keep = set(keep)
+        with self._lock, self._conn:
+            stale = [
+                (name, digest)
+                for name, digest in self._conn.execute("SELECT name, digest FROM refs WHERE owner = ?", (owner,))
+                if name not in keep
+            ]
+            for name, digest in stale:
+                self._unref(digest)
+                self._conn.execute("DELETE FROM refs WHERE owner = ? AND name = ?", (owner, name))
+        return len(stale)
+
+    def collect_garbage(self) -> Tuple[int, int]:
+        """
+        Delete blobs whose last reference has been released.
+
+        Returns:
+            Tuple of (blobs deleted, bytes freed)
+        """
+        deleted = 0
+        freed = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, extension, size FROM blobs WHERE refcount <= 0"
+            ).fetchall()
+            for digest, extension, size in rows:
+                path = self._blob_path(digest, extension)
+                try:
+                    path.unlink()
+                    # Drop shard directories left empty (puts hold the same lock)
+                    for shard in (path.parent, path.parent.parent):
+                        if any(shard.iterdir()):
+                            break
+                        shard.rmdir()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to delete photo blob {digest}: {e}")
+                    continue
+                deleted += 1
+                freed += size
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM blobs WHERE digest = ? AND refcount <= 0", ((row[0],) for row in rows)
+                )
+
+        if deleted:
+            logger.info(f"🗑️ Deleted {deleted} unreferenced photo blobs ({freed / (1024 * 1024):.1f} MB)")
+        return deleted, freed
+
+    def stats(self) -> Dict:
+        """Blob/reference counts, stored bytes and write/dedup counters."""
+        with self._lock:
+            blobs, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            refs = self._conn.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+        return {
+            "blobs": blobs,
+            "references": refs,
+            "stored_bytes": stored_bytes,
+            "writes": self.writes,
+            "deduplicated": self.deduplicated
+        }
@@ -0,0 +1,175 @@
+"""
+Near-duplicate photo detection using perceptual hashing.
+
+Photographers often upload bursts of near-identical frames. A 64-bit dHash
+(difference hash) is computed once per photo and photos within a small
+Hamming distance are grouped, so vision analysis can run on one
+representative per group and the editor can collapse the rest.
+
+Hashes are taken from the same upright, downsized pixels that are sent to
+the vision provider (orient_and_downsize), so a photo hashes the same
+whether it came through /analyze-images or a brochure session.
+"""
+import base64
+import logging
+from io import BytesIO
+from typing import List, Optional, Sequence
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 9x8 grayscale thumbnail -> 8 left/right comparisons per row -> 64 bits
+HASH_SIZE = 8
+
+# Hamming distance (out of 64 bits) at or below which two photos are near-duplicates
+DEFAULT_DUPLICATE_THRESHOLD = 6
+
+# Longest edge of the image sent to the vision provider (matches vision_max_dimension)
+DEFAULT_MAX_DIMENSION = 1568
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+# EXIF orientations other than 1 (already upright)
+TRANSPOSED_ORIENTATIONS = (2, 3, 4, 5, 6, 7, 8)
+
+
+def orient_and_downsize(image: Image.Image, max_dimension: int = DEFAULT_MAX_DIMENSION) -> Image.Image:
+    """
+    Decode an opened image upright, no larger than max_dimension, in RGB.
+
+    - JPEGs are decoded at reduced scale (1/2, 1/4, 1/8) when large enough
+    - EXIF transpose only when the orientation tag asks for it
+    - Downsize so the longest edge is at most max_dimension
+
+    Args:
+        image: Image from Image.open() (not yet loaded)
+        max_dimension: Longest edge in pixels
+
+    Returns:
+        Decoded RGB image
+    """
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+
+    if image.format == 'JPEG':
+        # Let libjpeg scale by 1/2, 1/4 or 1/8 while decoding
+        image.draft('RGB', (max_dimension, max_dimension))
+
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        image = ImageOps.exif_transpose(image)
+        logger.debug(f"Applied EXIF orientation {orientation}")
+
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def dhash(image: Image.Image) -> str:
+    """
+    Compute the difference hash of a decoded image.
+
+    Args:
+        image: Decoded PIL image (any mode/size)
+
+    Returns:
+        64-bit hash as a 16-character hex string (safe to send to JavaScript)
+    """
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:016x}"
+
+
+def dhash_bytes(image_data: bytes, max_dimension: int = DEFAULT_MAX_DIMENSION) -> Optional[str]:
+    """
+    Compute the difference hash of encoded image bytes.
+
+    Args:
+        image_data: Encoded image
+        max_dimension: Longest edge used by the vision upload pipeline
+
+    Returns:
+        Hex hash, or None if the image can't be decoded
+    """
+    try:
+        image = orient_and_downsize(Image.open(BytesIO(image_data)), max_dimension)
+        return dhash(image)
+    except Exception as e:
+        logger.debug(f"Could not hash image: {e}")
+        return None
+
+
+def dhash_data_url(data_url: str, max_dimension: int = DEFAULT_MAX_DIMENSION) -> Optional[str]:
+    """
+    Compute the difference hash of a base64 data URL (data:image/...;base64,...).
+
+    Args:
+        data_url: Image data URL
+        max_dimension: Longest edge used by the vision upload pipeline
+
+    Returns:
+        Hex hash, or None if the data URL can't be decoded
+    """
+    if not data_url or "," not in data_url:
+        return None
+    try:
+        return dhash_bytes(base64.b64decode(data_url.split(",", 1)[1]), max_dimension)
+    except Exception as e:
+        logger.debug(f"Could not decode data URL for hashing: {e}")
+        return None
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """Number of differing bits between two hex hashes."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def group_near_duplicates(
+    hashes: Sequence[Optional[str]],
+    threshold: int = DEFAULT_DUPLICATE_THRESHOLD
+) -> List[List[int]]:
+    """
+    Cluster photos by perceptual hash.
+
+    Leader clustering in input order: each photo joins the first group whose
+    representative (first member) is within `threshold` bits, otherwise it
+    starts a new group. Comparing against the representative rather than any
+    member stops slowly-changing sequences from chaining into one group, and
+    guarantees every member is close to the photo whose analysis it reuses.
+
+    Args:
+        hashes: Hex hash per photo (None for photos that couldn't be hashed)
+        threshold: Maximum Hamming distance for near-duplicates
+
+    Returns:
+        Groups of indices into `hashes` (singletons included), ordered by
+        representative; the first index of each group is its representative
+    """
+    groups: List[List[int]] = []
+    leaders: List[int] = []
+
+    for index, photo_hash in enumerate(hashes):
+        if photo_hash is not None:
+            value = int(photo_hash, 16)
+            for group, leader_value in zip(groups, leaders):
+                if leader_value is not None and bin(value ^ leader_value).count("1") <= threshold:
+                    group.append(index)
+                    break
+            else:
+                groups.append([index])
+                leaders.append(value)
+        else:
+            groups.append([index])
+            leaders.append(None)
+
+    duplicates = sum(len(group) - 1 for group in groups)
+    if duplicates:
+        logger.info(f"Found {duplicates} near-duplicate photos in {len(hashes)} ({len(groups)} distinct)")
+    return groups
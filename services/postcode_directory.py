@@ -0,0 +1,151 @@
+"""
+Local UK postcode directory.
+
+A SQLite copy of the ONS Postcode Directory (live postcodes only), built by
+scripts/build_postcode_directory.py. Postcodes are keyed by their
+space-free uppercase form in a WITHOUT ROWID table, so an exact lookup is a
+single B-tree probe and autocomplete is a bounded range scan over the same
+index - no network and sub-millisecond per call. Queries go through the
+shared read-only connection pool (services/sqlite_pool.py).
+"""
+import logging
+import sqlite3
+from pathlib import Path
+from typing import List, Optional
+
+from services.sqlite_pool import read_connection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS postcodes (
+        postcode_key TEXT PRIMARY KEY,
+        postcode TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        district TEXT,
+        county TEXT,
+        country TEXT
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+"""
+
+
+def normalize_postcode(postcode: str) -> str:
+    """Index key for a (possibly partial) postcode: uppercase, no spaces."""
+    return "".join(postcode.split()).upper()
+
+
+class PostcodeDirectory:
+    """
+    Exact and prefix postcode lookups over the local directory.
+
+    Results have the same shape as GeocodingClient.lookup_postcode:
+    latitude, longitude, postcode, district, county, country.
+    """
+
+    def __init__(self, db_path: str = None):
+        """
+        Initialize the directory.
+
+        Args:
+            db_path: Path to postcodes.db (defaults to data/postcodes/postcodes.db)
+        """
+        if db_path is None:
+            base_dir = Path(__file__).parent.parent
+            db_path = base_dir / "data" / "postcodes" / "postcodes.db"
+
+        self.db_path = str(db_path)
+
+        if not Path(self.db_path).exists():
+            logger.info(f"Postcode directory not found at: {self.db_path}")
+            self.available = False
+            return
+
+        try:
+            metadata = {
+                row["key"]: row["value"] for row in read_connection(self.db_path).execute("SELECT key, value FROM metadata")
+            }
+            self.available = True
+            logger.info(
+                f"Postcode directory initialized with {metadata.get('postcodes', 'unknown')} postcodes "
+                f"({metadata.get('source', 'unknown source')})"
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Postcode directory unusable ({e}), falling back to postcodes.io")
+            self.available = False
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        return {
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "postcode": row["postcode"],
+            "district": row["district"] or "",
+            "county": row["county"] or "",
+            "country": row["country"],
+        }
+
+    def lookup(self, postcode: str) -> Optional[dict]:
+        """
+        Look up a full postcode.
+
+        Args:
+            postcode: UK postcode in any spacing/case (e.g. "m1 4bt")
+
+        Returns:
+            Location dict, or None if the postcode isn't a live postcode
+        """
+        key = normalize_postcode(postcode)
+        if not key:
+            return None
+
+        row = read_connection(self.db_path).execute(
+            "SELECT * FROM postcodes WHERE postcode_key = ?", (key,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def autocomplete(self, partial_postcode: str, limit: int = 10) -> List[dict]:
+        """
+        Postcodes starting with a partial postcode, in postcode order.
+
+        Without a space the input is ambiguous, so "M14" matches both
+        "M1 4AA" and "M14 5AA" (as with postcodes.io); once a space is typed
+        the outward code is fixed and "M1 4" only matches "M1 4..".
+
+        Args:
+            partial_postcode: Partial or full postcode
+            limit: Maximum results
+
+        Returns:
+            List of location dicts
+        """
+        prefix = normalize_postcode(partial_postcode)
+        if not prefix:
+            return []
+
+        # Range scan on the primary key: every key with the prefix sorts
+        # between the prefix and the prefix followed by the highest character.
+        # Ranges rather than LIKE, so "%" or "_" in the input match literally
+        sql = """
+            SELECT * FROM postcodes
+            WHERE postcode_key >= ? AND postcode_key < ?
+        """
+        params = [prefix, prefix + "\uffff"]
+        if " " in partial_postcode.strip():
+            formatted = " ".join(partial_postcode.split()).upper()
+            sql += " AND postcode >= ? AND postcode < ?"
+            params.extend([formatted, formatted + "\uffff"])
+        sql += " ORDER BY postcode_key LIMIT ?"
+        params.append(limit)
+
+        rows = read_connection(self.db_path).execute(sql, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+
+def get_postcode_directory(db_path: Optional[str] = None) -> PostcodeDirectory:
+    """Get an instance of the postcode directory."""
+    return PostcodeDirectory(db_path=db_path)
@@ -1,45 +1,424 @@
 """
 Global rate limiter for API calls.
 
-Enforces minimum time between API calls across all requests to prevent
-acceleration limit errors.
+Token-bucket limiter shared by every Claude caller (text and vision):
+- separate requests-per-minute and tokens-per-minute budgets per model
+- a cap on in-flight requests across the deployment
+- adaptive backoff driven by 429/529 responses and retry-after headers
+- priority lanes so interactive edits are served before bulk photo analysis
 """
 import asyncio
+import heapq
+import itertools
+import logging
 import time
-from typing import Optional
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority lanes. Lower values are served first."""
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class TokenBucket:
+    """
+    Continuously refilling token bucket.
+
+    The level may go negative when a caller reports more usage than it
+    reserved; the debt is paid back by refill before new grants.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill(now)
+        # Requests larger than the bucket only need a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def drain(self, now: float):
+        """Empty the bucket (keeping any existing debt)."""
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+    def adjust(self, delta: float, now: float):
+        """Debit (positive) or refund (negative) tokens after the fact."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level - delta)
+
+
+@dataclass
+class _ModelBudget:
+    """Per-model request/token buckets and backoff state."""
+    requests: TokenBucket
+    tokens: TokenBucket
+    blocked_until: float = 0.0
+    backoff_seconds: float = 0.0
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    model: str = field(compare=False)
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class RateLimitSlot:
+    """Handle for a granted request, used to report actual token usage."""
+
+    def __init__(self, limiter: "GlobalRateLimiter", model: str, reserved_tokens: int):
+        self._limiter = limiter
+        self.model = model
+        self.reserved_tokens = reserved_tokens
+
+    def record_usage(self, input_tokens: int, output_tokens: int):
+        """Reconcile the token reservation with the tokens actually used."""
+        self._limiter._adjust_tokens(self.model, input_tokens + output_tokens - self.reserved_tokens)
+        self.reserved_tokens = input_tokens + output_tokens
 
 
 class GlobalRateLimiter:
     """
-    Thread-safe global rate limiter that enforces minimum delay between API calls.
+    Shared rate limiter for Anthropic API calls.
 
-    This prevents Claude API acceleration limit errors when multiple photos are
-    analyzed in quick succession across different requests.
+    Usage:
+        async with limiter.acquire(model, estimated_tokens, Priority.BULK) as slot:
+            message = await client.messages.create(...)
+            slot.record_usage(message.usage.input_tokens, message.usage.output_tokens)
+
+    On a 429/529 response, call report_rate_limited() so every caller backs
+    off for the same model, then retry through acquire().
     """
 
-    def __init__(self, min_delay_seconds: float = 1.2):
+    def __init__(
+        self,
+        requests_per_minute: int = 50,
+        tokens_per_minute: int = 50000,
+        max_concurrency: int = 8,
+        model_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        max_backoff_seconds: float = 60.0
+    ):
         """
         Initialize rate limiter.
 
         Args:
-            min_delay_seconds: Minimum seconds between API calls (default: 1.2s)
+            requests_per_minute: Default RPM budget per model
+            tokens_per_minute: Default TPM budget per model (input + output)
+            max_concurrency: Maximum in-flight requests across all models
+            model_limits: Optional {model: (rpm, tpm)} overrides
+            max_backoff_seconds: Ceiling for exponential backoff after 429/529
         """
-        self.min_delay = min_delay_seconds
-        self.last_call_time: Optional[float] = None
-        self._lock = asyncio.Lock()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max(1, max_concurrency)
+        self.model_limits = model_limits or {}
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self._budgets: Dict[str, _ModelBudget] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
 
-    async def wait_if_needed(self):
+        self.rate_limited_count = 0
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            rpm, tpm = self.model_limits.get(model, (self.requests_per_minute, self.tokens_per_minute))
+            budget = _ModelBudget(requests=TokenBucket(rpm), tokens=TokenBucket(tpm))
+            self._budgets[model] = budget
+        return budget
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        model: str,
+        estimated_tokens: int = 0,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[RateLimitSlot]:
         """
-        Wait if necessary to enforce rate limit.
+        Wait for a request slot for `model`, then hold it for the duration of the block.
 
-        This method should be called BEFORE making an API call.
-        It will block until enough time has passed since the last call.
+        Args:
+            model: Model the request is for (budgets are per model)
+            estimated_tokens: Expected input + output tokens, reserved up front
+            priority: Lane to queue in
+
+        Yields:
+            RateLimitSlot for reporting actual usage
         """
-        async with self._lock:
-            if self.last_call_time is not None:
-                elapsed = time.time() - self.last_call_time
-                if elapsed < self.min_delay:
-                    wait_time = self.min_delay - elapsed
-                    await asyncio.sleep(wait_time)
-
-            self.last_call_time = time.time()
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(int(priority), next(self._seq), model, estimated_tokens, future)
+        heapq.heappush(self._waiters, waiter)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled - give the slot back
+                self._release()
+            else:
+                self._remove_waiter(waiter)
+            raise
+
+        try:
+            yield RateLimitSlot(self, model, estimated_tokens)
+        finally:
+            self._release()
+
+    def report_rate_limited(self, model: str, retry_after: Optional[float] = None):
+        """
+        Record a 429/529 for `model` and pause its queue.
+
+        Uses the server's retry-after when given, otherwise exponential backoff.
+        """
+        budget = self._budget(model)
+        if retry_after is None or retry_after <= 0:
+            budget.backoff_seconds = min(
+                self.max_backoff_seconds,
+                max(1.0, budget.backoff_seconds * 2)
+            )
+            delay = budget.backoff_seconds
+        else:
+            delay = min(self.max_backoff_seconds, retry_after)
+
+        now = time.monotonic()
+        budget.blocked_until = max(budget.blocked_until, now + delay)
+        # Drain the request bucket so the burst doesn't resume at full speed
+        budget.requests.drain(now)
+        self.rate_limited_count += 1
+        logger.warning(f"Rate limited on {model}, pausing {delay:.1f}s")
+        self._dispatch()
+
+    def report_success(self, model: str):
+        """Decay the backoff for `model` after a successful call."""
+        budget = self._budget(model)
+        budget.backoff_seconds = budget.backoff_seconds / 2 if budget.backoff_seconds > 1.0 else 0.0
+
+    def stats(self) -> Dict:
+        """Current queue and budget state."""
+        now = time.monotonic()
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queued": len(self._waiters),
+            "rate_limited_count": self.rate_limited_count,
+            "models": {
+                model: {
+                    "requests_available": round(budget.requests.level, 1),
+                    "tokens_available": round(budget.tokens.level),
+                    "paused_seconds": round(max(0.0, budget.blocked_until - now), 1),
+                }
+                for model, budget in self._budgets.items()
+            }
+        }
+
+    def _adjust_tokens(self, model: str, delta: int):
+        if delta:
+            self._budget(model).tokens.adjust(delta, time.monotonic())
+            self._dispatch()
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _remove_waiter(self, waiter: _Waiter):
+        try:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+        except ValueError:
+            pass
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant as many queued requests as budgets allow, in priority order."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        next_check: Optional[float] = None
+        blocked_models = set()
+        remaining = []
+
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+
+            if self._in_flight >= self.max_concurrency or waiter.model in blocked_models:
+                remaining.append(waiter)
+                continue
+
+            budget = self._budget(waiter.model)
+            wait = max(
+                budget.blocked_until - now,
+                budget.requests.time_until(1, now),
+                budget.tokens.time_until(waiter.tokens, now),
+            )
+            if wait > 0:
+                # Keep later waiters for this model behind this one
+                blocked_models.add(waiter.model)
+                remaining.append(waiter)
+                next_check = wait if next_check is None else min(next_check, wait)
+                continue
+
+            budget.requests.take(1, now)
+            budget.tokens.take(waiter.tokens, now)
+            self._in_flight += 1
+            waiter.future.set_result(None)
+
+        for waiter in remaining:
+            heapq.heappush(self._waiters, waiter)
+
+        # Concurrency-bound waiters are woken by _release(); budget-bound ones need a timer
+        if next_check is not None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(next_check, self._dispatch)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Extract a retry-after delay (seconds) from an Anthropic API error, if present.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429 (rate limited) and 529 (overloaded) API responses."""
+    return getattr(error, "status_code", None) in (429, 529)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    True for errors the SDK itself would retry, other than rate limits:
+    connection failures, timeouts, 408, 409 and 5xx responses.
+    """
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status >= 500 or status in (408, 409)) and not is_rate_limit_error(error)
+
+
+def transient_retry_delay(attempt: int) -> float:
+    """Exponential backoff for transient errors (0.5s, 1s, 2s, ...)."""
+    return 0.5 * (2 ** attempt)
+
+
+@asynccontextmanager
+async def limited(
+    limiter: Optional[GlobalRateLimiter],
+    model: str,
+    estimated_tokens: int = 0,
+    priority: Priority = Priority.INTERACTIVE
+) -> AsyncIterator[Optional[RateLimitSlot]]:
+    """acquire() when a limiter is configured, otherwise a no-op yielding None."""
+    if limiter is None:
+        yield None
+        return
+    async with limiter.acquire(model, estimated_tokens, priority) as slot:
+        yield slot
+
+
+async def call_with_rate_limit(
+    limiter: Optional[GlobalRateLimiter],
+    model: str,
+    estimated_tokens: int,
+    priority: Priority,
+    make_call: Callable[[], Awaitable],
+    max_attempts: int = 3
+):
+    """
+    Run an Anthropic messages call under the limiter, retrying 429/529s.
+
+    Rate-limit responses are reported to the limiter (so every caller backs
+    off together) and the call is re-queued. Other transient errors
+    (connection failures, 408, 409, 5xx - what the SDK would retry) are
+    retried after a short exponential delay, waited out without holding a
+    limiter slot. Actual token usage from the response is reconciled against
+    the reservation.
+
+    Without a limiter the call is made once: clients leave the SDK's own
+    retries on in that case, and retrying here as well would multiply them.
+
+    Args:
+        limiter: Shared limiter, or None to call directly
+        model: Model being called
+        estimated_tokens: Expected input + output tokens
+        priority: Queue lane
+        make_call: Zero-argument coroutine factory performing the API call
+        max_attempts: Total attempts including the first
+
+    Returns:
+        The API response message
+    """
+    import anthropic
+
+    if limiter is None:
+        max_attempts = 1
+
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        retry_delay = None
+        async with limited(limiter, model, estimated_tokens, priority) as slot:
+            try:
+                message = await make_call()
+            except anthropic.APIError as e:
+                if limiter is not None and is_rate_limit_error(e):
+                    limiter.report_rate_limited(model, retry_after_seconds(e))
+                    if not last_attempt:
+                        continue
+                    raise
+                if last_attempt or not is_transient_error(e):
+                    raise
+                retry_delay = transient_retry_delay(attempt)
+            else:
+                usage = getattr(message, "usage", None)
+                if slot is not None and usage is not None:
+                    slot.record_usage(usage.input_tokens, usage.output_tokens)
+
+        if retry_delay is not None:
+            # Outside the slot, so waiting to retry doesn't block other callers
+            await asyncio.sleep(retry_delay)
+            continue
+
+        if limiter is not None:
+            limiter.report_success(model)
+        return message
@@ -19,26 +19,36 @@ may change. Always check the publication_date field for currency.
 """
 import sqlite3
 import logging
-import math
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 
-logger = logging.getLogger(__name__)
-
+from backend.config import settings
+from services.distance_utils import bounding_box, haversine_km
+from services.geo_index import get_geo_index
+from services.sqlite_pool import read_connection
 
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in km."""
-    R = 6371  # Earth's radius in km
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+logger = logging.getLogger(__name__)
 
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
 
-    return R * c
+# Columns held in memory by the shared geo index
+SCHOOLS_INDEX_QUERY = """
+    SELECT
+        urn,
+        name,
+        phase,
+        type_of_establishment,
+        ofsted_rating,
+        inspection_date,
+        publication_date,
+        postcode,
+        latitude,
+        longitude,
+        local_authority
+    FROM schools
+    WHERE latitude IS NOT NULL
+    AND longitude IS NOT NULL
+"""
 
 
 class SchoolsService:
@@ -60,6 +70,10 @@ class SchoolsService:
         '': 6
     }
 
+    # Phases matched by the school_type filter
+    PRIMARY_PHASES = ('Primary', 'Middle deemed primary')
+    SECONDARY_PHASES = ('Secondary', 'Middle deemed secondary', 'All-through')
+
     def __init__(self, db_path: str = None):
         """
         Initialize schools service.
@@ -81,6 +95,29 @@ class SchoolsService:
         else:
             logger.info(f"Schools service initialized with database: {self.db_path}")
             self.available = True
+            if not self._has_spatial_index():
+                logger.info(
+                    "Schools spatial index not found, using a table scan for SQLite lookups. "
+                    "Run 'python scripts/index_location_data.py' to build it"
+                )
+
+    def _has_spatial_index(self) -> bool:
+        """
+        Whether the database has the schools_rtree spatial index.
+
+        Built offline by scripts/index_location_data.py; checked per lookup
+        (one sqlite_master probe on the pooled connection) so a replaced
+        database without the index is picked up without a restart.
+
+        Returns:
+            True if the R*Tree index is usable
+        """
+        try:
+            return read_connection(self.db_path).execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'schools_rtree'"
+            ).fetchone() is not None
+        except sqlite3.Error:
+            return False
 
     def find_nearby_schools(
         self,
@@ -109,11 +146,111 @@ class SchoolsService:
             return []
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            phases = self._phases_for_type(school_type)
+            if settings.geo_index_enabled:
+                nearby = self._nearby_from_index(latitude, longitude, radius_km, phases)
+            else:
+                nearby = self._nearby_from_db(latitude, longitude, radius_km, phases)
+
+            schools = []
+            for distance, row in nearby:
+                rating = row['ofsted_rating'] or 'Not yet inspected'
+
+                # Filter by minimum rating if specified
+                if min_rating:
+                    min_order = self.RATING_ORDER.get(min_rating, 6)
+                    rating_order = self.RATING_ORDER.get(rating, 6)
+                    if rating_order > min_order:
+                        continue
+
+                urn = row['urn']
+                schools.append({
+                    'urn': urn,
+                    'name': row['name'],
+                    'phase': row['phase'],
+                    'type': row['type_of_establishment'],
+                    'ofsted_rating': rating,
+                    'inspection_date': row['inspection_date'],
+                    'publication_date': row['publication_date'],
+                    'postcode': row['postcode'],
+                    'local_authority': row['local_authority'],
+                    'distance_km': round(distance, 2),
+                    'distance_miles': round(distance * 0.621371, 2),
+                    'data_source': 'Ofsted Management Information (gov.uk)',
+                    'verification_url': f'https://reports.ofsted.gov.uk/search?q={urn}',
+                    'ofsted_search_url': 'https://reports.ofsted.gov.uk/search',
+                    'verified': True
+                })
+
+            # Sort by distance, then by rating
+            schools.sort(key=lambda s: (s['distance_km'], self.RATING_ORDER.get(s['ofsted_rating'], 6)))
+
+            return schools[:limit]
+
+        except Exception as e:
+            logger.error(f"Error finding nearby schools: {e}")
+            return []
 
-            # Build query
+    def _phases_for_type(self, school_type: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """Phases matching a 'primary'/'secondary' filter (None = all schools)."""
+        if not school_type:
+            return None
+        if school_type.lower() == 'primary':
+            return self.PRIMARY_PHASES
+        if school_type.lower() == 'secondary':
+            return self.SECONDARY_PHASES
+        return None
+
+    def warm_geo_index(self) -> None:
+        """Load the shared in-memory index now rather than on the first query."""
+        if self.available and settings.geo_index_enabled:
+            get_geo_index(self.db_path, SCHOOLS_INDEX_QUERY)
+
+    def _nearby_from_index(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        phases: Optional[Tuple[str, ...]]
+    ) -> List[Tuple[float, sqlite3.Row]]:
+        """Schools within radius from the shared in-memory geo index."""
+        index = get_geo_index(self.db_path, SCHOOLS_INDEX_QUERY)
+        predicate = (lambda row: row['phase'] in phases) if phases else None
+        return index.within(latitude, longitude, radius_km, predicate)
+
+    def _nearby_from_db(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        phases: Optional[Tuple[str, ...]]
+    ) -> List[Tuple[float, sqlite3.Row]]:
+        """Schools within radius via the SQLite spatial index, nearest first."""
+        cursor = read_connection(self.db_path).cursor()
+
+        # Only read schools inside the radius bounding box; exact distance is checked below
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        if self._has_spatial_index():
+            query = """
+                SELECT
+                    s.urn,
+                    s.name,
+                    s.phase,
+                    s.type_of_establishment,
+                    s.ofsted_rating,
+                    s.inspection_date,
+                    s.publication_date,
+                    s.postcode,
+                    s.latitude,
+                    s.longitude,
+                    s.local_authority
+                FROM schools_rtree r
+                JOIN schools s ON s.rowid = r.id
+                WHERE r.max_lat >= ? AND r.min_lat <= ?
+                AND r.max_lon >= ? AND r.min_lon <= ?
+            """
+            phase_column = "s.phase"
+        else:
             query = """
                 SELECT
                     urn,
@@ -128,68 +265,30 @@ class SchoolsService:
                     longitude,
                     local_authority
                 FROM schools
-                WHERE latitude IS NOT NULL
-                AND longitude IS NOT NULL
+                WHERE latitude BETWEEN ? AND ?
+                AND longitude BETWEEN ? AND ?
             """
-            params = []
-
-            # Filter by school type
-            if school_type:
-                if school_type.lower() == 'primary':
-                    query += " AND phase IN ('Primary', 'Middle deemed primary')"
-                elif school_type.lower() == 'secondary':
-                    query += " AND phase IN ('Secondary', 'Middle deemed secondary', 'All-through')"
-
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            conn.close()
-
-            # Calculate distances and filter
-            schools = []
-            for row in rows:
-                if row['latitude'] and row['longitude']:
-                    distance = haversine_km(
-                        latitude, longitude,
-                        float(row['latitude']), float(row['longitude'])
-                    )
-
-                    if distance <= radius_km:
-                        rating = row['ofsted_rating'] or 'Not yet inspected'
-
-                        # Filter by minimum rating if specified
-                        if min_rating:
-                            min_order = self.RATING_ORDER.get(min_rating, 6)
-                            rating_order = self.RATING_ORDER.get(rating, 6)
-                            if rating_order > min_order:
-                                continue
-
-                        urn = row['urn']
-                        schools.append({
-                            'urn': urn,
-                            'name': row['name'],
-                            'phase': row['phase'],
-                            'type': row['type_of_establishment'],
-                            'ofsted_rating': rating,
-                            'inspection_date': row['inspection_date'],
-                            'publication_date': row['publication_date'],
-                            'postcode': row['postcode'],
-                            'local_authority': row['local_authority'],
-                            'distance_km': round(distance, 2),
-                            'distance_miles': round(distance * 0.621371, 2),
-                            'data_source': 'Ofsted Management Information (gov.uk)',
-                            'verification_url': f'https://reports.ofsted.gov.uk/search?q={urn}',
-                            'ofsted_search_url': 'https://reports.ofsted.gov.uk/search',
-                            'verified': True
-                        })
-
-            # Sort by distance, then by rating
-            schools.sort(key=lambda s: (s['distance_km'], self.RATING_ORDER.get(s['ofsted_rating'], 6)))
-
-            return schools[:limit]
-
-        except Exception as e:
-            logger.error(f"Error finding nearby schools: {e}")
-            return []
+            phase_column = "phase"
+        params = [min_lat, max_lat, min_lon, max_lon]
+
+        # Filter by school type
+        if phases:
+            query += f" AND {phase_column} IN ({', '.join('?' for _ in phases)})"
+            params.extend(phases)
+
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+        nearby = []
+        for row in rows:
+            if row['latitude'] is not None and row['longitude'] is not None:
+                distance = haversine_km(
+                    latitude, longitude,
+                    float(row['latitude']), float(row['longitude'])
+                )
+                if distance <= radius_km:
+                    nearby.append((distance, row))
+        return nearby
 
     def get_school_summary(
         self,
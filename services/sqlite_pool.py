@@ -0,0 +1,185 @@
+"""
+Shared read-only SQLite connections for the data services (EPC, schools, NaPTAN, GP practices).
+
+Each thread gets its own long-lived connection per database file, so the
+SQLite page cache, the memory map and sqlite3's prepared statement cache
+survive between queries instead of being rebuilt on every call.
+
+Files built by swapping a finished database into place are opened with
+`immutable=1` (no locking or change checks per query). Databases in WAL mode,
+which are updated in place (e.g. process_epc_data.py --delta), are opened
+with plain `mode=ro` so readers see committed changes. Either way a
+connection is reopened when the file is replaced or modified, as with the
+geo index.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes 18-19 of the database header are the file format versions: 2 = WAL
+WAL_FORMAT_VERSION = 2
+
+
+def _is_wal_database(db_path: str) -> bool:
+    """Whether the database file is in WAL journal mode (from its header)."""
+    try:
+        with open(db_path, "rb") as f:
+            header = f.read(20)
+    except OSError:
+        return False
+    return len(header) == 20 and header[18] == WAL_FORMAT_VERSION
+
+
+class ReadOnlyConnectionPool:
+    """
+    Per-thread read-only connections to one SQLite file.
+
+    Connections use sqlite3.Row rows and must not be closed by callers;
+    they are safe to use from a thread pool because no connection is ever
+    shared between threads.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        mmap_size_mb: int = 256,
+        cache_size_mb: int = 16,
+        cached_statements: int = 128
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            db_path: Path to the SQLite database
+            mmap_size_mb: Memory-mapped I/O size per connection (0 disables)
+            cache_size_mb: SQLite page cache per connection
+            cached_statements: Prepared statements kept per connection
+        """
+        self.db_path = str(db_path)
+        self.mmap_size_mb = mmap_size_mb
+        self.cache_size_mb = cache_size_mb
+        self.cached_statements = cached_statements
+
+        self._local = threading.local()
+        # thread ident -> (thread, connection), so stale and dead-thread connections can be closed
+        self._connections: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _signature(self) -> Tuple[int, int, int]:
+        """Identity of the file on disk; changes when it is replaced or written."""
+        st = os.stat(self.db_path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _open(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        if not _is_wal_database(self.db_path):
+            uri += "&immutable=1"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            # Only ever used by the opening thread; close() may run elsewhere
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_mb) * 1024}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        The calling thread's connection, (re)opened if needed.
+
+        Returns:
+            Read-only sqlite3.Connection with sqlite3.Row rows
+        """
+        signature = self._signature()
+        cached = getattr(self._local, "cached", None)
+        if cached is not None and cached[0] == signature:
+            self.reused += 1
+            return cached[1]
+
+        if cached is not None:
+            logger.info(f"{os.path.basename(self.db_path)} changed on disk, reopening connection")
+            cached[1].close()
+
+        conn = self._open()
+        self._local.cached = (signature, conn)
+        current = threading.current_thread()
+        with self._lock:
+            self.opened += 1
+            self._connections[current.ident] = (current, conn)
+            # Threads from finished pools never come back for their connections
+            for ident, (thread, old_conn) in list(self._connections.items()):
+                if not thread.is_alive():
+                    old_conn.close()
+                    del self._connections[ident]
+        return conn
+
+    def close(self) -> None:
+        """Close every connection (threads reopen on their next query)."""
+        with self._lock:
+            for _, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def stats(self) -> Dict:
+        """Open connections and open/reuse counters."""
+        with self._lock:
+            open_connections = len(self._connections)
+        return {
+            "db_path": self.db_path,
+            "connections": open_connections,
+            "opened": self.opened,
+            "reused": self.reused
+        }
+
+
+_pools: Dict[str, ReadOnlyConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> ReadOnlyConnectionPool:
+    """Shared pool for a database file, created once per process."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ReadOnlyConnectionPool(
+                key,
+                mmap_size_mb=settings.sqlite_mmap_mb,
+                cache_size_mb=settings.sqlite_cache_mb,
+                cached_statements=settings.sqlite_statement_cache
+            )
+        return pool
+
+
+def read_connection(db_path: str) -> sqlite3.Connection:
+    """The calling thread's pooled read-only connection to db_path."""
+    return get_connection_pool(db_path).connection()
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Stats for every pool, keyed by database file name."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {os.path.basename(pool.db_path): pool.stats() for pool in pools}
+
+
+def close_all_pools() -> None:
+    """Close all pooled connections (e.g. at shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
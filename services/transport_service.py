@@ -18,27 +18,43 @@ Contains 350,000+ transport access points:
 - Tram stops
 - Ferry terminals
 """
+import heapq
 import sqlite3
 import logging
-import math
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from pathlib import Path
 
+from backend.config import settings
+from services.distance_utils import bounding_box, haversine_km
+from services.geo_index import get_geo_index
+from services.sqlite_pool import read_connection
+
 logger = logging.getLogger(__name__)
 
 
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in km."""
-    R = 6371
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
+# Stations (rail, metro, ferry, air) held in memory by the shared geo index
+STATIONS_INDEX_QUERY = """
+    SELECT atco_code, name, stop_type, stop_type_name, locality, town, latitude, longitude
+    FROM stops
+    WHERE is_station = 1
+    AND latitude IS NOT NULL AND longitude IS NOT NULL
+"""
 
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+# Everything else (bus/coach stops) - a separate index so station-only
+# queries never walk the ~350k bus stops. Only coordinates and the rowid
+# are held in memory; details for the hits come from SQLite.
+BUS_STOPS_INDEX_QUERY = """
+    SELECT rowid AS id, latitude, longitude
+    FROM stops
+    WHERE COALESCE(is_station, 0) != 1
+    AND latitude IS NOT NULL AND longitude IS NOT NULL
+"""
 
-    return R * c
+BUS_STOP_DETAILS_QUERY = """
+    SELECT rowid AS id, atco_code, name, stop_type, stop_type_name, locality, town, latitude, longitude
+    FROM stops
+    WHERE rowid IN ({placeholders})
+"""
 
 
 class TransportService:
@@ -70,6 +86,20 @@ class TransportService:
         else:
             logger.info(f"Transport service initialized with database: {self.db_path}")
             self.available = True
+            if not self._has_coordinate_index():
+                logger.info(
+                    "Stops coordinate index not found, using a table scan for SQLite lookups. "
+                    "Run 'python scripts/index_location_data.py' to build it"
+                )
+
+    def _has_coordinate_index(self) -> bool:
+        """Whether scripts/index_location_data.py has indexed stop coordinates."""
+        try:
+            return read_connection(self.db_path).execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'idx_stops_lat_lon'"
+            ).fetchone() is not None
+        except sqlite3.Error:
+            return False
 
     def find_nearby_stations(
         self,
@@ -86,7 +116,7 @@ class TransportService:
             latitude: Center point latitude
             longitude: Center point longitude
             radius_km: Search radius in km
-            include_bus: Include bus stops (default False - too many)
+            include_bus: Include bus stops (cheap with the geo index; default False)
             limit: Maximum results
 
         Returns:
@@ -96,67 +126,50 @@ class TransportService:
             return []
 
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # Build query for stations only (not bus by default)
-            if include_bus:
-                query = """
-                    SELECT * FROM stops
-                    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
-                """
+            if settings.geo_index_enabled:
+                nearby = get_geo_index(self.db_path, STATIONS_INDEX_QUERY).within(latitude, longitude, radius_km)
+                if include_bus:
+                    bus_stops = get_geo_index(
+                        self.db_path, BUS_STOPS_INDEX_QUERY, id_column="id"
+                    ).within(latitude, longitude, radius_km)
+                    # Only the first `limit` can be returned, so only those need details
+                    nearby = list(heapq.merge(nearby, bus_stops, key=lambda item: item[0]))[:limit]
+                    nearby = self._with_bus_stop_rows(nearby)
             else:
-                query = """
-                    SELECT * FROM stops
-                    WHERE is_station = 1
-                    AND latitude IS NOT NULL AND longitude IS NOT NULL
-                """
-
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
+                nearby = self._nearby_from_db(latitude, longitude, radius_km, include_bus)
 
-            # Calculate distances and filter
             stations = []
-            for row in rows:
-                if row['latitude'] and row['longitude']:
-                    distance = haversine_km(
-                        latitude, longitude,
-                        float(row['latitude']), float(row['longitude'])
-                    )
-
-                    if distance <= radius_km:
-                        stop_type = row['stop_type']
-
-                        # Categorize
-                        if stop_type in self.RAIL_TYPES:
-                            category = 'rail'
-                        elif stop_type in self.METRO_TYPES:
-                            category = 'underground'
-                        elif stop_type in self.FERRY_TYPES:
-                            category = 'ferry'
-                        elif stop_type in self.AIRPORT_TYPES:
-                            category = 'airport'
-                        else:
-                            category = 'bus'
-
-                        stations.append({
-                            'atco_code': row['atco_code'],
-                            'name': row['name'],
-                            'stop_type': stop_type,
-                            'stop_type_name': row['stop_type_name'],
-                            'category': category,
-                            'locality': row['locality'],
-                            'town': row['town'],
-                            'latitude': row['latitude'],
-                            'longitude': row['longitude'],
-                            'distance_km': round(distance, 2),
-                            'distance_miles': round(distance * 0.621371, 2),
-                            'data_source': 'NaPTAN (Department for Transport)',
-                            'verification_url': 'https://beta-naptan.dft.gov.uk/',
-                            'verified': True
-                        })
+            for distance, row in nearby:
+                stop_type = row['stop_type']
+
+                # Categorize
+                if stop_type in self.RAIL_TYPES:
+                    category = 'rail'
+                elif stop_type in self.METRO_TYPES:
+                    category = 'underground'
+                elif stop_type in self.FERRY_TYPES:
+                    category = 'ferry'
+                elif stop_type in self.AIRPORT_TYPES:
+                    category = 'airport'
+                else:
+                    category = 'bus'
+
+                stations.append({
+                    'atco_code': row['atco_code'],
+                    'name': row['name'],
+                    'stop_type': stop_type,
+                    'stop_type_name': row['stop_type_name'],
+                    'category': category,
+                    'locality': row['locality'],
+                    'town': row['town'],
+                    'latitude': row['latitude'],
+                    'longitude': row['longitude'],
+                    'distance_km': round(distance, 2),
+                    'distance_miles': round(distance * 0.621371, 2),
+                    'data_source': 'NaPTAN (Department for Transport)',
+                    'verification_url': 'https://beta-naptan.dft.gov.uk/',
+                    'verified': True
+                })
 
             # Sort by distance
             stations.sort(key=lambda s: s['distance_km'])
@@ -167,6 +180,64 @@ class TransportService:
             logger.error(f"Error finding nearby stations: {e}")
             return []
 
+    def warm_geo_index(self) -> None:
+        """Load the shared in-memory station and bus stop indexes now rather than on the first query."""
+        if self.available and settings.geo_index_enabled:
+            get_geo_index(self.db_path, STATIONS_INDEX_QUERY)
+            get_geo_index(self.db_path, BUS_STOPS_INDEX_QUERY, id_column="id")
+
+    def _with_bus_stop_rows(self, nearby: List[Tuple[float, object]]) -> List[Tuple[float, sqlite3.Row]]:
+        """Replace the bus stop ids from the geo index with their rows from the stops table."""
+        stop_ids = [item for _, item in nearby if isinstance(item, int)]
+        if not stop_ids:
+            return nearby
+        query = BUS_STOP_DETAILS_QUERY.format(placeholders=",".join("?" * len(stop_ids)))
+        rows = {row['id']: row for row in read_connection(self.db_path).execute(query, stop_ids)}
+        return [
+            (distance, rows[item] if isinstance(item, int) else item)
+            for distance, item in nearby
+            if not isinstance(item, int) or item in rows
+        ]
+
+    def _nearby_from_db(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        include_bus: bool
+    ) -> List[Tuple[float, sqlite3.Row]]:
+        """Stops within radius from the stops table (bounding-box prefiltered)."""
+        cursor = read_connection(self.db_path).cursor()
+
+        # Build query for stations only (not bus by default)
+        if include_bus:
+            query = """
+                SELECT * FROM stops
+                WHERE latitude BETWEEN ? AND ?
+                AND longitude BETWEEN ? AND ?
+            """
+        else:
+            query = """
+                SELECT * FROM stops
+                WHERE is_station = 1
+                AND latitude BETWEEN ? AND ?
+                AND longitude BETWEEN ? AND ?
+            """
+
+        cursor.execute(query, bounding_box(latitude, longitude, radius_km))
+        rows = cursor.fetchall()
+
+        nearby = []
+        for row in rows:
+            if row['latitude'] is not None and row['longitude'] is not None:
+                distance = haversine_km(
+                    latitude, longitude,
+                    float(row['latitude']), float(row['longitude'])
+                )
+                if distance <= radius_km:
+                    nearby.append((distance, row))
+        return nearby
+
     def find_rail_stations(
         self,
         latitude: float,
@@ -179,6 +250,29 @@ class TransportService:
         rail = [s for s in all_stations if s['category'] == 'rail']
         return rail[:limit]
 
+    def find_bus_stops(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float = 0.8,  # ~0.5 miles
+        limit: int = 5
+    ) -> List[Dict]:
+        """
+        Find the nearest bus stops, one per stop name.
+
+        Stops on opposite sides of a road usually share a name, so only the
+        closest of each name is kept.
+        """
+        all_stops = self.find_nearby_stations(latitude, longitude, radius_km, include_bus=True, limit=100)
+        bus_stops = []
+        seen_names = set()
+        for stop in all_stops:
+            if stop['category'] != 'bus' or stop['name'] in seen_names:
+                continue
+            seen_names.add(stop['name'])
+            bus_stops.append(stop)
+        return bus_stops[:limit]
+
     def find_tube_stations(
         self,
         latitude: float,
@@ -195,7 +289,8 @@ class TransportService:
         self,
         latitude: float,
         longitude: float,
-        radius_km: float = 2.4
+        radius_km: float = 2.4,
+        include_bus: bool = True
     ) -> Dict:
         """
         Get transport summary for a location.
@@ -203,8 +298,10 @@ class TransportService:
         Returns dict with:
         - rail_stations: List of railway stations
         - tube_stations: List of underground stations
+        - bus_stops: Nearest bus stops within ~0.5 miles (if include_bus)
         - nearest_rail: Closest railway station
         - nearest_tube: Closest tube station
+        - nearest_bus: Closest bus stop
         - highlights: Text highlights for brochure
         """
         if not self.available:
@@ -223,6 +320,10 @@ class TransportService:
         nearest_rail = rail_stations[0] if rail_stations else None
         nearest_tube = tube_stations[0] if tube_stations else None
 
+        # Bus stops are only worth mentioning when they're a short walk away
+        bus_stops = self.find_bus_stops(latitude, longitude) if include_bus else []
+        nearest_bus = bus_stops[0] if bus_stops else None
+
         # Generate highlights (ONLY POSITIVE)
         highlights = []
 
@@ -244,11 +345,16 @@ class TransportService:
             elif dist <= 0.75:
                 highlights.append(f"{name} Underground station {dist} miles away")
 
+        if nearest_bus and nearest_bus['distance_miles'] <= 0.25:
+            highlights.append(f"Bus stop within walking distance ({nearest_bus['name']}, {nearest_bus['distance_miles']} miles)")
+
         return {
             'rail_stations': rail_stations[:5],
             'tube_stations': tube_stations[:5],
+            'bus_stops': bus_stops,
             'nearest_rail': nearest_rail,
             'nearest_tube': nearest_tube,
+            'nearest_bus': nearest_bus,
             'highlights': highlights[:3],
             'available': True,
             'data_source': 'NaPTAN (Department for Transport)',
@@ -10,12 +10,27 @@ Generates cohesive, professional property brochures following the standard UK es
 
 Based on Savills, Knight Frank, and industry standard formats.
 """
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Section markers in the order the prompt asks for them, and the key each opens
+SECTION_MARKERS = [
+    ('===OPENING SUMMARY===', 'opening_summary'),
+    ('===IN BRIEF===', 'in_brief'),
+    ('===THE SITUATION===', 'situation'),
+    ('===THE ACCOMMODATION===', 'accommodation'),
+    ('===OUTSIDE===', 'outside'),
+    ('===SERVICES===', 'services'),
+    ('===END===', None),
+]
+
+# Longest marker, so a marker split across stream chunks is still seen
+MAX_MARKER_LENGTH = max(len(marker) for marker, _ in SECTION_MARKERS)
+
 
 @dataclass
 class BrochureSection:
@@ -90,16 +105,42 @@ class UKBrochureGenerator:
     the standard format used by Savills, Knight Frank, and other UK agents.
     """
 
-    def __init__(self, claude_client=None):
+    def __init__(self, claude_client=None, epc_service=None):
         """
         Initialize the brochure generator.
 
         Args:
             claude_client: ClaudeClient instance for LLM generation
+            epc_service: EPCService for area-level EPC comparisons (optional)
         """
         self.claude_client = claude_client
+        self.epc_service = epc_service
         logger.info("Initialized UK brochure generator")
 
+    async def _with_epc_comparison(self, property_data: Dict, location_data: Dict) -> Dict:
+        """
+        Add an "epc_area_comparison" line (e.g. "EPC rating B: more energy
+        efficient than 72% of homes in SW1A 1") to property_data when the
+        property's rating compares favourably with its area.
+
+        Only uses a rating that was actually supplied, never the 'C' default.
+        """
+        rating = property_data.get('epc_rating')
+        postcode = location_data.get('postcode') or property_data.get('postcode')
+        if property_data.get('epc_area_comparison') or not rating or not postcode:
+            return property_data
+        if not self.epc_service or not getattr(self.epc_service, 'has_area_stats', False):
+            return property_data
+
+        try:
+            comparison = await asyncio.to_thread(self.epc_service.compare_to_area, postcode, rating)
+        except Exception as e:
+            logger.warning(f"EPC area comparison failed: {e}")
+            return property_data
+        if not comparison or not comparison.get('highlight'):
+            return property_data
+        return {**property_data, 'epc_area_comparison': comparison['highlight']}
+
     async def generate_brochure(
         self,
         property_data: Dict,
@@ -122,6 +163,7 @@ class UKBrochureGenerator:
             PropertyBrochure with all sections populated
         """
         logger.info(f"generate_brochure called: claude_client={self.claude_client is not None}, is_available={self.claude_client.is_available() if self.claude_client else False}")
+        property_data = await self._with_epc_comparison(property_data, location_data)
         if self.claude_client and self.claude_client.is_available():
             return await self._generate_with_llm(
                 property_data, location_data, photo_analysis, enrichment_data, tone
@@ -180,6 +222,98 @@ class UKBrochureGenerator:
                 property_data, location_data, photo_analysis, enrichment_data
             )
 
+    async def stream_brochure(
+        self,
+        property_data: Dict,
+        location_data: Dict,
+        photo_analysis: Optional[List[Dict]] = None,
+        enrichment_data: Optional[Dict] = None,
+        tone: str = "premium"
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate a brochure, yielding progress events as Claude writes it.
+
+        Events are (name, payload) tuples:
+        - ("delta", str): raw text as it arrives
+        - ("section", {"key", "content"}): a section whose closing marker has arrived
+        - ("complete", dict): the final brochure, as from PropertyBrochure.to_dict()
+        - ("error", {"detail"}): the stream broke off; no "complete" follows
+
+        Falls back to the mock brochure (as a single "complete" event) when
+        Claude is unavailable or the finished stream has nothing parseable.
+        A stream that fails part-way ends with "error" rather than passing
+        off the truncated text as a finished brochure.
+        """
+        property_data = await self._with_epc_comparison(property_data, location_data)
+        if not self.claude_client or not self.claude_client.is_available():
+            brochure = self._generate_mock_brochure(
+                property_data, location_data, photo_analysis, enrichment_data
+            )
+            yield "complete", brochure.to_dict()
+            return
+
+        prompt = self._build_brochure_prompt(
+            property_data, location_data, photo_analysis, enrichment_data, tone
+        )
+
+        logger.info(f"Streaming brochure with LLM, prompt length: {len(prompt)}")
+
+        response = ""
+        emitted = set()
+        try:
+            async for chunk in self.claude_client.stream_completion(
+                prompt=prompt,
+                max_tokens=3000,
+                temperature=0.7
+            ):
+                response += chunk
+                yield "delta", chunk
+
+                # Only re-parse when a new marker may have arrived; look at the
+                # tail of the response so a marker split across chunks counts
+                if '===' not in response[-(len(chunk) + MAX_MARKER_LENGTH):]:
+                    continue
+                partial = self._parse_brochure_response(response, property_data, location_data)
+                for key in self._completed_sections(response):
+                    if key in emitted:
+                        continue
+                    emitted.add(key)
+                    content = (partial.in_brief or []) if key == 'in_brief' else getattr(partial, key)
+                    yield "section", {"key": key, "content": content}
+
+        except Exception as e:
+            logger.error(f"LLM brochure streaming failed: {e}")
+            yield "error", {"detail": f"Brochure stream interrupted: {str(e)}"}
+            return
+
+        brochure = self._parse_brochure_response(response, property_data, location_data) if response else None
+        if brochure is None or (not brochure.opening_summary and not brochure.accommodation):
+            logger.warning("Streamed LLM response empty or unparseable - using mock")
+            brochure = self._generate_mock_brochure(
+                property_data, location_data, photo_analysis, enrichment_data
+            )
+
+        yield "complete", brochure.to_dict()
+
+    @staticmethod
+    def _completed_sections(response: str) -> List[str]:
+        """
+        Return the keys of sections whose following marker has already arrived.
+
+        Args:
+            response: Text received so far
+
+        Returns:
+            Section keys in document order
+        """
+        positions = [
+            (response.find(marker), key)
+            for marker, key in SECTION_MARKERS
+            if marker in response
+        ]
+        positions.sort()
+        return [key for (_, key), _next in zip(positions, positions[1:]) if key]
+
     def _build_brochure_prompt(
         self,
         property_data: Dict,
@@ -202,6 +336,7 @@ class UKBrochureGenerator:
         property_type = property_data.get('property_type', 'house')
         features = property_data.get('features', [])
         epc_rating = property_data.get('epc_rating', 'C')
+        epc_comparison = property_data.get('epc_area_comparison')
         size_sqft = property_data.get('size_sqft')
 
         address = location_data.get('address', '')
@@ -254,6 +389,7 @@ Bathrooms: {bathrooms}
 Size: {f'{size_sqft} sq ft' if size_sqft else 'Not specified'}
 CONFIRMED FEATURES: {', '.join(features) if features else 'None specified'}
 EPC Rating: {epc_rating}
+{f'EPC AREA COMPARISON (verified, official EPC register): {epc_comparison}' if epc_comparison else ''}
 Address: {address}
 Postcode: {postcode}
 Setting: {setting}
@@ -300,7 +436,7 @@ STRUCTURE - Write as a walking tour:
 [40-60 words. ONLY describe what's in CONFIRMED FEATURES or photo analysis. If "garden" is listed, say "The property includes a garden." If "driveway" is listed, mention it. Do not add "mature borders" or aspects unless in photos.]
 
 ===SERVICES===
-EPC Rating: {epc_rating}
+EPC Rating: {epc_rating}{f" ({epc_comparison.split(': ', 1)[-1]})" if epc_comparison else ''}
 Tenure: To be confirmed
 Council Tax Band: To be confirmed
 
@@ -670,7 +806,9 @@ Council Tax Band: To be confirmed
         else:
             outside = "To the front, there is a driveway providing off-street parking. The rear garden is laid mainly to lawn with mature planted borders and a paved terrace ideal for alfresco dining. A side gate provides access to the front."
 
-        services = f"Mains gas, electricity, water and drainage are connected to the property. Gas central heating. EPC Rating: {epc_rating}. Council Tax Band: To be confirmed. Tenure: Freehold (subject to verification)."
+        epc_comparison = property_data.get('epc_area_comparison')
+        epc_line = f"EPC Rating: {epc_rating}" + (f" ({epc_comparison.split(': ', 1)[-1]})" if epc_comparison else "")
+        services = f"Mains gas, electricity, water and drainage are connected to the property. Gas central heating. {epc_line}. Council Tax Band: To be confirmed. Tenure: Freehold (subject to verification)."
 
         in_brief = [
             f"{bedrooms} bedrooms ({bedrooms - 1} with fitted wardrobes)",
@@ -741,6 +879,6 @@ Council Tax Band: To be confirmed
 
 
 # Convenience function for easy import
-def get_brochure_generator(claude_client=None) -> UKBrochureGenerator:
+def get_brochure_generator(claude_client=None, epc_service=None) -> UKBrochureGenerator:
     """Get an instance of the UK brochure generator."""
-    return UKBrochureGenerator(claude_client=claude_client)
+    return UKBrochureGenerator(claude_client=claude_client, epc_service=epc_service)
@@ -1,11 +1,16 @@
 """
 Computer vision adapter for property image analysis.
 """
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import List, Dict, Optional
 from backend.schemas import ImageAnalysisResponse, ImageAttribute
 from providers import VisionClient
+from services.persistent_cache import PersistentCache
+from services.photo_dedup import EXIF_ORIENTATION_TAG, TRANSPOSED_ORIENTATIONS, dhash, orient_and_downsize
 from PIL import Image
 from io import BytesIO
+import asyncio
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,13 +21,22 @@ class ValidationError(Exception):
     pass
 
 
+@dataclass
+class PreparedImage:
+    """Image decoded once and ready for the vision provider."""
+    data: bytes  # Compact bytes to upload
+    fingerprint: str  # SHA-256 of prepared pixels (exact-match cache key)
+    perceptual_hash: Optional[str] = None  # dHash for near-duplicate grouping
+
+
 class VisionAdapter:
     """
     Analyzes property images using configurable vision providers.
     
     Handles:
     - File validation (size, type)
-    - EXIF orientation correction
+    - Single-decode preparation: EXIF transpose, downsize, JPEG re-encode
+    - Analysis cache keyed by image content + provider/model/prompt version
     - Provider-based analysis
     """
     
@@ -30,7 +44,10 @@ class VisionAdapter:
         self,
         vision_client: VisionClient,
         max_size_mb: int = 8,
-        allowed_types: List[str] = None
+        allowed_types: List[str] = None,
+        analysis_cache: Optional[PersistentCache] = None,
+        max_dimension: int = 1568,
+        jpeg_quality: int = 85
     ):
         """
         Initialize vision adapter.
@@ -39,13 +56,20 @@ class VisionAdapter:
             vision_client: VisionClient implementation (mock or real provider)
             max_size_mb: Maximum file size in MB
             allowed_types: List of allowed file extensions
+            analysis_cache: Optional persistent cache of provider analyses
+            max_dimension: Longest edge (px) of the image sent to the provider
+            jpeg_quality: JPEG quality used when re-encoding for upload
         """
         self.vision_client = vision_client
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.allowed_types = allowed_types or ["jpg", "jpeg", "png", "webp"]
+        self.analysis_cache = analysis_cache
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.cache_namespace = self._cache_namespace(vision_client, max_dimension)
         logger.info(
             f"Initialized VisionAdapter: max_size={max_size_mb}MB, "
-            f"types={','.join(self.allowed_types)}"
+            f"types={','.join(self.allowed_types)}, max_dimension={max_dimension}px"
         )
     
     async def analyze_image(
@@ -69,26 +93,91 @@ class VisionAdapter:
         logger.debug(f"Analyzing image: {filename}")
         
         # Validate file
-        self._validate_file_type(filename)
-        self._validate_file_size(image_data)
+        self.validate_image(image_data, filename)
+        
+        prepared = await self.prepare_image(image_data)
+        return await self.analyze_prepared(prepared, filename)
+    
+    async def prepare_image(self, image_data: bytes) -> PreparedImage:
+        """
+        Decode, orient, downsize and hash an image (validation is the caller's job).
         
-        # Handle EXIF rotation
-        corrected_image_data = self._correct_exif_orientation(image_data)
+        CPU-bound, so it runs in a worker thread to keep the event loop free.
+        
+        Args:
+            image_data: Raw image bytes
+            
+        Returns:
+            PreparedImage for analyze_prepared() and near-duplicate grouping
+        """
+        return await asyncio.to_thread(self._prepare_image, image_data)
+    
+    async def analyze_prepared(self, prepared: PreparedImage, filename: str) -> ImageAnalysisResponse:
+        """
+        Analyze an image already run through prepare_image().
+        
+        Args:
+            prepared: Prepared image
+            filename: Original filename
+            
+        Returns:
+            ImageAnalysisResponse with detected attributes and caption
+        """
+        # Re-uploads of an already-analyzed image are free
+        cache_key = None
+        if self.analysis_cache is not None:
+            cache_key = f"{self.cache_namespace}:{prepared.fingerprint}"
+            cached = await asyncio.to_thread(self.analysis_cache.get, cache_key)
+            if cached is not None:
+                logger.debug(f"Vision cache hit for {filename}")
+                cached["filename"] = filename
+                return self._convert_to_response(cached, prepared.perceptual_hash)
         
         # Analyze with provider
         try:
             analysis = await self.vision_client.analyze_image(
-                corrected_image_data,
+                prepared.data,
                 filename
             )
             
+            # Don't cache fallback results from failed provider calls
+            if cache_key is not None and not analysis.get("analysis_error"):
+                await asyncio.to_thread(self.analysis_cache.set, cache_key, analysis)
+            
             # Convert to response schema
-            return self._convert_to_response(analysis)
+            return self._convert_to_response(analysis, prepared.perceptual_hash)
             
         except Exception as e:
             logger.error(f"Vision analysis failed for {filename}: {str(e)}")
             raise
     
+    @staticmethod
+    def _cache_namespace(vision_client: VisionClient, max_dimension: int) -> str:
+        """
+        Identify the provider, model, prompt version and upload resolution behind
+        cached analyses, so changing any of them never serves stale results.
+        """
+        return ":".join([
+            type(vision_client).__name__,
+            str(getattr(vision_client, "model", "")),
+            str(getattr(vision_client, "prompt_version", "")),
+            f"{max_dimension}px",
+        ])
+    
+    def validate_image(self, image_data: bytes, filename: str) -> None:
+        """
+        Validate file type and size without analyzing.
+        
+        Args:
+            image_data: Image bytes
+            filename: Original filename
+            
+        Raises:
+            ValidationError: If image validation fails
+        """
+        self._validate_file_type(filename)
+        self._validate_file_size(image_data)
+    
     def _validate_file_type(self, filename: str) -> None:
         """
         Validate file extension.
@@ -130,54 +219,74 @@ class VisionAdapter:
         
         logger.debug(f"File size validated: {size_bytes / 1024:.2f}KB")
     
-    def _correct_exif_orientation(self, image_data: bytes) -> bytes:
+    def _prepare_image(self, image_data: bytes) -> PreparedImage:
         """
-        Correct image orientation based on EXIF data.
+        Decode the image once and produce the compact upload for the provider.
+        
+        Steps:
+        - JPEG draft mode decodes directly at reduced scale when possible
+        - EXIF transpose only when the orientation tag asks for it
+        - Downsize so the longest edge is at most max_dimension
+        - Re-encode as JPEG at jpeg_quality (small upright JPEGs pass through untouched)
+        
+        The fingerprint is a SHA-256 of the prepared pixel data, so the same
+        photo re-saved with different metadata still maps to the same key.
+        The perceptual hash is computed from the same decoded pixels.
         
         Args:
             image_data: Original image bytes
             
         Returns:
-            Corrected image bytes
+            PreparedImage
         """
         try:
-            # Open image with PIL
             image = Image.open(BytesIO(image_data))
+            source_format = image.format
+            source_size = image.size
+            needs_transpose = image.getexif().get(EXIF_ORIENTATION_TAG, 1) in TRANSPOSED_ORIENTATIONS
+            
+            # Shared with session photo hashing so perceptual hashes agree
+            image = orient_and_downsize(image, self.max_dimension)
+            
+            fingerprint = hashlib.sha256(
+                f"{image.size[0]}x{image.size[1]}:".encode() + image.tobytes()
+            ).hexdigest()
+            perceptual_hash = dhash(image)
+            
+            if source_format == 'JPEG' and not needs_transpose and image.size == source_size:
+                # Already a compact, upright JPEG - re-encoding would only lose quality
+                return PreparedImage(image_data, fingerprint, perceptual_hash)
             
-            # Check for EXIF orientation tag
-            if hasattr(image, '_getexif') and image._getexif() is not None:
-                exif = image._getexif()
-                orientation = exif.get(0x0112)  # Orientation tag
-                
-                # Apply rotation based on orientation
-                if orientation == 3:
-                    image = image.rotate(180, expand=True)
-                    logger.debug("Applied EXIF rotation: 180°")
-                elif orientation == 6:
-                    image = image.rotate(270, expand=True)
-                    logger.debug("Applied EXIF rotation: 270°")
-                elif orientation == 8:
-                    image = image.rotate(90, expand=True)
-                    logger.debug("Applied EXIF rotation: 90°")
-                else:
-                    logger.debug("No EXIF rotation needed")
-            
-            # Convert back to bytes
             output = BytesIO()
-            image_format = image.format or 'JPEG'
-            image.save(output, format=image_format)
-            return output.getvalue()
+            image.save(output, format='JPEG', quality=self.jpeg_quality, optimize=True)
+            prepared = output.getvalue()
+            logger.debug(
+                f"Prepared image: {len(image_data)} -> {len(prepared)} bytes, {image.size[0]}x{image.size[1]}"
+            )
+            return PreparedImage(prepared, fingerprint, perceptual_hash)
             
         except Exception as e:
-            logger.warning(f"EXIF correction failed, using original: {str(e)}")
-            return image_data
+            logger.warning(f"Image preparation failed, using original: {str(e)}")
+            return PreparedImage(image_data, hashlib.sha256(image_data).hexdigest())
+    
+    def cache_stats(self) -> Optional[Dict]:
+        """
+        Get analysis cache counters.
+        
+        Returns:
+            Cache stats dict, or None if caching is disabled
+        """
+        if self.analysis_cache is None:
+            return None
+        return self.analysis_cache.stats()
     
-    def _convert_to_response(self, analysis: Dict) -> ImageAnalysisResponse:
+    def _convert_to_response(self, analysis: Dict, perceptual_hash: Optional[str] = None) -> ImageAnalysisResponse:
         """
         Convert provider analysis to response schema.
         
         Args:
             analysis: Raw analysis dict from provider
+            perceptual_hash: Optional dHash of the image
             
         Returns:
             ImageAnalysisResponse
@@ -243,6 +352,7 @@ class VisionAdapter:
             filename=analysis["filename"],
             room_type=analysis.get("room_type", "unknown"),
             attributes=attributes[:8],  # Limit to top 8 attributes
-            suggested_caption=caption
+            suggested_caption=caption,
+            perceptual_hash=perceptual_hash
         )
 
@@ -0,0 +1,174 @@
+"""
+Tests for EPC address normalisation and matching (services/epc_service.py)
+"""
+import sqlite3
+
+import pytest
+
+from scripts.process_epc_data import INSERT_SQL, create_database, finish_full_build, write_batch
+from services.epc_service import (
+    ADDRESS_ABBREVIATIONS,
+    EPCService,
+    address_match_score,
+    is_address_match,
+    normalize_address,
+    parse_rating,
+)
+
+
+def tokens(address):
+    return normalize_address(address).split()
+
+
+class TestNormalizeAddress:
+    def test_expands_abbreviations_and_drops_punctuation(self):
+        assert normalize_address("12, High St.") == "12 HIGH STREET"
+        assert normalize_address("12 High Street") == "12 HIGH STREET"
+
+    def test_flat_synonyms(self):
+        assert normalize_address("Apartment 3, 12 Park Rd") == "FLAT 3 12 PARK ROAD"
+        assert normalize_address("Apt 3 12 Park Road") == "FLAT 3 12 PARK ROAD"
+
+    def test_splits_numbers_from_letters(self):
+        assert normalize_address("12A Mill Lane") == "12 A MILL LANE"
+        assert normalize_address("Flat3 Mill Ln") == "FLAT 3 MILL LANE"
+
+    def test_empty(self):
+        assert normalize_address("") == ""
+        assert normalize_address(None) == ""
+
+
+class TestParseRating:
+    def test_single_band(self):
+        assert parse_rating(" c ") == "C"
+        assert parse_rating("G") == "G"
+
+    def test_rejects_anything_else(self):
+        for rating in (None, "", " ", "AB", "CDE", "H"):
+            assert parse_rating(rating) is None
+
+
+class TestAddressMatchScore:
+    def test_identical_after_normalisation(self):
+        assert address_match_score(tokens("12 High St"), tokens("12, HIGH STREET")) == 1.0
+
+    def test_different_house_number_scores_zero(self):
+        assert address_match_score(tokens("12 High Street"), tokens("14 High Street")) == 0.0
+
+    def test_partial_overlap(self):
+        score = address_match_score(tokens("12 High St"), tokens("ROSE COTTAGE, HIGH STREET"))
+        assert score == pytest.approx(2 / 7)
+
+    def test_no_tokens(self):
+        assert address_match_score([], []) == 0.0
+
+
+class TestIsAddressMatch:
+    def test_same_property(self):
+        assert is_address_match(tokens("12 High St"), tokens("12 HIGH STREET"))
+        assert is_address_match(tokens("Flat 3, 12 High St"), tokens("APARTMENT 3 12 HIGH STREET"))
+
+    def test_house_name_without_number_is_not_a_match(self):
+        assert not is_address_match(tokens("12 High St"), tokens("ROSE COTTAGE, HIGH STREET"))
+
+    def test_other_flat_in_the_building_is_not_a_match(self):
+        assert not is_address_match(tokens("Flat 3, 12 High St"), tokens("FLAT 4, 12 HIGH STREET"))
+        assert not is_address_match(tokens("12 High St"), tokens("FLAT 3, 12 HIGH STREET"))
+
+    def test_query_may_include_town(self):
+        assert is_address_match(tokens("12 High Street, Holt"), tokens("12 HIGH STREET"))
+
+    def test_house_name(self):
+        assert is_address_match(tokens("Rose Cottage, High St"), tokens("ROSE COTTAGE, HIGH STREET"))
+
+
+def certificate(lmk_key, address, postcode, rating="D", lodgement_date="2020-01-01"):
+    """A parsed row as produced by parse_member"""
+    row = (lmk_key, address, postcode, rating, "", "", "", "", lodgement_date, "", "", 0.0, 0, 0, 0)
+    return row + (normalize_address(address),)
+
+
+CERTIFICATES = [
+    certificate("1", "ROSE COTTAGE, HIGH STREET", "NR256BN", "D", "2020-01-01"),
+    certificate("2", "12 HIGH STREET", "NR256BP", "C", "2021-01-01"),
+    certificate("3", "12 HIGH STREET", "SW1A1AA", "B", "2022-01-01"),
+]
+
+
+def assert_index_consistent(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("INSERT INTO epc_address_fts (epc_address_fts, rank) VALUES ('integrity-check', 1)")
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A small EPC database from a full build (scripts/process_epc_data.py)"""
+    path = str(tmp_path / "epc.db")
+    conn = sqlite3.connect(path)
+    create_database(conn, with_indexes=False)
+    conn.executemany(INSERT_SQL, CERTIFICATES)
+    finish_full_build(conn)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def epc_db(db_path):
+    return EPCService(db_path)
+
+
+def run_delta(db_path, batch):
+    conn = sqlite3.connect(db_path)
+    create_database(conn, with_indexes=True)
+    write_batch(conn, batch, maintain_fts=True)
+    conn.commit()
+    conn.close()
+
+
+class TestGetPropertyByAddress:
+    def test_uses_address_index(self, epc_db):
+        assert epc_db.has_address_index
+
+    def test_exact_match_in_postcode(self, epc_db):
+        match = epc_db.get_property_by_address("NR25 6BP", "12 High St")
+        assert match["lmk_key"] == "2"
+        assert "address_normalized" not in match
+
+    def test_weak_match_returns_none(self, epc_db):
+        assert epc_db.get_property_by_address("NR25 6BN", "12 High St") is None
+
+    def test_mistyped_postcode_falls_back_within_sector(self, epc_db):
+        match = epc_db.get_property_by_address("NR25 6BX", "12 High St")
+        assert match["lmk_key"] == "2"
+
+    def test_fallback_never_searches_other_districts(self, epc_db):
+        assert epc_db.get_property_by_address("SW1A 1AB", "12 High St")["lmk_key"] == "3"
+        assert epc_db.get_property_by_address("OX1 1AA", "12 High St") is None
+
+
+class TestAddressIndexMaintenance:
+    def test_delta_replaces_indexed_address(self, db_path):
+        run_delta(db_path, [certificate("2", "14 HIGH STREET", "NR256BP", "B", "2023-01-01")])
+        service = EPCService(db_path)
+        assert service.get_property_by_address("NR25 6BP", "12 High St") is None
+        assert service.get_property_by_address("NR25 6BP", "14 High St")["lmk_key"] == "2"
+        assert_index_consistent(db_path)
+
+    def test_delta_after_abbreviations_change(self, db_path, monkeypatch):
+        # Deletes replay the stored text, not today's normalize_address()
+        monkeypatch.setitem(ADDRESS_ABBREVIATIONS, "STREET", "ST")
+        run_delta(db_path, [certificate("3", "12 HIGH STREET", "SW1A1AA", "A", "2023-01-01")])
+        assert_index_consistent(db_path)
+
+    def test_vacuum_keeps_index_keys(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM epc_certificates WHERE lmk_key = '1'")
+        conn.execute("INSERT INTO epc_address_fts (epc_address_fts) VALUES ('rebuild')")
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+        assert_index_consistent(db_path)
+        assert EPCService(db_path).get_property_by_address("SW1A 1AA", "12 High St")["lmk_key"] == "3"